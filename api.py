@@ -0,0 +1,350 @@
+# /resume-app/api.py
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import uuid
+from functools import lru_cache
+from typing import AsyncIterator, Iterator, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import StreamingResponse
+from langchain_core.messages import AnyMessage, HumanMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+from pydantic import BaseModel
+
+from interview_simulator import InterviewSimulator, QuestionMode, TurnMode
+from profiling import maybe_profile
+from prompt_budget import PromptTooLargeError
+from resume_doctor import ResumeDoctor, RewriteMode
+from decision_aggregator import DEFAULT_PASS_THRESHOLD
+from resume_screener import ResumeScreener, parse_criteria
+from resume_store import get_resume_store
+
+# Requests beyond this limit wait up to REQUEST_TIMEOUT seconds for a slot, then get a 503,
+# so a load balancer can retry them on another instance.
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("RESUME_APP_MAX_CONCURRENT_REQUESTS", 16))
+REQUEST_TIMEOUT = float(os.environ.get("RESUME_APP_REQUEST_TIMEOUT", 10))
+
+# Interview threads live in this database. Use a shared file (or sticky sessions) when
+# running several instances behind a load balancer.
+CHECKPOINTS_PATH = os.environ.get("RESUME_APP_CHECKPOINTS", ":memory:")
+
+app = FastAPI(title="Resume App API")
+# Waited for on the event loop, so requests waiting for a slot do not hold a worker thread
+request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+
+class TuningRequest(BaseModel):
+    resume: Optional[str] = None
+    resume_id: Optional[str] = None
+    job_description: str
+    age_category: str
+    rewrite_mode: RewriteMode = "full"
+
+
+class ExplainRequest(BaseModel):
+    resume: Optional[str] = None
+    resume_id: Optional[str] = None
+    job_description: str
+    decisions: List[dict]
+    decision: str
+    score: Optional[float] = None
+    skipped_criteria: Optional[List[str]] = None
+
+
+class InterviewStartRequest(BaseModel):
+    resume: Optional[str] = None
+    resume_id: Optional[str] = None
+    job_description: str
+    interview_questions: dict
+    persona: Optional[str] = None
+    age_category: Optional[str] = None
+    turn_mode: TurnMode = "two_call"
+    question_mode: QuestionMode = "llm"
+
+
+class InterviewAnswerRequest(BaseModel):
+    answer: str
+
+
+@lru_cache
+def get_screener() -> ResumeScreener:
+    return ResumeScreener()
+
+
+@lru_cache
+def get_resume_doctor(rewrite_mode: RewriteMode) -> ResumeDoctor:
+    return ResumeDoctor(rewrite_mode=rewrite_mode)
+
+
+@lru_cache
+def get_checkpointer() -> SqliteSaver:
+    return SqliteSaver(sqlite3.connect(CHECKPOINTS_PATH, check_same_thread=False))
+
+
+@lru_cache
+def get_interviewer(
+    turn_mode: TurnMode, question_mode: QuestionMode
+) -> InterviewSimulator:
+    return InterviewSimulator(
+        checkpointer=get_checkpointer(),
+        turn_mode=turn_mode,
+        question_mode=question_mode,
+    )
+
+
+def _resume_id(request: BaseModel) -> str:
+    """
+    Returns the id of the request's resume in the resume store, adding the resume text if given.
+    Hashes the text and writes to the store, so it is run in the threadpool.
+
+    The resume_id is returned by /screen, so clients can refer to a screened resume without
+    sending its text again.
+    """
+    if request.resume:
+        return get_resume_store().add(request.resume)[0]
+    if not request.resume_id:
+        raise HTTPException(status_code=422, detail="Send either resume or resume_id")
+    if request.resume_id not in get_resume_store():
+        raise HTTPException(status_code=404, detail="Unknown resume_id")
+    return request.resume_id
+
+
+async def _acquire_slot():
+    try:
+        await asyncio.wait_for(request_slots.acquire(), timeout=REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Server busy, try again later")
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """
+    A streaming response that releases the request slot once it has been sent, or has failed,
+    including when the client disconnects before the body is read.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            request_slots.release()
+
+
+def _stream_graph(graph, input: dict) -> AsyncIterator[str]:
+    """
+    Runs a graph, yielding one json line per completed node, then the final state.
+
+    The graph runs on the threadpool, one step at a time.
+    """
+
+    def lines() -> Iterator[str]:
+        try:
+            state = None
+            for mode, chunk in graph.stream(input, stream_mode=["updates", "values"]):
+                if mode == "updates":
+                    for node, update in chunk.items():
+                        yield json.dumps({"node": node, "update": update}) + "\n"
+                else:
+                    state = chunk
+            yield json.dumps({"result": state}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return iterate_in_threadpool(lines())
+
+
+def _serialize_messages(messages: List[AnyMessage]) -> List[dict]:
+    return [
+        {"role": "user" if m.type == "human" else "assistant", "content": m.content}
+        for m in messages
+    ]
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@app.post("/screen")
+async def screen(
+    resume: UploadFile = File(..., description="The resume in pdf format"),
+    job_description: str = Form(...),
+    criteria: Optional[str] = Form(
+        None,
+        description="Criteria separated by '|'. Leave out to infer them. "
+        "Prefix a criterion with '!' to make it a must-have, "
+        "and end it with '*<weight>' to weight it.",
+    ),
+    num_auto_generated_criteria: int = Form(3),
+    must_have_top_k: int = Form(
+        0, description="Stop screening when one of the first k criteria fails"
+    ),
+    pass_threshold: float = Form(
+        DEFAULT_PASS_THRESHOLD,
+        description="The weighted share of the criteria needed for an overall match",
+    ),
+):
+    """
+    Screens a resume against a job description, streaming one json line per completed step.
+    """
+    await _acquire_slot()
+    try:
+        # The screener removes the file once it has been parsed
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(await resume.read())
+
+        parsed_criteria = None
+        if criteria:
+            parsed_criteria = [x.strip() for x in criteria.split("|") if x.strip()]
+        parsed_criteria, must_have, weights = parse_criteria(parsed_criteria)
+
+        stream = _stream_graph(
+            get_screener().graph,
+            {
+                "path_to_resume": path,
+                "job_description": job_description,
+                "criteria": parsed_criteria,
+                "num_auto_generated_criteria": num_auto_generated_criteria,
+                "must_have": must_have,
+                "must_have_top_k": must_have_top_k,
+                "weights": weights,
+                "pass_threshold": pass_threshold,
+            },
+        )
+    except Exception:
+        request_slots.release()
+        raise
+    return SlotStreamingResponse(stream, media_type="application/x-ndjson")
+
+
+@app.post("/screen/explain")
+async def explain_screening(request: ExplainRequest):
+    """
+    Explains the overall decision of a finished screening, given its final result.
+    """
+    await _acquire_slot()
+    try:
+        resume_id = await run_in_threadpool(_resume_id, request)
+        explanation = await run_in_threadpool(
+            get_screener().explain_decision,
+            {**request.model_dump(), "resume_id": resume_id},
+        )
+        return {"explanation": explanation}
+    finally:
+        request_slots.release()
+
+
+@app.post("/tune")
+async def tune(request: TuningRequest):
+    """
+    Tailors a resume and generates interview questions, streaming one json line per completed step.
+    """
+    await _acquire_slot()
+    try:
+        resume_id = await run_in_threadpool(_resume_id, request)
+        stream = _stream_graph(
+            get_resume_doctor(request.rewrite_mode).graph,
+            {
+                "resume_id": resume_id,
+                "job_description": request.job_description,
+                "age_category": request.age_category,
+            },
+        )
+    except Exception:
+        request_slots.release()
+        raise
+    return SlotStreamingResponse(stream, media_type="application/x-ndjson")
+
+
+def _interview_turn(interviewer: InterviewSimulator, thread: dict, input) -> dict:
+    # Profiled when RESUME_APP_PROFILE is set. Streamed runs are not, as their steps
+    # can be resumed on different threads.
+    seen = 0
+    if input is None:
+        seen = len(interviewer.graph.get_state(thread).values.get("messages", []))
+    with maybe_profile("interview"):
+        try:
+            interviewer.graph.invoke(input, thread)
+        except PromptTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+    values = interviewer.graph.get_state(thread).values
+    return {
+        "thread_id": thread["configurable"]["thread_id"],
+        "messages": _serialize_messages(values.get("messages", [])[seen:]),
+        "ended": bool(values.get("ended")),
+        "prompt_notes": values.get("prompt_notes") or [],
+    }
+
+
+@app.post("/interview")
+async def start_interview(request: InterviewStartRequest):
+    """
+    Starts an interview, returning the thread id used to continue it and the interviewer's introduction.
+    """
+    await _acquire_slot()
+    try:
+        interviewer = get_interviewer(request.turn_mode, request.question_mode)
+        thread = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        resume_id = await run_in_threadpool(_resume_id, request)
+        return await run_in_threadpool(
+            _interview_turn,
+            interviewer,
+            thread,
+            {
+                "resume_id": resume_id,
+                "job_description": request.job_description,
+                "persona": request.persona,
+                "age_category": request.age_category,
+                "interview_questions": request.interview_questions,
+                "last_question": None,
+            },
+        )
+    finally:
+        request_slots.release()
+
+
+@app.post("/interview/{thread_id}")
+async def answer_interview(thread_id: str, request: InterviewAnswerRequest):
+    """
+    Sends the candidate's answer, returning the interviewer's new messages.
+    Answer with "DONE" to end the interview.
+    """
+    await _acquire_slot()
+    try:
+        thread = {"configurable": {"thread_id": thread_id}}
+        checkpoint = await run_in_threadpool(get_checkpointer().get, thread)
+        values = checkpoint["channel_values"] if checkpoint else {}
+        if not values:
+            raise HTTPException(status_code=404, detail="Unknown interview thread")
+        if values.get("ended"):
+            raise HTTPException(status_code=409, detail="The interview has ended")
+
+        # Continue with the modes the interview was started with
+        interviewer = get_interviewer(
+            values.get("turn_mode") or "two_call",
+            values.get("question_mode") or "llm",
+        )
+
+        await run_in_threadpool(
+            interviewer.graph.update_state,
+            thread,
+            {"messages": [HumanMessage(content=request.answer)]},
+            as_node="ask_question",
+        )
+        return await run_in_threadpool(_interview_turn, interviewer, thread, None)
+    finally:
+        request_slots.release()
+
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "api:app",
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", 8080)),
+        workers=int(os.environ.get("WEB_CONCURRENCY", 1)),
+    )
@@ -0,0 +1,73 @@
+# /resume-app/criteria_cache.py
+import threading
+from collections import OrderedDict
+from typing import Callable, List
+
+from utils import content_hash
+
+
+class CriteriaCache:
+    """
+    A process-wide cache of the criteria generated for a job description.
+
+    Generated criteria only depend on the job description, so they can be shared by every
+    resume screened against the same posting. Entries are keyed by the hash of the job description,
+    the number of criteria and the model, and the least recently used entries are dropped.
+    Concurrent requests for the same entry wait for a single generation.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Initializes the CriteriaCache class.
+
+        Args:
+            max_entries: The number of entries to keep.
+        """
+        self.max_entries = max_entries
+        self.entries: OrderedDict[tuple, List[str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple, threading.Lock] = {}
+
+    def get_or_generate(
+        self,
+        job_description: str,
+        num_criteria: int,
+        model: str,
+        generate: Callable[[], List[str]],
+    ) -> List[str]:
+        """
+        Returns the cached criteria, generating and caching them on a miss.
+
+        Args:
+            job_description: The job description text.
+            num_criteria: The number of criteria requested.
+            model: The name of the model that generates the criteria.
+            generate: Generates the criteria on a miss.
+
+        Returns:
+            The criteria.
+        """
+        key = (content_hash(job_description), num_criteria, model)
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return list(self.entries[key])
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self.entries:
+                    return list(self.entries[key])
+
+            criteria = generate()
+
+            with self._lock:
+                if criteria:
+                    self.entries[key] = list(criteria)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+                self._key_locks.pop(key, None)
+        return criteria
+
+
+criteria_cache = CriteriaCache()
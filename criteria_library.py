@@ -0,0 +1,339 @@
+# /resume-app/criteria_library.py
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from contextlib import closing
+from typing import Dict, List, Tuple
+
+from utils import content_hash
+
+DEFAULT_LIBRARY_PATH = os.path.join(".cache", "criteria_library.sqlite")
+
+# Criteria at least this similar, with the same numbers, share a canonical id
+SIMILARITY_THRESHOLD = 0.75
+
+# Each word only one of two similar criteria uses must be at least this similar to a word only the
+# other uses, e.g. a plural or a typo. "senior" and "junior", "bachelor" and "master", or a "not"
+# with no counterpart change what the criterion asks for.
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+NUMBER_WORDS = {
+    "one": "1",
+    "two": "2",
+    "three": "3",
+    "four": "4",
+    "five": "5",
+    "six": "6",
+    "seven": "7",
+    "eight": "8",
+    "nine": "9",
+    "ten": "10",
+    "eleven": "11",
+    "twelve": "12",
+    "fifteen": "15",
+    "twenty": "20",
+}
+
+# Words that do not change what a criterion asks for. Logical and comparative words such as
+# "and", "or" and "over" do, and are kept.
+FILLER_WORDS = {
+    "a",
+    "an",
+    "the",
+    "of",
+    "in",
+    "with",
+    "experience",
+    "experienced",
+    "knowledge",
+    "skill",
+    "skills",
+    "proficiency",
+    "proficient",
+    "strong",
+    "solid",
+    "good",
+    "proven",
+    "demonstrated",
+    "working",
+    "hands",
+    "on",
+    "using",
+    "must",
+    "have",
+    "has",
+    "should",
+    "candidate",
+    "ability",
+    "to",
+}
+
+
+def normalize_criterion(criterion: str) -> str:
+    """
+    Normalizes a criterion, so equivalent phrasings end up with the same text where possible.
+
+    Lowercases, spells numbers as digits, reads "5+", "at least 5" and "5 or more" as 5, and drops
+    filler words, punctuation and plurals. For example, "5+ years Python" and "Five years of
+    Python experience" both become "5 year python".
+
+    Args:
+        criterion: The criterion text.
+
+    Returns:
+        The normalized text.
+    """
+    text = unicodedata.normalize("NFKC", criterion).lower()
+    text = re.sub(r"['’]s\b", "", text)
+    text = re.sub(
+        r"\b(" + "|".join(NUMBER_WORDS) + r")\b",
+        lambda m: NUMBER_WORDS[m.group(1)],
+        text,
+    )
+    # "5+", "at least 5", "minimum of 5" and "5 or more" all ask for 5, "more than 5" for over 5
+    text = re.sub(r"\b(?:at least|minimum(?: of)?)\s+(\d+)", r"\1", text)
+    text = re.sub(r"(\d+)\s*(?:\+|or more\b|plus\b)", r"\1 ", text)
+    text = re.sub(r"\bmore than\s+(\d+)", r"over \1", text)
+    text = re.sub(r"[^a-z0-9#+.\s]", " ", text)
+    words = []
+    for word in text.split():
+        word = word.strip(".")
+        word = NUMBER_WORDS.get(word, word)
+        if not word or word in FILLER_WORDS:
+            continue
+        if (
+            len(word) > 3
+            and word[-1] == "s"
+            and word[-2] not in "s."
+            and "." not in word
+        ):
+            word = word[:-1]
+        words.append(word)
+    return " ".join(words)
+
+
+def _trigrams(text: str) -> Counter:
+    padded = f"  {text} "
+    return Counter(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    dot = sum(count * b[gram] for gram, count in a.items())
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(
+        sum(c * c for c in b.values())
+    )
+    return dot / norm if norm else 0.0
+
+
+def _numbers(text: str) -> Tuple[str, ...]:
+    return tuple(re.findall(r"\d+", text))
+
+
+def _same_words(a: str, b: str) -> bool:
+    # Whether every word only one of the texts uses has a close counterpart in the other
+    words_a, words_b = set(a.split()), set(b.split())
+    only_a, only_b = words_a - words_b, words_b - words_a
+    for words, others in ((only_a, only_b), (only_b, only_a)):
+        for word in words:
+            if not any(
+                _cosine(_trigrams(word), _trigrams(other)) >= WORD_SIMILARITY_THRESHOLD
+                for other in others
+            ):
+                return False
+    return True
+
+
+class CriteriaLibrary:
+    """
+    A local library that maps free text criteria to canonical ids.
+
+    Criteria are normalized, then matched against the known canonical criteria with a character
+    trigram similarity index. Near-duplicates with the same numbers, whose differing words are only
+    spelling variants, share a canonical id, so verdicts
+    can be reused across postings with equivalent requirements. The library also holds a cache of
+    verdicts per resume and canonical criterion. Both are stored in SQLite.
+    """
+
+    def __init__(
+        self, path: str | None = None, threshold: float = SIMILARITY_THRESHOLD
+    ):
+        """
+        Initializes the CriteriaLibrary class.
+
+        Args:
+            path: The path to the SQLite database. Defaults to the RESUME_APP_CRITERIA_LIBRARY
+                environment variable, or .cache/criteria_library.sqlite.
+            threshold: The similarity above which two criteria are considered the same.
+        """
+        self.path = path or os.environ.get(
+            "RESUME_APP_CRITERIA_LIBRARY", DEFAULT_LIBRARY_PATH
+        )
+        self.threshold = threshold
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS canonical_criteria ("
+                "id TEXT PRIMARY KEY, text TEXT NOT NULL, normalized TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS aliases ("
+                "normalized TEXT PRIMARY KEY, canonical_id TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS decisions ("
+                "resume_hash TEXT NOT NULL, canonical_id TEXT NOT NULL, model TEXT NOT NULL, "
+                "decision TEXT NOT NULL, reason TEXT NOT NULL, created REAL NOT NULL, "
+                "PRIMARY KEY (resume_hash, canonical_id, model))"
+            )
+            canonical = conn.execute(
+                "SELECT id, normalized FROM canonical_criteria"
+            ).fetchall()
+            aliases = conn.execute(
+                "SELECT normalized, canonical_id FROM aliases"
+            ).fetchall()
+
+        self.aliases: Dict[str, str] = dict(aliases)
+        self.normalized: Dict[str, str] = {}
+        self.vectors: Dict[str, Counter] = {}
+        self.index: Dict[str, set] = defaultdict(set)
+        for canonical_id, normalized in canonical:
+            self._add_to_index(canonical_id, normalized)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _add_to_index(self, canonical_id: str, normalized: str):
+        vector = _trigrams(normalized)
+        self.normalized[canonical_id] = normalized
+        self.vectors[canonical_id] = vector
+        for gram in vector:
+            self.index[gram].add(canonical_id)
+
+    def _nearest(self, normalized: str) -> str | None:
+        vector = _trigrams(normalized)
+        candidates = set()
+        for gram in vector:
+            candidates |= self.index.get(gram, set())
+
+        numbers = _numbers(normalized)
+        best, best_score = None, self.threshold
+        for canonical_id in candidates:
+            score = _cosine(vector, self.vectors[canonical_id])
+            known = self.normalized[canonical_id]
+            if (
+                score >= best_score
+                and _numbers(known) == numbers
+                and _same_words(known, normalized)
+            ):
+                best, best_score = canonical_id, score
+        return best
+
+    def canonical_id(self, criterion: str) -> str:
+        """
+        Returns the canonical id for a criterion, adding it to the library if it is new.
+
+        Args:
+            criterion: The criterion text.
+
+        Returns:
+            The canonical id.
+        """
+        normalized = normalize_criterion(criterion) or criterion.strip().lower()
+        with self._lock:
+            if normalized in self.aliases:
+                return self.aliases[normalized]
+
+            canonical_id = self._nearest(normalized)
+            with closing(self._connect()) as conn, conn:
+                if canonical_id is None:
+                    canonical_id = content_hash(normalized)[:16]
+                    conn.execute(
+                        "INSERT OR IGNORE INTO canonical_criteria (id, text, normalized) "
+                        "VALUES (?, ?, ?)",
+                        (canonical_id, criterion, normalized),
+                    )
+                    self._add_to_index(canonical_id, normalized)
+                conn.execute(
+                    "INSERT OR IGNORE INTO aliases (normalized, canonical_id) VALUES (?, ?)",
+                    (normalized, canonical_id),
+                )
+            self.aliases[normalized] = canonical_id
+        return canonical_id
+
+    def canonical_ids(self, criteria: List[str]) -> List[str]:
+        return [self.canonical_id(criterion) for criterion in criteria]
+
+    def get_decision(
+        self, resume_hash: str, canonical_id: str, model: str
+    ) -> dict | None:
+        """
+        Returns the cached verdict of a resume against a canonical criterion.
+
+        Args:
+            resume_hash: The hash of the parsed resume text.
+            canonical_id: The canonical criterion id.
+            model: The name of the model that made the decision.
+
+        Returns:
+            A dictionary with the decision and reason, or None if it is not cached.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT decision, reason FROM decisions "
+                "WHERE resume_hash = ? AND canonical_id = ? AND model = ?",
+                (resume_hash, canonical_id, model),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"decision": row[0], "reason": row[1]}
+
+    def put_decision(
+        self, resume_hash: str, canonical_id: str, model: str, decision: dict
+    ):
+        """
+        Caches the verdict of a resume against a canonical criterion.
+
+        Args:
+            resume_hash: The hash of the parsed resume text.
+            canonical_id: The canonical criterion id.
+            model: The name of the model that made the decision.
+            decision: A dictionary with the decision and reason.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO decisions "
+                "(resume_hash, canonical_id, model, decision, reason, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    resume_hash,
+                    canonical_id,
+                    model,
+                    decision["decision"],
+                    decision["reason"],
+                    time.time(),
+                ),
+            )
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def get_criteria_library() -> CriteriaLibrary:
+    """
+    Returns the process-wide criteria library, creating it on first use.
+    """
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = CriteriaLibrary()
+        return _library
@@ -0,0 +1,75 @@
+# /resume-app/decision_aggregator.py
+from typing import Collection, List, TypedDict
+
+# The share of the criteria weight a resume has to pass to be an overall match
+DEFAULT_PASS_THRESHOLD = 0.6
+
+
+class AggregatedDecision(TypedDict):
+    """
+    A dictionary representing the overall decision computed from the per-criterion verdicts.
+
+    Attributes:
+        decision: The overall decision, either "pass" or "fail".
+        score: The weighted share of the criteria passed, between 0 and 1.
+        reason: A short summary of how the decision was reached.
+    """
+
+    decision: str
+    score: float
+    reason: str
+
+
+def aggregate_decisions(
+    criteria: List[str],
+    decisions: List[dict],
+    weights: List[float] | None = None,
+    must_have: Collection[int] = (),
+    pass_threshold: float = DEFAULT_PASS_THRESHOLD,
+) -> AggregatedDecision:
+    """
+    Combines the per-criterion verdicts into an overall decision, without calling a model.
+
+    The score is the weight of the criteria passed over the weight of all criteria. Criteria that
+    were not evaluated count as not passed. The resume is a match if no must-have criterion failed
+    and the score reaches the threshold.
+
+    Args:
+        criteria: The criteria, in order.
+        decisions: The verdicts for the first len(decisions) criteria.
+        weights: The weight of each criterion. Defaults to 1 for every criterion.
+        must_have: The indices of the must-have criteria.
+        pass_threshold: The score needed to pass.
+
+    Returns:
+        The overall decision, score and a short reason.
+    """
+    weights = weights or [1.0] * len(criteria)
+    passed = [
+        i for i, decision in enumerate(decisions) if decision["decision"] != "fail"
+    ]
+    failed_must_haves = [
+        criteria[i]
+        for i, decision in enumerate(decisions)
+        if i in must_have and decision["decision"] == "fail"
+    ]
+    skipped = criteria[len(decisions) :]
+
+    total = sum(weights[: len(criteria)])
+    score = sum(weights[i] for i in passed) / total if total > 0 else 0.0
+    matched = not failed_must_haves and score >= pass_threshold
+
+    reason = (
+        f"Passed {len(passed)} of {len(criteria)} criteria, "
+        f"a weighted score of {score:.2f} against a threshold of {pass_threshold:.2f}."
+    )
+    if failed_must_haves:
+        reason += f" Failed must-have criteria: {', '.join(failed_must_haves)}."
+    if skipped:
+        reason += f" Not evaluated: {', '.join(skipped)}."
+
+    return AggregatedDecision(
+        decision="pass" if matched else "fail",
+        score=round(score, 4),
+        reason=reason,
+    )
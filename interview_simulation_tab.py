@@ -1,8 +1,9 @@
 # /resume-app/interview_simulation_tab.py
 import streamlit as st
 
-from interview_simulator import InterviewSimulator
-from utils import clear_thread, get_memory, get_thread
+from interview_simulator import InterviewSimulator, QuestionMode, TurnMode
+from profiling import maybe_profile
+from utils import clear_thread, get_api_key, get_memory, get_thread
 from langchain_core.messages import HumanMessage
 
 
@@ -28,6 +29,26 @@ def _reset_simulation_state():
     clear_thread(simulation_thread_name)
 
 
+@st.cache_resource(max_entries=64)
+def _cached_interviewer(
+    turn_mode: TurnMode, question_mode: QuestionMode, api_key: str | None
+) -> InterviewSimulator:
+    # The interview itself lives in the checkpointer. The API key is part of the cache key,
+    # so sessions only share a simulator, and its model clients, when they use the same key.
+    return InterviewSimulator(
+        checkpointer=get_memory(),
+        turn_mode=turn_mode,
+        question_mode=question_mode,
+        api_key=api_key,
+    )
+
+
+def get_interviewer(
+    turn_mode: TurnMode, question_mode: QuestionMode
+) -> InterviewSimulator:
+    return _cached_interviewer(turn_mode, question_mode, get_api_key())
+
+
 def _run(agent, thread):
     """
     Starts the interview simulation.
@@ -39,20 +60,23 @@ def _run(agent, thread):
         agent: The InterviewSimulator object.
         thread: The thread dictionary.
     """
-    resume = st.session_state["app_state"]["resume"]
-    persona = st.session_state["app_state"]["persona"]
+    resume_id = st.session_state["app_state"]["resume_id"]
+    persona = st.session_state["app_state"].get("persona")
+    age_category = st.session_state["app_state"].get("age_category")
     job_description = st.session_state["app_state"]["job_description"]
     interview_questions = st.session_state["app_state"]["interview_questions"]
 
-    _ = agent.graph.invoke(
-        {
-            "resume": resume,
-            "job_description": job_description,
-            "persona": persona,
-            "interview_questions": interview_questions,
-        },
-        thread,
-    )
+    with maybe_profile("interview"):
+        _ = agent.graph.invoke(
+            {
+                "resume_id": resume_id,
+                "job_description": job_description,
+                "persona": persona,
+                "age_category": age_category,
+                "interview_questions": interview_questions,
+            },
+            thread,
+        )
 
 
 def _resume_with_state_update(agent: InterviewSimulator, thread: dict):
@@ -74,7 +98,8 @@ def _resume_with_state_update(agent: InterviewSimulator, thread: dict):
         as_node="ask_question",
     )
     # Now call with None to resume with changed state
-    _ = agent.graph.invoke(None, thread)
+    with maybe_profile("interview"):
+        _ = agent.graph.invoke(None, thread)
 
 
 def _user_response():
@@ -103,32 +128,74 @@ def _show_message(message):
         st.chat_message("assistant").write(message.content)
 
 
-def _show_messages(agent, thread):
+def _show_messages(values: dict):
     """
     Displays the messages exchanged during the interview simulation.
 
-    This function retrieves the messages from the interview simulation's state
-    and displays them in the Streamlit chat interface. It also checks if the interview has ended
-    and presents a chat input for the user to provide their response if the interview is ongoing.
+    This function displays the messages from the interview simulation's state in the Streamlit
+    chat interface, along with a note for any content left out of the prompts. It presents a chat
+    input for the user to provide their response if the interview is ongoing.
 
     Args:
-        agent: The InterviewSimulator object.
-        thread: The thread dictionary.
+        values: The values of the interview simulation's state.
     """
-    messages = agent.graph.get_state(thread).values["messages"]
+    messages = values.get("messages", [])
     st.session_state["app_state"]["interview_session"] = messages
-    has_ended = (
-        "ended" in agent.graph.get_state(thread).values
-        and agent.graph.get_state(thread).values["ended"]
-    )
+
+    for note in values.get("prompt_notes") or []:
+        st.caption(note)
 
     for message in messages:
         _show_message(message)
 
-    if len(messages) > 0 and not has_ended:
+    if len(messages) > 0 and not values.get("ended"):
         _user_response()
 
 
+def _in_progress(values: dict) -> bool:
+    return bool(values.get("messages")) and not values.get("ended")
+
+
+@st.fragment
+def _render_chat(agent: InterviewSimulator):
+    """
+    Renders the interview chat as a fragment.
+
+    Sending an answer only reruns this fragment, not the whole app, so the other tabs are not
+    rendered again on every turn. Starting, abandoning and finishing an interview rerun the app,
+    so the settings are locked and unlocked with it.
+
+    Args:
+        agent: The InterviewSimulator object, built with the modes of the interview in progress.
+    """
+    thread = _get_simulation_thread()
+    values = agent.graph.get_state(thread).values
+
+    if _in_progress(values):
+        if st.button(
+            "New Interview",
+            help="Abandon this interview, to change the settings and start again.",
+        ):
+            _reset_simulation_state()
+            st.rerun()
+    elif st.button("Start Interview"):
+        _reset_simulation_state()
+        _run(agent, _get_simulation_thread())
+        st.rerun()
+
+    if (
+        "interview_simulation_response" in st.session_state
+        and st.session_state["interview_simulation_response"] is not None
+        and _in_progress(values)
+    ):
+        _resume_with_state_update(agent, thread)
+        values = agent.graph.get_state(thread).values
+        if values.get("ended"):
+            st.rerun()
+
+    _show_messages(values)
+
+
 def render_interview_simulation_tab():
     """
     Renders the interview simulation tab in the Streamlit app.
@@ -152,15 +219,46 @@ def render_interview_simulation_tab():
         "When the candidate answers, AI then provides feedback on the answer."
     )
 
-    inteviewer = InterviewSimulator(checkpointer=get_memory())
-    start = st.button("Start Interview")
-    if start:
-        _reset_simulation_state()
-        _run(inteviewer, _get_simulation_thread())
-    elif (
-        "interview_simulation_response" in st.session_state
-        and st.session_state["interview_simulation_response"] is not None
-    ):
-        _resume_with_state_update(inteviewer, _get_simulation_thread())
-
-    _show_messages(inteviewer, _get_simulation_thread())
+    # An interview in progress continues with the modes it was started with
+    checkpoint = get_memory().get(_get_simulation_thread())
+    values = checkpoint["channel_values"] if checkpoint else {}
+    locked = _in_progress(values)
+
+    mock_exam = st.toggle(
+        "Mock exam",
+        key="interview_simulation_mock_exam",
+        help="Ask the scheduled questions back to back without feedback, "
+        "and review all the answers at once when you send DONE.",
+        disabled=locked,
+    )
+    merged_turns = st.toggle(
+        "Single-call turns",
+        key="interview_simulation_merged_turns",
+        help="Review each answer and ask the next question in one model call, instead of two.",
+        disabled=mock_exam or locked,
+    )
+    question_modes = {
+        "Model picks the question": "llm",
+        "Model phrases a scheduled question": "phrase",
+        "Ask scheduled questions word for word": "verbatim",
+    }
+    question_mode = st.selectbox(
+        "Question selection",
+        list(question_modes.keys()),
+        key="interview_simulation_question_mode",
+        help="Scheduled questions are drawn locally from the generated list without repeats.",
+        disabled=mock_exam or locked,
+    )
+    if mock_exam:
+        turn_mode = "mock_exam"
+    else:
+        turn_mode = "merged" if merged_turns else "two_call"
+    question_mode = question_modes[question_mode]
+    if locked:
+        turn_mode = values.get("turn_mode") or turn_mode
+        question_mode = values.get("question_mode") or question_mode
+        st.caption(
+            "The settings are locked while the interview is in progress. "
+            "Press New Interview to change them."
+        )
+    _render_chat(get_interviewer(turn_mode, question_mode))
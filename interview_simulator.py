@@ -1,10 +1,25 @@
 # /resume-app/interview_simulator.py
-from typing import List, Literal, TypedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal, Sequence
 from langgraph.graph import StateGraph, END
-from langchain_core.messages import HumanMessage, SystemMessage, AnyMessage, AIMessage
-from utils import get_model
+from langchain_core.messages import AnyMessage, AIMessage
+from persona_cache import PersonaCache
+from prompt_budget import FittedPrompt, fit_prompt, merge_notes
+from question_scheduler import QuestionScheduler
+from model_router import ModelRouter
+from resume_store import ResumeStore, get_resume_store
 import operator
-from typing import Annotated
+from typing_extensions import Annotated, TypedDict
+
+# "two_call" reviews the answer and then asks the next question as separate model calls.
+# "merged" does both in a single call that returns structured output.
+# "mock_exam" asks the scheduled questions back to back, and reviews all answers at the end.
+TurnMode = Literal["two_call", "merged", "mock_exam"]
+
+# "llm" lets the model pick the next question from the full question list.
+# "phrase" picks the question locally and lets the model phrase it.
+# "verbatim" picks the question locally and asks it word for word, without a model call.
+QuestionMode = Literal["llm", "phrase", "verbatim"]
 
 
 class InterviewSimulatorState(TypedDict):
@@ -12,22 +27,47 @@ class InterviewSimulatorState(TypedDict):
     A dictionary representing the state of the interview simulator.
 
     Attributes:
-        resume: The candidate's resume text.
-        persona: The persona of the interviewer.
+        resume_id: The id of the candidate's resume in the resume store.
+        persona: The persona of the interviewer. Looked up in the persona cache when missing.
+        age_category: The age category of the interviewer, used to look up a cached persona.
         job_description: The job description text.
         interview_questions: A list of interview questions, grouped by category.
         messages: A list of messages exchanged during the interview.
         last_question: The last question asked by the interviewer.
+        asked_questions: The questions picked by the local question scheduler so far.
+        exam_answers: In mock exam mode, the questions and answers waiting to be reviewed.
         ended: A boolean indicating whether the interview has ended.
+        prompt_notes: What was left out of the prompts to fit the model's context window.
+        turn_mode: The turn mode the interview was started with, for clients resuming it.
+        question_mode: The question mode the interview was started with.
     """
 
-    resume: str
-    persona: str
+    resume_id: str
+    persona: str | None
+    age_category: str | None
     job_description: str
     interview_questions: List[dict] | None
     messages: Annotated[list[AnyMessage], operator.add]
     last_question: str | None
+    asked_questions: Annotated[list[str], operator.add]
+    exam_answers: Annotated[list[dict], operator.add]
     ended: bool | None
+    prompt_notes: Annotated[List[str], merge_notes]
+    turn_mode: TurnMode | None
+    question_mode: QuestionMode | None
+
+
+class ReviewAndAsk(TypedDict):
+    """
+    The schema of the merged review-and-ask output.
+
+    Attributes:
+        feedback: The comments on the candidate's answer.
+        question: The next question.
+    """
+
+    feedback: str
+    question: str
 
 
 class InterviewSimulator:
@@ -39,15 +79,48 @@ class InterviewSimulator:
     generating responses for both parties based on the provided context.
     """
 
-    def __init__(self, checkpointer):
+    def __init__(
+        self,
+        checkpointer,
+        turn_mode: TurnMode = "two_call",
+        question_mode: QuestionMode = "llm",
+        category_weights: dict[str, float] | None = None,
+        coverage_weight: float = 1.0,
+        seed: int = 0,
+        persona_cache: PersonaCache | None = None,
+        review_concurrency: int = 4,
+        resume_store: ResumeStore | None = None,
+        api_key: str | None = None,
+    ):
         """
         Initializes the InterviewSimulator class.
 
         Args:
             checkpointer: A checkpointer object used to save and load the state of the interview.
+            turn_mode: How each candidate answer is handled. "two_call" reviews the answer and then
+                asks the next question as two model calls, "merged" does both in a single call.
+                "mock_exam" asks the scheduled questions word for word with no review, and reviews
+                all the answers at once when the candidate is done.
+            question_mode: How the next question is chosen. "llm" lets the model pick it,
+                "phrase" and "verbatim" pick it with the local QuestionScheduler.
+            category_weights: Optional relative weights per question category, used by the scheduler.
+            coverage_weight: How strongly the scheduler favours categories asked about least.
+            seed: The seed used by the scheduler.
+            persona_cache: The cache used to look up the persona when none is given.
+            review_concurrency: The number of answers reviewed at once in mock exam mode.
+            resume_store: The store holding the parsed resumes. Defaults to the process-wide store.
+            api_key: The NVIDIA API key. Defaults to the key entered in the app.
         """
-        self.model = get_model()
+        self.model = ModelRouter(api_key=api_key)
         self.checkpointer = checkpointer
+        self.turn_mode = turn_mode
+        self.question_mode = question_mode
+        self.category_weights = category_weights
+        self.coverage_weight = coverage_weight
+        self.seed = seed
+        self.persona_cache = persona_cache or PersonaCache()
+        self.review_concurrency = review_concurrency
+        self.resume_store = resume_store or get_resume_store()
         self.graph = self.build_graph()
 
     def build_graph(self):
@@ -61,13 +134,7 @@ class InterviewSimulator:
 
         self.SYSTEM_PROMPT = """
 You are an expert interviewer, and you will take on the role of the gven persona. 
-You have been asked to interview a candidate with the following resume given a job description.
-
-Here is the job description:
-{job_description}
-
-Here is the resume:
-{resume}
+You have been asked to interview the candidate with the resume above given the job description above.
 
 Here is your persona:
 {persona}
@@ -86,6 +153,13 @@ Ask the candidate a question. Select from the following questions.
 Make sure not to pick the same question twice.
 """
 
+        self.PHRASE_QUESTION_PROMPT = """
+Ask the candidate the following question. You can phrase it to fit the conversation, but keep its meaning.
+{question}
+"""
+
+        self.NO_MORE_QUESTIONS = 'We have covered all the questions I had for you. Please reply with "DONE" to finish the interview.'
+
         self.REVIEW_ANSWER_PROMPT = """
 The candidate has answered the following question:
 {question}
@@ -95,29 +169,80 @@ The candidate has given the following answer:
 
 Comment on the answer, directly addressing the candidate, using your own knowledge and experience, and the candidate's resume. Suggest how it can be improved if possible.
 """
+        self.REVIEW_AND_ASK_PROMPT = """
+The candidate has answered the following question:
+{question}
+
+The candidate has given the following answer:
+{answer}
+
+First, comment on the answer, directly addressing the candidate, using your own knowledge and experience, and the candidate's resume. Suggest how it can be improved if possible.
+Then ask the candidate the next question. {ask_instructions}
+
+Your output should be in the following format:
+{{
+    "feedback": "your comments on the answer",
+    "question": "the next question"
+}}
+"""
+        self.EXAM_FEEDBACK_HEADER = "Here is my feedback on your answers."
+        self.EXAM_NO_ANSWERS = (
+            "You did not answer any questions, so I have no feedback for you."
+        )
+
         self.WRAP_UP_PROMPT = """
 The candidate has finished the interview. Thank the candidate for their time and consideration.
 """
         builder.add_node("introduction", self.introduction)
         builder.add_node("ask_question", self.ask_question)
-        builder.add_node("review_answer", self.review_answer)
-        builder.add_node("pre_review_answer", self.pre_review_answer)
         builder.add_node("wrap_up", self.wrap_up)
 
         builder.add_edge("introduction", "ask_question")
 
         builder.add_edge("introduction", "ask_question")
-        builder.add_conditional_edges("ask_question", self.should_end_or_review)
 
-        builder.add_edge("pre_review_answer", "review_answer")
-        builder.add_edge("review_answer", "ask_question")
+        if self.turn_mode == "mock_exam":
+            # Answers are only recorded during the interview, and reviewed together at the end.
+            builder.add_node("record_answer", self.record_answer)
+            builder.add_node("review_exam", self.review_exam)
+            builder.add_conditional_edges(
+                "ask_question",
+                self.should_end_or_review,
+                ["review_exam", "record_answer"],
+            )
+            builder.add_edge("record_answer", "ask_question")
+            builder.add_edge("review_exam", "wrap_up")
+            interrupt_after = ["introduction", "ask_question"]
+        elif self.turn_mode == "merged":
+            # The answer goes straight to a single node that reviews it and asks the next question.
+            builder.add_node("review_and_ask", self.review_and_ask)
+            turn_nodes = ["wrap_up", "review_and_ask"]
+            builder.add_conditional_edges(
+                "ask_question", self.should_end_or_review, turn_nodes
+            )
+            builder.add_conditional_edges(
+                "review_and_ask", self.should_end_or_review, turn_nodes
+            )
+            interrupt_after = ["introduction", "ask_question", "review_and_ask"]
+        else:
+            builder.add_node("review_answer", self.review_answer)
+            builder.add_node("pre_review_answer", self.pre_review_answer)
+            builder.add_conditional_edges(
+                "ask_question",
+                self.should_end_or_review,
+                ["wrap_up", "pre_review_answer"],
+            )
+            builder.add_edge("pre_review_answer", "review_answer")
+            builder.add_edge("review_answer", "ask_question")
+            interrupt_after = ["introduction", "ask_question"]
+
         builder.add_edge("wrap_up", END)
 
         builder.set_entry_point("introduction")
 
         return builder.compile(
             checkpointer=self.checkpointer,
-            interrupt_after=["introduction", "ask_question"],
+            interrupt_after=interrupt_after,
             interrupt_before=[],
         )
 
@@ -130,26 +255,84 @@ The candidate has finished the interview. Thank the candidate for their time and
         """
         pass
 
-    def _get_system_prompt(self, state: InterviewSimulatorState) -> SystemMessage:
+    def _fit_prompt(
+        self,
+        state: InterviewSimulatorState,
+        node: str,
+        request: str,
+        history: Sequence[AnyMessage] = (),
+    ) -> FittedPrompt:
         """
-        Returns the system prompt for the language model.
+        Returns the messages for a model call, fitted to the context window of the node's model.
 
-        This method constructs the system prompt based on the provided context,
-        including the job description, resume, and persona.
+        The system prompt starts with the job description and resume prefix shared by all agents,
+        followed by the persona. When the prompt is too long, the oldest interview messages are
+        left out first.
 
         Args:
             state: The current state of the interview simulator.
+            node: The name of the node making the call.
+            request: The instructions for this call.
+            history: The interview messages to send before the request.
 
         Returns:
-            The system prompt string.
+            The FittedPrompt.
         """
-        return SystemMessage(
-            content=self.SYSTEM_PROMPT.format(
-                job_description=state["job_description"],
-                resume=state["resume"],
-                persona=state["persona"],
-            )
+        return fit_prompt(
+            self.model.model_for(node),
+            self.SYSTEM_PROMPT.format(persona=state["persona"]),
+            state["job_description"],
+            request,
+            resume=self.resume_store.get(state["resume_id"]),
+            history=history,
+        )
+
+    def _schedule_question(self, state: InterviewSimulatorState) -> str | None:
+        """
+        Picks the next question with the local QuestionScheduler.
+
+        Args:
+            state: The current state of the interview simulator.
+
+        Returns:
+            The next question, or None if every question has been asked.
+        """
+        scheduler = QuestionScheduler(
+            state["interview_questions"],
+            category_weights=self.category_weights,
+            coverage_weight=self.coverage_weight,
+            seed=self.seed,
         )
+        scheduled = scheduler.next_question(state.get("asked_questions") or [])
+        if scheduled is None:
+            return None
+        _, question = scheduled
+        return question
+
+    def _ask_instructions(
+        self, state: InterviewSimulatorState, question: str | None
+    ) -> str:
+        """
+        Returns the instructions for asking the next question in the merged review-and-ask prompt.
+
+        Args:
+            state: The current state of the interview simulator.
+            question: The question picked by the scheduler, or None.
+
+        Returns:
+            The instructions string.
+        """
+        if self.question_mode == "llm":
+            return (
+                f"Select from the following questions.\n{state['interview_questions']}\n"
+                "Make sure not to pick the same question twice."
+            )
+        if question is None:
+            return (
+                "There are no more questions. Let the candidate know they can reply "
+                'with "DONE" to finish the interview.'
+            )
+        return f"Ask this question, phrased to fit the conversation but keeping its meaning:\n{question}"
 
     def introduction(self, state: InterviewSimulatorState) -> InterviewSimulatorState:
         """
@@ -158,40 +341,61 @@ The candidate has finished the interview. Thank the candidate for their time and
         This method uses the language model to generate the interviewer's introduction,
         following the instructions provided in the INTRODUCTION_PROMPT.
 
+        If no persona is given, the cached persona for the job description and age category is used.
+        The turn and question modes are recorded in the state, so the interview can be continued
+        with the same ones.
+
         Args:
             state: The current state of the interview simulator.
 
         Returns:
             The updated state with the interviewer's introduction added to the messages list.
         """
-        messages = [
-            self._get_system_prompt(state),
-            HumanMessage(content=self.INTRODUCTION_PROMPT),
-        ]
+        persona = state.get("persona")
+        if not persona:
+            persona = self.persona_cache.get_or_generate(
+                self.model, state["job_description"], state["age_category"]
+            )
+            state = {**state, "persona": persona}
 
-        response = self.model.invoke(messages)
+        fitted = self._fit_prompt(state, "introduction", self.INTRODUCTION_PROMPT)
+        response = self.model.invoke(fitted["messages"], node="introduction")
 
-        return {"messages": [AIMessage(content=response.content)]}
+        return {
+            "messages": [AIMessage(content=response.content)],
+            "persona": persona,
+            "prompt_notes": fitted["dropped"],
+            "turn_mode": self.turn_mode,
+            "question_mode": self.question_mode,
+        }
 
     def should_end_or_review(
         self, state: InterviewSimulatorState
-    ) -> Literal["wrap_up", "pre_review_answer"]:
+    ) -> Literal[
+        "wrap_up", "pre_review_answer", "review_and_ask", "review_exam", "record_answer"
+    ]:
         """
         Determines whether to end the interview or review the candidate's answer.
 
         This method checks the last message from the candidate.
         If the message is "DONE", it returns "wrap_up" to indicate that the interview should end.
-        Otherwise, it returns "pre_review_answer" to indicate that the candidate's answer should be reviewed.
+        Otherwise, it returns "pre_review_answer" (or "review_and_ask" in merged turn mode)
+        to indicate that the candidate's answer should be reviewed. In mock exam mode it returns
+        "review_exam" or "record_answer" instead.
 
         Args:
             state: The current state of the interview simulator.
 
         Returns:
-            "wrap_up" or "pre_review_answer" depending on the candidate's last message.
+            The next node, depending on the candidate's last message and the turn mode.
         """
         last_response = state["messages"][-1]
         if last_response.content.upper() == "DONE":
-            return "wrap_up"
+            return "review_exam" if self.turn_mode == "mock_exam" else "wrap_up"
+        elif self.turn_mode == "mock_exam":
+            return "record_answer"
+        elif self.turn_mode == "merged":
+            return "review_and_ask"
         else:
             return "pre_review_answer"
 
@@ -208,31 +412,31 @@ The candidate has finished the interview. Thank the candidate for their time and
         Returns:
             The updated state with the interviewer's response added to the messages list.
         """
-        messages = [
-            self._get_system_prompt(state),
-        ]
-        if len(state["messages"]) > 0:
-            messages += state["messages"]
-
-        messages += [
-            HumanMessage(
-                content=self.REVIEW_ANSWER_PROMPT.format(
-                    question=state["last_question"],
-                    answer=state["messages"][-1].content,
-                )
-            )
-        ]
-
-        response = self.model.invoke(messages)
+        fitted = self._fit_prompt(
+            state,
+            "review_answer",
+            self.REVIEW_ANSWER_PROMPT.format(
+                question=state["last_question"],
+                answer=state["messages"][-1].content,
+            ),
+            history=state["messages"],
+        )
+        response = self.model.invoke(fitted["messages"], node="review_answer")
 
-        return {"messages": [AIMessage(content=response.content)]}
+        return {
+            "messages": [AIMessage(content=response.content)],
+            "prompt_notes": fitted["dropped"],
+        }
 
     def ask_question(self, state: InterviewSimulatorState) -> InterviewSimulatorState:
         """
         Generates the next interview question.
 
-        This method uses the language model to select and ask the next interview question,
-        following the instructions provided in the SELECT_AND_ASK_QUESTION_PROMPT.
+        In "llm" question mode, this method uses the language model to select and ask the next
+        interview question, following the instructions provided in the SELECT_AND_ASK_QUESTION_PROMPT.
+        Otherwise the question is picked by the local QuestionScheduler, and is either phrased by the
+        language model ("phrase") or asked word for word without a model call ("verbatim").
+        In mock exam mode, questions are always scheduled locally and asked word for word.
 
         Args:
             state: The current state of the interview simulator.
@@ -240,24 +444,151 @@ The candidate has finished the interview. Thank the candidate for their time and
         Returns:
             The updated state with the new question added to the messages list and stored as the last_question.
         """
-        messages = [
-            self._get_system_prompt(state),
-        ]
-        if len(state["messages"]) > 0:
-            messages += state["messages"]
-
-        messages += [
-            HumanMessage(
-                content=self.SELECT_AND_ASK_QUESTION_PROMPT.format(
-                    questions=state["interview_questions"],
-                )
+        if self.question_mode == "llm" and self.turn_mode != "mock_exam":
+            prompt = self.SELECT_AND_ASK_QUESTION_PROMPT.format(
+                questions=state["interview_questions"],
             )
-        ]
-
-        response = self.model.invoke(messages)
+            asked = []
+        else:
+            question = self._schedule_question(state)
+            if question is None:
+                return {
+                    "messages": [AIMessage(content=self.NO_MORE_QUESTIONS)],
+                    "last_question": None,
+                }
+            if self.question_mode == "verbatim" or self.turn_mode == "mock_exam":
+                return {
+                    "messages": [AIMessage(content=question)],
+                    "last_question": question,
+                    "asked_questions": [question],
+                }
+            prompt = self.PHRASE_QUESTION_PROMPT.format(question=question)
+            asked = [question]
+
+        fitted = self._fit_prompt(
+            state, "ask_question", prompt, history=state["messages"]
+        )
+        response = self.model.invoke(fitted["messages"], node="ask_question")
         return {
             "messages": [AIMessage(content=response.content)],
             "last_question": response.content,
+            "asked_questions": asked,
+            "prompt_notes": fitted["dropped"],
+        }
+
+    def review_and_ask(self, state: InterviewSimulatorState) -> InterviewSimulatorState:
+        """
+        Reviews the candidate's answer and asks the next question in a single model call.
+
+        This method is used in merged turn mode in place of review_answer followed by ask_question.
+        The model returns structured output holding both the feedback and the next question,
+        following the instructions provided in the REVIEW_AND_ASK_PROMPT. In "verbatim" question mode
+        the model only reviews the answer, and the scheduled question is appended word for word.
+
+        Args:
+            state: The current state of the interview simulator.
+
+        Returns:
+            The updated state with the feedback and the new question added to the messages list,
+            and the new question stored as the last_question.
+        """
+        question = None
+        if self.question_mode != "llm":
+            question = self._schedule_question(state)
+
+        if self.question_mode == "verbatim":
+            review = self.review_answer(state)
+            next_question = question or self.NO_MORE_QUESTIONS
+            return {
+                "messages": review["messages"] + [AIMessage(content=next_question)],
+                "last_question": question,
+                "asked_questions": [question] if question else [],
+            }
+
+        fitted = self._fit_prompt(
+            state,
+            "review_and_ask",
+            self.REVIEW_AND_ASK_PROMPT.format(
+                question=state["last_question"],
+                answer=state["messages"][-1].content,
+                ask_instructions=self._ask_instructions(state, question),
+            ),
+            history=state["messages"],
+        )
+        parsed_response = self.model.invoke_structured(
+            fitted["messages"], "review_and_ask", ReviewAndAsk
+        )
+        return {
+            "messages": [
+                AIMessage(content=parsed_response["feedback"]),
+                AIMessage(content=parsed_response["question"]),
+            ],
+            "last_question": parsed_response["question"],
+            "asked_questions": [question] if question else [],
+            "prompt_notes": fitted["dropped"],
+        }
+
+    def record_answer(self, state: InterviewSimulatorState) -> InterviewSimulatorState:
+        """
+        Records the candidate's answer to the last question, to be reviewed at the end of a mock exam.
+
+        Args:
+            state: The current state of the interview simulator.
+
+        Returns:
+            The updated state with the question and answer added to exam_answers.
+        """
+        if state.get("last_question") is None:
+            return {}
+        return {
+            "exam_answers": [
+                {
+                    "question": state["last_question"],
+                    "answer": state["messages"][-1].content,
+                }
+            ]
+        }
+
+    def review_exam(self, state: InterviewSimulatorState) -> InterviewSimulatorState:
+        """
+        Reviews all the answers of a mock exam concurrently, and reports the feedback.
+
+        Each answer is reviewed on its own, following the instructions provided in the
+        REVIEW_ANSWER_PROMPT, so the reviews do not depend on each other.
+
+        Args:
+            state: The current state of the interview simulator.
+
+        Returns:
+            The updated state with the feedback report added to the messages list.
+        """
+        answers = state.get("exam_answers") or []
+        if not answers:
+            return {"messages": [AIMessage(content=self.EXAM_NO_ANSWERS)]}
+
+        def review(answer: dict) -> tuple[str, List[str]]:
+            fitted = self._fit_prompt(
+                state,
+                "review_answer",
+                self.REVIEW_ANSWER_PROMPT.format(
+                    question=answer["question"], answer=answer["answer"]
+                ),
+            )
+            response = self.model.invoke(fitted["messages"], node="review_answer")
+            return response.content, fitted["dropped"]
+
+        with ThreadPoolExecutor(max_workers=self.review_concurrency) as executor:
+            reviews, notes = zip(*executor.map(review, answers))
+
+        sections = [self.EXAM_FEEDBACK_HEADER]
+        for i, (answer, feedback) in enumerate(zip(answers, reviews), start=1):
+            sections.append(
+                f"**Question {i}: {answer['question']}**\n\n"
+                f"*Your answer:* {answer['answer']}\n\n{feedback}"
+            )
+        return {
+            "messages": [AIMessage(content="\n\n".join(sections))],
+            "prompt_notes": [note for dropped in notes for note in dropped],
         }
 
     def wrap_up(self, state: InterviewSimulatorState) -> InterviewSimulatorState:
@@ -273,16 +604,12 @@ The candidate has finished the interview. Thank the candidate for their time and
         Returns:
             The updated state with the interviewer's closing remarks added to the messages list and the ended flag set to True.
         """
-        messages = [
-            self._get_system_prompt(state),
-        ]
-        if len(state["messages"]) > 0:
-            messages += state["messages"]
-
-        messages += [HumanMessage(content=self.WRAP_UP_PROMPT)]
-
-        response = self.model.invoke(messages)
+        fitted = self._fit_prompt(
+            state, "wrap_up", self.WRAP_UP_PROMPT, history=state["messages"]
+        )
+        response = self.model.invoke(fitted["messages"], node="wrap_up")
         return {
             "messages": [AIMessage(content=response.content)],
             "ended": True,
+            "prompt_notes": fitted["dropped"],
         }
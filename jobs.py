@@ -0,0 +1,228 @@
+# /resume-app/jobs.py
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Literal
+
+import streamlit as st
+
+from profiling import maybe_profile
+
+JobStatus = Literal["pending", "running", "done", "failed"]
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class Job:
+    """
+    A class representing a unit of work submitted to the JobExecutor.
+
+    Attributes:
+        id: The job id.
+        kind: A short label for the kind of job, e.g. "screening".
+        status: One of "pending", "running", "done" or "failed".
+        steps: The names of the steps completed so far.
+        result: The result of the job, once done.
+        profile: The profile report, if the job was profiled.
+        error: The error message, if the job failed.
+        submitted: When the job was submitted.
+        started: When the job started running.
+        finished: When the job finished.
+    """
+
+    def __init__(self, kind: str):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.status: JobStatus = "pending"
+        self.steps: List[str] = []
+        self.result: Any = None
+        self.profile: dict | None = None
+        self.error: str | None = None
+        self.submitted = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+
+    def report(self, step: str):
+        """
+        Records that a step of the job has completed.
+
+        Args:
+            step: The name of the step.
+        """
+        self.steps.append(step)
+
+    @property
+    def error_line(self) -> str:
+        """
+        The last line of the error, naming the exception, or an empty string.
+        """
+        return "".join((self.error or "").strip().splitlines()[-1:])
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobExecutor:
+    """
+    A process-wide executor that runs model work off the Streamlit script thread.
+
+    Jobs run on a bounded worker pool and are held by id, so a session can poll their status,
+    and a rerun or reconnect picks up a finished job instead of starting over.
+    Only the most recent finished jobs are kept.
+    """
+
+    def __init__(self, max_workers: int = 4, max_finished_jobs: int = 500):
+        """
+        Initializes the JobExecutor class.
+
+        Args:
+            max_workers: The number of jobs that can run at once. Other jobs wait as pending.
+            max_finished_jobs: The number of finished jobs whose results are kept.
+        """
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="resume-app-job"
+        )
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[[Job], Any], profile: bool = False) -> str:
+        """
+        Submits a job.
+
+        Args:
+            kind: A short label for the kind of job.
+            fn: The work to run. It is passed the Job, so it can report completed steps.
+            profile: Whether to profile the run, see profiling.py.
+
+        Returns:
+            The job id.
+        """
+        job = Job(kind)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self.executor.submit(self._run, job, fn, profile)
+        return job.id
+
+    def submit_graph(
+        self,
+        kind: str,
+        graph,
+        input: dict,
+        config: dict | None = None,
+        profile: bool = False,
+    ) -> str:
+        """
+        Submits a job that runs a compiled graph, reporting each node as a completed step.
+
+        Args:
+            kind: A short label for the kind of job.
+            graph: The compiled graph.
+            input: The graph input.
+            config: The graph config, e.g. a thread.
+            profile: Whether to profile the run, see profiling.py.
+
+        Returns:
+            The job id. The result of the job is the final graph state.
+        """
+
+        def run(job: Job):
+            state = None
+            for mode, chunk in graph.stream(
+                input, config, stream_mode=["updates", "values"]
+            ):
+                if mode == "updates":
+                    for node in chunk:
+                        job.report(node)
+                else:
+                    state = chunk
+            return state
+
+        return self.submit(kind, run, profile=profile)
+
+    def get(self, job_id: str | None) -> Job | None:
+        """
+        Returns a job by id.
+
+        Args:
+            job_id: The job id.
+
+        Returns:
+            The job, or None if it is unknown or has been pruned.
+        """
+        if job_id is None:
+            return None
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job: Job, fn: Callable[[Job], Any], profile: bool):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            with maybe_profile(job.kind, profile) as report:
+                job.result = fn(job)
+            job.profile = report or None
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{e}\n{traceback.format_exc()}"
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+
+    def _prune(self):
+        finished = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.status not in ACTIVE_STATUSES
+        ]
+        for job_id in finished[: max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+
+@st.cache_resource
+def get_job_executor() -> JobExecutor:
+    return JobExecutor()
+
+
+def remember_job(name: str, job_id: str):
+    # The query parameter lets a reloaded page pick up the job in a new session
+    st.session_state[name] = job_id
+    st.query_params[name] = job_id
+
+
+def recall_job(name: str) -> Job | None:
+    job_id = st.session_state.get(name) or st.query_params.get(name)
+    return get_job_executor().get(job_id)
+
+
+def forget_job(name: str):
+    if name in st.session_state:
+        del st.session_state[name]
+    if name in st.query_params:
+        del st.query_params[name]
+
+
+@st.fragment(run_every=1.0)
+def render_job_progress(name: str, label: str):
+    """
+    Shows the progress of a running job, polling until it finishes.
+
+    Once the job has finished, the whole app is rerun so the tabs can render its result.
+
+    Args:
+        name: The name the job was remembered under.
+        label: The label shown while the job runs.
+    """
+    job = recall_job(name)
+    if job is None or job.status not in ACTIVE_STATUSES:
+        st.rerun()
+        return
+
+    steps = ", ".join(job.steps) if job.steps else "waiting to start"
+    st.info(f"{label} ({job.status}, {job.elapsed:.0f}s): {steps}")
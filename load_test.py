@@ -0,0 +1,443 @@
+# /resume-app/load_test.py
+import argparse
+import json
+import os
+import resource
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from mock_llm_server import MockLLMServer, use_server
+
+INTERVIEW_ANSWERS = [
+    "I would start by clarifying the requirements and the expected load.",
+    "In my last role I led the migration of a monolith to services.",
+    "I would add caching in front of the slowest queries.",
+]
+
+
+def _rss_mb() -> float:
+    """
+    Returns the resident memory of this process, in MB.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError):
+        # Not on Linux, fall back to the peak so far (KB on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _app_threads() -> int:
+    # Threads of an in-process stand-in server are not part of the app
+    return sum(
+        1
+        for thread in threading.enumerate()
+        if "process_request_thread" not in thread.name
+        and "serve_forever" not in thread.name
+    )
+
+
+class StepRecorder:
+    """
+    Collects the latency and outcome of each step run by the simulated sessions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.steps: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, List[str]] = defaultdict(list)
+
+    def record(self, step: str, latency: float, error: str | None = None):
+        with self._lock:
+            if error is None:
+                self.steps[step].append(latency)
+            else:
+                self.errors[step].append(error)
+
+    def summary(self) -> List[dict]:
+        from model_router import percentile
+
+        rows = []
+        with self._lock:
+            names = sorted(set(self.steps) | set(self.errors))
+            for step in names:
+                latencies = sorted(self.steps[step])
+                errors = len(self.errors[step])
+                total = len(latencies) + errors
+                rows.append(
+                    {
+                        "step": step,
+                        "count": total,
+                        "error_rate": errors / total if total else 0.0,
+                        "p50": percentile(latencies, 50),
+                        "p95": percentile(latencies, 95),
+                        "p99": percentile(latencies, 99),
+                        "max": latencies[-1] if latencies else 0.0,
+                    }
+                )
+        return rows
+
+
+class ResourceSampler:
+    """
+    Samples the memory and thread count of the process on a background thread.
+    """
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.rss_peak_mb = 0.0
+        self.threads_peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.rss_peak_mb = max(self.rss_peak_mb, _rss_mb())
+            self.threads_peak = max(self.threads_peak, _app_threads())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "ResourceSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class LoadTest:
+    """
+    Simulates concurrent users running the full flow of the app against a model endpoint.
+
+    Each session uploads a resume and runs the fit check, tunes the resume, then has a multi-turn
+    interview. The fit check and tuning are submitted to a shared JobExecutor and polled, as the
+    tabs do, and the interview runs on the session's own thread with a shared checkpointer, as it
+    does on the Streamlit script thread. Agents, caches and the executor are shared by all
+    sessions, as they are by the sessions of one app instance.
+    """
+
+    def __init__(
+        self,
+        path_to_resume: str,
+        job_description: str,
+        directory: str,
+        interview_turns: int = 2,
+        job_workers: int = 4,
+        poll_interval: float = 0.1,
+        distinct_postings: bool = True,
+    ):
+        """
+        Initializes the LoadTest class.
+
+        Args:
+            path_to_resume: The path to the resume pdf.
+            job_description: The job description text.
+            directory: A scratch directory for resume copies and caches.
+            interview_turns: The number of answers given before ending each interview.
+            job_workers: The number of workers of the shared JobExecutor, as in the app.
+            poll_interval: How often sessions check on their background jobs.
+            distinct_postings: Give each session its own posting and criteria library, so no
+                session is served from another's cached criteria, verdicts or persona.
+        """
+        from langgraph.checkpoint.sqlite import SqliteSaver
+
+        from interview_simulator import InterviewSimulator
+        from jobs import JobExecutor
+        from persona_cache import PersonaCache
+        from resume_doctor import ResumeDoctor
+
+        self.path_to_resume = path_to_resume
+        self.job_description = job_description
+        self.directory = directory
+        self.interview_turns = interview_turns
+        self.poll_interval = poll_interval
+        self.distinct_postings = distinct_postings
+
+        self.executor = JobExecutor(max_workers=job_workers)
+        self.screener = self._new_screener(os.path.join(directory, "criteria.sqlite"))
+        self.resume_doctor = ResumeDoctor(
+            persona_cache=PersonaCache(path=os.path.join(directory, "personas.sqlite"))
+        )
+        self.interviewer = InterviewSimulator(
+            checkpointer=SqliteSaver(
+                sqlite3.connect(":memory:", check_same_thread=False)
+            )
+        )
+
+    def _new_screener(self, library_path: str):
+        from criteria_library import CriteriaLibrary
+        from resume_screener import ResumeScreener
+
+        return ResumeScreener(criteria_library=CriteriaLibrary(path=library_path))
+
+    def _timed(self, recorder: StepRecorder, step: str, fn, *args):
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            recorder.record(step, 0.0, f"{type(e).__name__}: {e}")
+            raise
+        recorder.record(step, time.perf_counter() - start)
+        return result
+
+    def _run_job(self, recorder: StepRecorder, kind: str, graph, input: dict) -> dict:
+        job_id = self.executor.submit_graph(kind, graph, input)
+        job = self.executor.get(job_id)
+        while job.status not in ("done", "failed"):
+            time.sleep(self.poll_interval)
+        if job.started is not None:
+            recorder.record(f"{kind}_queue_wait", job.started - job.submitted)
+        if job.status == "failed":
+            raise RuntimeError(job.error_line)
+        return job.result
+
+    def run_session(self, recorder: StepRecorder):
+        """
+        Runs the full flow for one simulated user.
+        """
+        from langchain_core.messages import HumanMessage
+
+        job_description = self.job_description
+        screener = self.screener
+        library_path = None
+        if self.distinct_postings:
+            job_description += f"\n\nRequisition {uuid.uuid4().hex[:8]}"
+            # Every session screens the same resume, so a shared library would serve the
+            # verdicts of equivalent criteria from another session's cache
+            library_path = os.path.join(
+                self.directory, f"criteria-{uuid.uuid4().hex}.sqlite"
+            )
+            screener = self._new_screener(library_path)
+
+        # The screener removes the resume after parsing it, so upload a copy
+        resume_copy = os.path.join(self.directory, f"resume-{uuid.uuid4().hex}.pdf")
+        start = time.perf_counter()
+        try:
+            shutil.copy(self.path_to_resume, resume_copy)
+            screening = self._timed(
+                recorder,
+                "fit_check",
+                self._run_job,
+                recorder,
+                "screening",
+                screener.graph,
+                {
+                    "path_to_resume": resume_copy,
+                    "job_description": job_description,
+                    "criteria": None,
+                    "num_auto_generated_criteria": 3,
+                },
+            )
+            tuning = self._timed(
+                recorder,
+                "tuning",
+                self._run_job,
+                recorder,
+                "tuning",
+                self.resume_doctor.graph,
+                {
+                    "resume_id": screening["resume_id"],
+                    "job_description": job_description,
+                    "age_category": "GenX",
+                },
+            )
+
+            thread = {"configurable": {"thread_id": str(uuid.uuid4())}}
+            self._timed(
+                recorder,
+                "interview_start",
+                self.interviewer.graph.invoke,
+                {
+                    "resume_id": screening["resume_id"],
+                    "job_description": job_description,
+                    "persona": tuning["persona"],
+                    "interview_questions": tuning["interview_questions"],
+                    "last_question": None,
+                },
+                thread,
+            )
+            answers = [
+                INTERVIEW_ANSWERS[i % len(INTERVIEW_ANSWERS)]
+                for i in range(self.interview_turns)
+            ]
+            for answer in answers + ["DONE"]:
+
+                def turn():
+                    self.interviewer.graph.update_state(
+                        thread,
+                        {"messages": [HumanMessage(content=answer)]},
+                        as_node="ask_question",
+                    )
+                    self.interviewer.graph.invoke(None, thread)
+
+                step = "interview_end" if answer == "DONE" else "interview_turn"
+                self._timed(recorder, step, turn)
+            recorder.record("session", time.perf_counter() - start)
+        except Exception:
+            recorder.record(
+                "session", 0.0, traceback.format_exc(limit=1).strip().splitlines()[-1]
+            )
+        finally:
+            for path in (resume_copy, library_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    def run_level(self, concurrency: int, sessions: int) -> dict:
+        """
+        Runs a number of sessions, with a given number of users active at once.
+
+        Args:
+            concurrency: The number of sessions running at the same time.
+            sessions: The total number of sessions.
+
+        Returns:
+            The step latencies and error rates, peak memory and threads, and throughput.
+        """
+        recorder = StepRecorder()
+        start = time.perf_counter()
+        with ResourceSampler() as sampler:
+            with ThreadPoolExecutor(
+                max_workers=concurrency, thread_name_prefix="load-test-session"
+            ) as users:
+                for _ in range(sessions):
+                    users.submit(self.run_session, recorder)
+        elapsed = time.perf_counter() - start
+        steps = recorder.summary()
+        completed = next(
+            (
+                row["count"] * (1 - row["error_rate"])
+                for row in steps
+                if row["step"] == "session"
+            ),
+            0,
+        )
+        return {
+            "concurrency": concurrency,
+            "sessions": sessions,
+            "elapsed": elapsed,
+            "sessions_per_minute": completed * 60 / elapsed if elapsed else 0.0,
+            "rss_peak_mb": sampler.rss_peak_mb,
+            "threads_peak": sampler.threads_peak,
+            "steps": steps,
+        }
+
+
+def print_report(level: dict):
+    print(
+        f"\n== {level['concurrency']} concurrent sessions: {level['sessions']} sessions in "
+        f"{level['elapsed']:.1f}s, {level['sessions_per_minute']:.1f}/min, "
+        f"peak RSS {level['rss_peak_mb']:.0f} MB, peak threads {level['threads_peak']}"
+    )
+    print(f"{'step':24} {'count':>6} {'errors':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for row in level["steps"]:
+        print(
+            f"{row['step']:24} {row['count']:>6} {row['error_rate']:>7.1%} "
+            f"{row['p50']:>8.2f} {row['p95']:>8.2f} {row['p99']:>8.2f}"
+        )
+
+
+def main():
+    """
+    Command line entry point for the load test.
+
+    Examples:
+        python load_test.py data/john-doe-resume.pdf data/full-stack-engineer-jd.txt
+        python load_test.py resume.pdf jd.txt --concurrency 1 4 16 32 --ttft 0.5 --latency 2
+        python load_test.py resume.pdf jd.txt --base-url http://localhost:8000/v1 --json
+    """
+    parser = argparse.ArgumentParser(
+        description="Simulate concurrent users of the app against a stand-in model endpoint"
+    )
+    parser.add_argument("resume", help="Path to the resume pdf")
+    parser.add_argument("job_description", help="Path to the job description text file")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16],
+        help="The numbers of concurrent sessions to ramp through",
+    )
+    parser.add_argument(
+        "--sessions-per-user",
+        type=int,
+        default=2,
+        help="Sessions run at each level, per concurrent session",
+    )
+    parser.add_argument("--interview-turns", type=int, default=2)
+    parser.add_argument(
+        "--job-workers",
+        type=int,
+        default=4,
+        help="Workers of the background job executor, 4 in the app",
+    )
+    parser.add_argument(
+        "--shared-postings",
+        action="store_true",
+        help="Screen every session against the same posting, so caches are shared",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=None,
+        help="Use a stand-in server that is already running, instead of one in this process",
+    )
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.7)
+    parser.add_argument("--straggler-rate", type=float, default=0.0)
+    parser.add_argument("--straggler-delay", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="Print the report as json")
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url:
+        os.environ["NVIDIA_BASE_URL"] = args.base_url
+        os.environ.setdefault("NVIDIA_API_KEY", "mock")
+        import utils
+
+        utils.NVIDIA_BASE_URL = args.base_url
+    else:
+        server = MockLLMServer(
+            ttft=args.ttft,
+            latency=args.latency,
+            straggler_rate=args.straggler_rate,
+            straggler_delay=args.straggler_delay,
+        ).start()
+        use_server(server)
+
+    with open(args.job_description, "r") as f:
+        job_description = f.read()
+
+    levels = []
+    with tempfile.TemporaryDirectory() as directory:
+        load_test = LoadTest(
+            args.resume,
+            job_description,
+            directory,
+            interview_turns=args.interview_turns,
+            job_workers=args.job_workers,
+            distinct_postings=not args.shared_postings,
+        )
+        for concurrency in args.concurrency:
+            level = load_test.run_level(
+                concurrency, concurrency * args.sessions_per_user
+            )
+            levels.append(level)
+            if not args.json:
+                print_report(level)
+
+    if args.json:
+        print(json.dumps(levels, indent=2))
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 # /resume-app/main.py
 from interview_simulation_tab import render_interview_simulation_tab
+from model_router import metrics
+from profiling import PROFILE_TOGGLE_KEY, recent_profiles
 from resume_matching_tab import render_resume_matching_tab
+import os
 import streamlit as st
 
 from resume_tuning_tab import render_resume_tuning_tab
@@ -22,6 +25,41 @@ with st.sidebar:
     if api_key:
         st.session_state["NVIDIA_API_KEY"] = api_key
 
+    with st.expander("Model usage"):
+        st.caption(
+            "Latency (seconds), tokens and estimated cost (USD) per node, "
+            "for this server process. Latency percentiles cover the last "
+            f"{metrics.window} calls of each node."
+        )
+        st.dataframe(metrics.summary(), hide_index=True)
+
+    with st.expander("Profiling"):
+        st.toggle(
+            "Profile runs",
+            key=PROFILE_TOGGLE_KEY,
+            help="Profile each screening, tuning and interview run. "
+            "Also switched on for every run by RESUME_APP_PROFILE=1.",
+        )
+        profiles = recent_profiles()
+        if profiles:
+            profile = profiles[0]
+            stats = (
+                f"cProfile stats in {profile['stats_path']}."
+                if profile["stats_path"]
+                else "no cProfile stats, as another run held the profiler."
+            )
+            st.caption(
+                f"Latest run: {profile['name']}, {profile['elapsed']:.2f} seconds. "
+                f"Flamegraph stacks in {profile['collapsed_path']}, {stats}"
+            )
+            st.dataframe(profile["summary"], hide_index=True)
+            with open(profile["collapsed_path"], "rb") as f:
+                st.download_button(
+                    "Download flamegraph stacks",
+                    f,
+                    file_name=os.path.basename(profile["collapsed_path"]),
+                )
+
 
 def main():
     """
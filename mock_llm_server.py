@@ -0,0 +1,454 @@
+# /resume-app/mock_llm_server.py
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prefix caches in serving stacks work on fixed-size blocks of the prompt, chained by hash
+PREFIX_BLOCK_SIZE = 64
+
+
+class PrefixCacheStats:
+    """
+    A class that measures how much of each prompt could be served from a prefix cache.
+
+    Prompts are split into fixed-size blocks, and each block is hashed together with the blocks
+    before it, the way serving stacks with automatic prefix caching do. A block is a hit when the
+    same chain of blocks has been seen in an earlier prompt.
+    """
+
+    def __init__(self, block_size: int = PREFIX_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._seen = set()
+            self.requests = 0
+            self.prompt_chars = 0
+            self.cached_chars = 0
+
+    def observe(self, prompt: str) -> int:
+        """
+        Records a prompt and returns the number of leading characters that were already cached.
+
+        Args:
+            prompt: The rendered prompt.
+
+        Returns:
+            The number of cached characters.
+        """
+        digest = hashlib.sha256()
+        cached = 0
+        missed = False
+        with self._lock:
+            for start in range(0, len(prompt), self.block_size):
+                block = prompt[start : start + self.block_size]
+                digest.update(block.encode("utf-8"))
+                key = digest.hexdigest()
+                if not missed and key in self._seen and len(block) == self.block_size:
+                    cached += len(block)
+                else:
+                    missed = True
+                    self._seen.add(key)
+            self.requests += 1
+            self.prompt_chars += len(prompt)
+            self.cached_chars += cached
+        return cached
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "prompt_chars": self.prompt_chars,
+                "cached_chars": self.cached_chars,
+                "hit_rate": (
+                    self.cached_chars / self.prompt_chars if self.prompt_chars else 0.0
+                ),
+            }
+
+
+def render_prompt(messages: list[dict]) -> str:
+    """
+    Renders chat messages into a single prompt, the way a chat template would.
+
+    Args:
+        messages: The OpenAI style chat messages.
+
+    Returns:
+        The prompt string.
+    """
+    return "".join(
+        f"<|{message.get('role', 'user')}|>\n{message.get('content') or ''}\n"
+        for message in messages
+    )
+
+
+def canned_response(messages: list[dict]) -> str:
+    """
+    Returns a plausible response for the prompts used by the agents in this app.
+
+    Args:
+        messages: The OpenAI style chat messages.
+
+    Returns:
+        The response text.
+    """
+    last = (messages[-1].get("content") or "") if messages else ""
+    if "generate not more than" in last:
+        count = re.search(r"not more than (\d+)", last)
+        count = int(count.group(1)) if count else 3
+        return json.dumps([f"Mock criterion {i + 1}" for i in range(count)])
+    if '"feedback"' in last:
+        return json.dumps(
+            {
+                "feedback": "That is a solid answer.",
+                "question": "Tell me about a recent project.",
+            }
+        )
+    if '"decision"' in last:
+        return json.dumps({"decision": "pass", "reason": "Mock reason."})
+    if "json list of edit operations" in last:
+        return json.dumps([{"op": "reword_summary", "text": "Mock summary."}])
+    if "interview questions" in last:
+        return json.dumps(
+            {
+                "design": ["How would you design a URL shortener?"],
+                "coding": ["How do you reverse a linked list?", "What is a closure?"],
+            }
+        )
+    return "This is a mock response from the local stand-in server."
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """
+    Handles OpenAI compatible /v1/models and /v1/chat/completions requests, plus /stats.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(
+                {
+                    "object": "list",
+                    "data": [
+                        {
+                            "id": self.server.model_name,
+                            "object": "model",
+                            "owned_by": "mock",
+                        }
+                    ],
+                }
+            )
+        elif self.path.rstrip("/").endswith("/stats"):
+            self._send_json(self.server.prefix_stats.snapshot())
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path.rstrip("/").endswith("/stats/reset"):
+            self.server.prefix_stats.reset()
+            self._send_json({"ok": True})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        messages = request.get("messages", [])
+        prompt = render_prompt(messages)
+        cached_chars = self.server.prefix_stats.observe(prompt)
+        content = canned_response(messages)
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (len(prompt) + len(content)) // 4,
+            "prompt_tokens_details": {"cached_tokens": cached_chars // 4},
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get("model", self.server.model_name)
+
+        time.sleep(self.server.first_token_delay())
+        if request.get("stream"):
+            self._stream(completion_id, model, content, usage)
+            return
+
+        time.sleep(self.server.latency)
+        self._send_json(
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+        )
+
+    def _stream(self, completion_id: str, model: str, content: str, usage: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        pieces = re.findall(r"\S+\s*", content) or [content]
+        for i, piece in enumerate(pieces):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": piece},
+                        "finish_reason": "stop" if i == len(pieces) - 1 else None,
+                    }
+                ],
+            }
+            if i == len(pieces) - 1:
+                chunk["usage"] = usage
+            try:
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading, e.g. a hedged request that lost the race
+                self.close_connection = True
+                return
+            time.sleep(self.server.latency / len(pieces))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the model endpoint, returning canned responses with configurable latency.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        model_name: str = "meta/llama3-70b-instruct",
+        latency: float = 0.0,
+        ttft: float = 0.0,
+        straggler_rate: float = 0.0,
+        straggler_delay: float = 0.0,
+    ):
+        """
+        Initializes the MockLLMServer class.
+
+        Args:
+            port: The port to listen on. 0 picks a free port.
+            model_name: The model name reported by /v1/models.
+            latency: Seconds spent generating each response, after the first token.
+            ttft: Seconds before the first token of each response.
+            straggler_rate: The share of responses whose first token is delayed further.
+            straggler_delay: The extra seconds before the first token of a straggler.
+        """
+        super().__init__(("127.0.0.1", port), MockLLMHandler)
+        self.model_name = model_name
+        self.latency = latency
+        self.ttft = ttft
+        self.straggler_rate = straggler_rate
+        self.straggler_delay = straggler_delay
+        self.prefix_stats = PrefixCacheStats()
+
+    def first_token_delay(self) -> float:
+        if self.straggler_rate and random.random() < self.straggler_rate:
+            return self.ttft + self.straggler_delay
+        return self.ttft
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """
+        Serves requests on a background thread.
+
+        Returns:
+            The server itself.
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def use_server(server: MockLLMServer):
+    """
+    Points the agents in this process at the stand-in server.
+
+    Args:
+        server: The running server.
+    """
+    import utils
+
+    os.environ["NVIDIA_BASE_URL"] = server.base_url
+    os.environ.setdefault("NVIDIA_API_KEY", "mock")
+    utils.NVIDIA_BASE_URL = server.base_url
+
+
+def run_probe(path_to_resume: str, path_to_job_description: str) -> dict:
+    """
+    Runs all three agents for one candidate against the stand-in server, and measures how much
+    of their prompts could be served from a shared prefix cache.
+
+    Args:
+        path_to_resume: The path to the resume pdf.
+        path_to_job_description: The path to the job description text file.
+
+    Returns:
+        The prefix cache statistics, and the model metrics per node.
+    """
+    server = MockLLMServer().start()
+    use_server(server)
+
+    from langchain_core.messages import HumanMessage
+    from langgraph.checkpoint.memory import MemorySaver
+
+    from criteria_library import CriteriaLibrary
+    from interview_simulator import InterviewSimulator
+    from persona_cache import PersonaCache
+    from resume_doctor import ResumeDoctor
+    from resume_screener import ResumeScreener
+    from resume_store import ResumeStore
+
+    with open(path_to_job_description, "r") as f:
+        job_description = f.read()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The screener removes the resume after parsing it, so work on a copy
+        resume_copy = os.path.join(directory, os.path.basename(path_to_resume))
+        shutil.copy(path_to_resume, resume_copy)
+        # Fresh caches, so every run sends the same requests
+        criteria_library = CriteriaLibrary(
+            path=os.path.join(directory, "criteria.sqlite")
+        )
+        resume_store = ResumeStore(path=os.path.join(directory, "resumes.sqlite"))
+        screening = ResumeScreener(
+            criteria_library=criteria_library, resume_store=resume_store
+        ).graph.invoke(
+            {
+                "path_to_resume": resume_copy,
+                "job_description": job_description,
+                "criteria": None,
+                "num_auto_generated_criteria": 3,
+            }
+        )
+
+        persona_cache = PersonaCache(path=os.path.join(directory, "personas.sqlite"))
+        tuning = ResumeDoctor(
+            persona_cache=persona_cache, resume_store=resume_store
+        ).graph.invoke(
+            {
+                "resume_id": screening["resume_id"],
+                "job_description": job_description,
+                "age_category": "GenX",
+            }
+        )
+
+        interviewer = InterviewSimulator(
+            checkpointer=MemorySaver(), resume_store=resume_store
+        )
+        thread = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        interviewer.graph.invoke(
+            {
+                "resume_id": screening["resume_id"],
+                "job_description": job_description,
+                "persona": tuning["persona"],
+                "interview_questions": tuning["interview_questions"],
+                "last_question": None,
+            },
+            thread,
+        )
+        for answer in ["I would start by clarifying the requirements.", "DONE"]:
+            interviewer.graph.update_state(
+                thread,
+                {"messages": [HumanMessage(content=answer)]},
+                as_node="ask_question",
+            )
+            interviewer.graph.invoke(None, thread)
+
+    from model_router import metrics
+
+    stats = {**server.prefix_stats.snapshot(), "nodes": metrics.summary()}
+    server.shutdown()
+    return stats
+
+
+def main():
+    """
+    Command line entry point.
+
+    Examples:
+        python mock_llm_server.py serve --port 8000 --latency 1.5
+        python mock_llm_server.py probe data/john-doe-resume.pdf data/full-stack-engineer-jd.txt
+    """
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the model endpoint"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="Serve canned responses")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--latency", type=float, default=0.0)
+    serve.add_argument("--ttft", type=float, default=0.0)
+    serve.add_argument("--straggler-rate", type=float, default=0.0)
+    serve.add_argument("--straggler-delay", type=float, default=0.0)
+
+    probe = subparsers.add_parser(
+        "probe", help="Measure the shared prefix hit rate across all agents"
+    )
+    probe.add_argument("resume", help="Path to the resume pdf")
+    probe.add_argument("job_description", help="Path to the job description text file")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        server = MockLLMServer(
+            port=args.port,
+            latency=args.latency,
+            ttft=args.ttft,
+            straggler_rate=args.straggler_rate,
+            straggler_delay=args.straggler_delay,
+        )
+        print(f"Serving on {server.base_url}, set NVIDIA_BASE_URL to use it")
+        server.serve_forever()
+    elif args.command == "probe":
+        stats = run_probe(args.resume, args.job_description)
+        print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
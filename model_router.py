@@ -0,0 +1,570 @@
+# /resume-app/model_router.py
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List
+
+from langchain_core.messages import AIMessage, AnyMessage, BaseMessage, HumanMessage
+
+from prompt_budget import PromptTooLargeError, estimate_message_tokens, input_budget
+from structured_output import (
+    MAX_REASKS,
+    REASK_PROMPT,
+    StructuredOutputError,
+    parse_structured,
+)
+from utils import content_hash, get_api_key, get_model, model_name
+
+FAST_MODEL_NAME = "meta/llama3-8b-instruct"
+
+# Cheap, fast models handle extraction and simple pass/fail verdicts. The large model is kept for
+# the decision explanation, the persona, the rewrite and the interview. Nodes not listed use model_name.
+# Override with a json object in the RESUME_APP_MODEL_ROUTES environment variable.
+DEFAULT_MODEL_ROUTES = {
+    "generate_criteria": FAST_MODEL_NAME,
+    "evaluate_criteria": FAST_MODEL_NAME,
+    "explain_decision": model_name,
+    "generate_persona": model_name,
+    "update_resume": model_name,
+    "generate_interview_questions": model_name,
+}
+
+# USD per million (input, output) tokens, used to estimate the cost per node. These are rough
+# list prices; set RESUME_APP_MODEL_PRICES to a json object with your own rates.
+DEFAULT_MODEL_PRICES = {
+    FAST_MODEL_NAME: (0.2, 0.2),
+    model_name: (0.9, 0.9),
+}
+
+
+# Hedging sends a duplicate request when the first token is slower than this percentile of recent
+# first-token latencies for the model. 0 turns hedging off. Duplicates are capped at HEDGE_BUDGET
+# of all requests, and only sent once HEDGE_MIN_SAMPLES latencies have been seen.
+HEDGE_PERCENTILE = float(os.environ.get("RESUME_APP_HEDGE_PERCENTILE", 0))
+HEDGE_BUDGET = float(os.environ.get("RESUME_APP_HEDGE_BUDGET", 0.05))
+HEDGE_MIN_SAMPLES = 20
+
+# Identical requests in flight at the same time share one upstream call. Set to 0 to turn off.
+SINGLE_FLIGHT = os.environ.get("RESUME_APP_SINGLE_FLIGHT", "1") != "0"
+
+
+def _load_json_env(name: str, default: dict) -> dict:
+    value = os.environ.get(name)
+    if not value:
+        return dict(default)
+    return {**default, **json.loads(value)}
+
+
+class ModelMetrics:
+    """
+    A process-wide record of the latency, tokens and estimated cost of model calls, per node and model.
+
+    Counts, tokens and cost are kept as running totals. Latency percentiles are computed over the
+    most recent calls of each node and model, so memory stays bounded for the life of the server.
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Initializes the ModelMetrics class.
+
+        Args:
+            window: The number of recent calls per node and model kept for latency percentiles.
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.totals: Dict[tuple, Counter] = defaultdict(Counter)
+            self.recent: Dict[tuple, Deque[float]] = defaultdict(
+                lambda: deque(maxlen=self.window)
+            )
+
+    def record(
+        self,
+        node: str,
+        model: str,
+        latency: float,
+        input_tokens: int,
+        output_tokens: int,
+        cost: float,
+        hedged: bool = False,
+        hedge_won: bool = False,
+        primary_failed: bool = False,
+        coalesced: bool = False,
+        reask: bool = False,
+    ):
+        """
+        Records a model call.
+
+        Args:
+            hedged: Whether a duplicate request was sent.
+            hedge_won: Whether the duplicate request finished first, while the first was still running.
+            primary_failed: Whether the first request failed, and the duplicate answered instead.
+            coalesced: Whether the call shared the result of an identical request in flight.
+            reask: Whether the call asked again for output that could not be read.
+        """
+        with self._lock:
+            totals = self.totals[(node, model)]
+            totals.update(
+                calls=1,
+                latency=latency,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                cost=cost,
+                hedged=int(hedged),
+                hedge_wins=int(hedge_won),
+                primary_errors=int(primary_failed),
+                coalesced=int(coalesced),
+                reasks=int(reask),
+            )
+            self.recent[(node, model)].append(latency)
+
+    def summary(self) -> List[dict]:
+        """
+        Returns one row per node and model, with call counts, latency percentiles, tokens and cost.
+
+        Hedged calls are counted, along with the races the duplicate won and the calls it answered
+        because the first request failed.
+        """
+        with self._lock:
+            totals = {key: Counter(values) for key, values in self.totals.items()}
+            recent = {key: sorted(values) for key, values in self.recent.items()}
+
+        rows = []
+        for (node, model), total in sorted(totals.items()):
+            latencies = recent[(node, model)]
+            rows.append(
+                {
+                    "node": node,
+                    "model": model,
+                    "calls": total["calls"],
+                    "coalesced": total["coalesced"],
+                    "reasks": total["reasks"],
+                    "mean_latency": total["latency"] / total["calls"],
+                    "p50_latency": percentile(latencies, 50),
+                    "p95_latency": percentile(latencies, 95),
+                    "hedged": total["hedged"],
+                    "hedge_wins": total["hedge_wins"],
+                    "primary_errors": total["primary_errors"],
+                    "input_tokens": total["input_tokens"],
+                    "output_tokens": total["output_tokens"],
+                    "cost": total["cost"],
+                }
+            )
+        return rows
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+metrics = ModelMetrics()
+
+
+class HedgePolicy:
+    """
+    Decides when to send a duplicate of a slow model request.
+
+    Keeps a window of recent first-token latencies per model. A duplicate is sent when the first
+    token takes longer than the configured percentile of that window, as long as the duplicates
+    sent stay within the budget, a share of all requests.
+    """
+
+    def __init__(
+        self,
+        percentile: float = HEDGE_PERCENTILE,
+        budget: float = HEDGE_BUDGET,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        window: int = 200,
+    ):
+        """
+        Initializes the HedgePolicy class.
+
+        Args:
+            percentile: The percentile of recent first-token latencies to wait before hedging.
+                0 turns hedging off.
+            budget: The largest share of requests that may be duplicated.
+            min_samples: The number of latencies needed before hedging starts.
+            window: The number of recent latencies kept per model.
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.window = window
+        self._lock = threading.Lock()
+        self.first_token_latencies: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=self.window)
+        )
+        self.requests = 0
+        self.hedges = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.percentile > 0
+
+    def record_first_token(self, model: str, latency: float):
+        with self._lock:
+            self.first_token_latencies[model].append(latency)
+
+    def delay(self, model: str) -> float | None:
+        """
+        Returns how long to wait for the first token before hedging, or None if there is
+        not enough history for the model yet. Also counts the request against the budget.
+        """
+        with self._lock:
+            self.requests += 1
+            latencies = sorted(self.first_token_latencies[model])
+        if len(latencies) < self.min_samples:
+            return None
+        return percentile(latencies, self.percentile)
+
+    def try_hedge(self) -> bool:
+        """
+        Takes one duplicate request from the budget, returning False if it is spent.
+        """
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+
+hedge_policy = HedgePolicy()
+
+
+class SingleFlight:
+    """
+    Shares one upstream call between identical requests that are in flight at the same time.
+
+    The first caller for a key makes the call, and later callers for the same key wait for
+    its result, or its error, instead of sending their own request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight: Dict[str, Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: str, call: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Runs the call, unless an identical one is in flight.
+
+        Args:
+            key: Identifies identical calls.
+            call: Makes the call.
+
+        Returns:
+            The result, and whether it was shared from a call made by another caller.
+        """
+        with self._lock:
+            shared = key in self.in_flight
+            if shared:
+                self.coalesced += 1
+                future = self.in_flight[key]
+            else:
+                self.calls += 1
+                future = self.in_flight[key] = Future()
+        if shared:
+            return future.result(), True
+
+        try:
+            result = call()
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self.in_flight.pop(key, None)
+        return result, False
+
+
+in_flight_requests = SingleFlight()
+
+# Runs the streamed requests of hedged calls. The hedge delay is counted from when a request
+# starts running, so time queued here is not taken for a slow first token.
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+def _token_usage(response: BaseMessage) -> tuple[int, int]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = (getattr(response, "response_metadata", None) or {}).get(
+        "token_usage"
+    ) or {}
+    return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+
+
+class ModelRouter:
+    """
+    A class that routes each graph node to its configured model, and records per-node metrics.
+
+    Agents call invoke with the name of the node making the call. Clients are created lazily,
+    one per model, so a router only holds clients for the models its nodes use. The API key is
+    resolved when the router is created, as the first call may run on a worker thread, where the
+    key entered in the app cannot be read.
+    """
+
+    def __init__(
+        self,
+        routes: Dict[str, str] | None = None,
+        prices: Dict[str, tuple] | None = None,
+        hedge: HedgePolicy | None = None,
+        single_flight: SingleFlight | None = None,
+        api_key: str | None = None,
+    ):
+        """
+        Initializes the ModelRouter class.
+
+        Args:
+            routes: A mapping of node names to model names. Defaults to DEFAULT_MODEL_ROUTES,
+                updated with the RESUME_APP_MODEL_ROUTES environment variable.
+            prices: A mapping of model names to USD per million (input, output) tokens.
+                Defaults to DEFAULT_MODEL_PRICES, updated with RESUME_APP_MODEL_PRICES.
+            hedge: The policy deciding when to duplicate slow requests. Defaults to the
+                process-wide policy, configured with RESUME_APP_HEDGE_PERCENTILE and
+                RESUME_APP_HEDGE_BUDGET.
+            single_flight: Shares identical requests in flight. Defaults to the process-wide
+                instance, unless RESUME_APP_SINGLE_FLIGHT is 0.
+            api_key: The NVIDIA API key. Defaults to the key entered in the app, or the
+                NVIDIA_API_KEY environment variable.
+        """
+        self.routes = routes or _load_json_env(
+            "RESUME_APP_MODEL_ROUTES", DEFAULT_MODEL_ROUTES
+        )
+        self.prices = prices or _load_json_env(
+            "RESUME_APP_MODEL_PRICES", DEFAULT_MODEL_PRICES
+        )
+        self.hedge = hedge or hedge_policy
+        self.single_flight = single_flight or (
+            in_flight_requests if SINGLE_FLIGHT else None
+        )
+        self.api_key = api_key or get_api_key()
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def model_for(self, node: str) -> str:
+        """
+        Returns the name of the model used by a node.
+        """
+        return self.routes.get(node, model_name)
+
+    def client(self, node: str):
+        """
+        Returns the chat model client used by a node.
+        """
+        name = self.model_for(node)
+        with self._lock:
+            if name not in self._clients:
+                self._clients[name] = get_model(name, api_key=self.api_key)
+            return self._clients[name]
+
+    def invoke(
+        self, messages: List[AnyMessage], node: str, reask: bool = False
+    ) -> BaseMessage:
+        """
+        Invokes the model routed to a node, recording its latency, tokens and estimated cost.
+
+        Identical requests already in flight, from any router in the process, share one upstream
+        call. When hedging is enabled, the response is streamed, and a duplicate request is sent
+        if the first token is slow. Whichever request finishes first is returned.
+
+        Args:
+            messages: The messages to send.
+            node: The name of the graph node making the call.
+            reask: Whether the call asks again for output that could not be read, for the metrics.
+
+        Returns:
+            The model response.
+
+        Raises:
+            PromptTooLargeError: If the messages cannot fit the model's context window. Nothing is sent.
+        """
+        name = self.model_for(node)
+        tokens = estimate_message_tokens(messages)
+        if tokens > input_budget(name):
+            raise PromptTooLargeError(
+                f"The {node} prompt needs about {tokens} tokens, more than the "
+                f"{input_budget(name)} available for {name}."
+            )
+        client = self.client(node)
+        start = time.perf_counter()
+        if self.single_flight is None:
+            (response, hedged, hedge_won, primary_failed), coalesced = (
+                self._send(client, messages, name),
+                False,
+            )
+        else:
+            (response, hedged, hedge_won, primary_failed), coalesced = (
+                self.single_flight.do(
+                    self._request_key(name, messages),
+                    lambda: self._send(client, messages, name),
+                )
+            )
+        latency = time.perf_counter() - start
+
+        if coalesced:
+            # The tokens were paid for by the call that was shared
+            metrics.record(node, name, latency, 0, 0, 0.0, coalesced=True, reask=reask)
+            return response
+
+        input_tokens, output_tokens = _token_usage(response)
+        input_price, output_price = self.prices.get(name, (0.0, 0.0))
+        cost = (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+        metrics.record(
+            node,
+            name,
+            latency,
+            input_tokens,
+            output_tokens,
+            cost,
+            hedged=hedged,
+            hedge_won=hedge_won,
+            primary_failed=primary_failed,
+            reask=reask,
+        )
+        return response
+
+    def invoke_structured(
+        self,
+        messages: List[AnyMessage],
+        node: str,
+        schema,
+        max_reasks: int = MAX_REASKS,
+    ) -> Any:
+        """
+        Invokes the model routed to a node, and parses its output into a value of the schema.
+
+        Malformed json is repaired locally. Only when that fails is the model asked again, for this
+        node only, with its previous answer and the reason it could not be read.
+
+        Args:
+            messages: The messages to send.
+            node: The name of the graph node making the call.
+            schema: The expected output type, e.g. a TypedDict or List[str].
+            max_reasks: The number of times to ask again.
+
+        Returns:
+            The validated output.
+
+        Raises:
+            StructuredOutputError: If the output still cannot be read after the re-asks.
+        """
+        for attempt in range(max_reasks + 1):
+            response = self.invoke(messages, node=node, reask=attempt > 0)
+            try:
+                return parse_structured(response.content, schema)
+            except StructuredOutputError as e:
+                if attempt == max_reasks:
+                    raise StructuredOutputError(f"{node}: {e}") from e
+                messages = messages + [
+                    AIMessage(content=response.content),
+                    HumanMessage(content=REASK_PROMPT.format(error=e)),
+                ]
+
+    def _request_key(self, name: str, messages: List[AnyMessage]) -> str:
+        return content_hash(
+            json.dumps([name] + [[m.type, m.content] for m in messages])
+        )
+
+    def _send(
+        self, client, messages: List[AnyMessage], name: str
+    ) -> tuple[BaseMessage, bool, bool, bool]:
+        if self.hedge.enabled:
+            return self._invoke_hedged(client, messages, name)
+        return client.invoke(messages), False, False, False
+
+    def _invoke_hedged(
+        self, client, messages: List[AnyMessage], name: str
+    ) -> tuple[BaseMessage, bool, bool, bool]:
+        """
+        Streams a request, sending a duplicate if its first token is slower than the hedge delay.
+
+        The delay is counted from when the request starts running. Once one request answers, the
+        other is cancelled.
+
+        Returns:
+            The response, whether a duplicate was sent, whether the duplicate won the race against
+            a first request still running, and whether the first request failed.
+        """
+        started, first_token = threading.Event(), threading.Event()
+        cancel_primary, cancel_backup = threading.Event(), threading.Event()
+        primary = _hedge_executor.submit(
+            self._stream, client, messages, name, started, first_token, cancel_primary
+        )
+        delay = self.hedge.delay(name)
+        if delay is not None:
+            # Time queued behind other hedged calls is not a slow first token
+            started.wait()
+        if (
+            delay is None
+            or first_token.wait(delay)
+            or primary.done()
+            or not self.hedge.try_hedge()
+        ):
+            return primary.result(), False, False, False
+
+        backup = _hedge_executor.submit(
+            self._stream,
+            client,
+            messages,
+            name,
+            threading.Event(),
+            threading.Event(),
+            cancel_backup,
+        )
+        pending = {primary, backup}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if primary in done and primary.exception() is None:
+                cancel_backup.set()
+                return primary.result(), True, False, False
+            if backup in done and backup.exception() is None:
+                cancel_primary.set()
+                primary_failed = primary.done() and primary.exception() is not None
+                return backup.result(), True, not primary_failed, primary_failed
+        return primary.result(), True, False, False
+
+    def _stream(
+        self,
+        client,
+        messages: List[AnyMessage],
+        name: str,
+        started: threading.Event,
+        first_token: threading.Event,
+        cancel: threading.Event,
+    ) -> BaseMessage | None:
+        """
+        Streams one request, recording the time to its first token.
+
+        Stops reading, and returns None, once the request is cancelled.
+        """
+        started.set()
+        if cancel.is_set():
+            return None
+        start = time.perf_counter()
+        response = None
+        stream = client.stream(messages)
+        try:
+            for chunk in stream:
+                if response is None:
+                    self.hedge.record_first_token(name, time.perf_counter() - start)
+                    first_token.set()
+                    response = chunk
+                else:
+                    response = response + chunk
+                if cancel.is_set():
+                    return None
+        finally:
+            stream.close()
+        return response
@@ -0,0 +1,264 @@
+# /resume-app/persona_cache.py
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from prompts import build_system_prompt
+from model_router import ModelRouter
+from utils import content_hash
+
+AGE_CATEGORIES = ["Baby Boomers", "GenX", "GenY", "GenZ"]
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "persona_cache.sqlite")
+
+
+class PersonaCache:
+    """
+    A persistent cache of interviewer personas.
+
+    A persona only depends on the job description and the age category, so it can be shared by
+    every candidate applying to the same posting. Personas are stored in a SQLite database keyed by
+    the hash of the job description, the age category and the model that generated them.
+    Only the most recently used postings are kept; older postings are evicted with all their personas.
+    """
+
+    def __init__(self, path: str | None = None, max_postings: int = 100):
+        """
+        Initializes the PersonaCache class.
+
+        Args:
+            path: The path to the SQLite database. Defaults to the RESUME_APP_PERSONA_CACHE
+                environment variable, or .cache/persona_cache.sqlite.
+            max_postings: The number of most recently used postings to keep.
+        """
+        self.path = path or os.environ.get(
+            "RESUME_APP_PERSONA_CACHE", DEFAULT_CACHE_PATH
+        )
+        self.max_postings = max_postings
+
+        self.SYSTEM_PROMPT = """
+You are an expert recruiter. You have been asked to describe the people likely to interview candidates for the job description above.
+"""
+        self.PERSONA_GENERATION_PROMPT = """
+Create an example persona for a likely interviewer for the given job description and age group.
+Your output should be just the persona, with no other comments.
+
+Here is the age group:
+{age_category}
+"""
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "job_description_hash TEXT PRIMARY KEY, last_used REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS personas ("
+                "job_description_hash TEXT NOT NULL, age_category TEXT NOT NULL, "
+                "model TEXT NOT NULL, persona TEXT NOT NULL, created REAL NOT NULL, "
+                "PRIMARY KEY (job_description_hash, age_category, model))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _touch(self, conn: sqlite3.Connection, job_description_hash: str):
+        conn.execute(
+            "INSERT INTO postings (job_description_hash, last_used) VALUES (?, ?) "
+            "ON CONFLICT(job_description_hash) DO UPDATE SET last_used = excluded.last_used",
+            (job_description_hash, time.time()),
+        )
+
+    def get(self, job_description: str, age_category: str, model: str) -> str | None:
+        """
+        Returns the cached persona for a posting and age category.
+
+        Args:
+            job_description: The job description text.
+            age_category: The age category of the interviewer.
+            model: The name of the model that generates the persona.
+
+        Returns:
+            The persona, or None if it is not cached.
+        """
+        job_description_hash = content_hash(job_description)
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT persona FROM personas "
+                "WHERE job_description_hash = ? AND age_category = ? AND model = ?",
+                (job_description_hash, age_category, model),
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(conn, job_description_hash)
+        return row[0]
+
+    def put(self, job_description: str, age_category: str, model: str, persona: str):
+        """
+        Stores a persona, evicting the least recently used postings beyond max_postings.
+
+        Args:
+            job_description: The job description text.
+            age_category: The age category of the interviewer.
+            model: The name of the model that generated the persona.
+            persona: The persona text.
+        """
+        job_description_hash = content_hash(job_description)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO personas "
+                "(job_description_hash, age_category, model, persona, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job_description_hash, age_category, model, persona, time.time()),
+            )
+            self._touch(conn, job_description_hash)
+            stale = conn.execute(
+                "SELECT job_description_hash FROM postings "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+                (self.max_postings,),
+            ).fetchall()
+            for (stale_hash,) in stale:
+                self._evict_hash(conn, stale_hash)
+
+    def _evict_hash(self, conn: sqlite3.Connection, job_description_hash: str) -> int:
+        deleted = conn.execute(
+            "DELETE FROM personas WHERE job_description_hash = ?",
+            (job_description_hash,),
+        ).rowcount
+        conn.execute(
+            "DELETE FROM postings WHERE job_description_hash = ?",
+            (job_description_hash,),
+        )
+        return deleted
+
+    def evict_posting(self, job_description: str) -> int:
+        """
+        Removes all cached personas for a posting.
+
+        Args:
+            job_description: The job description text.
+
+        Returns:
+            The number of personas removed.
+        """
+        with closing(self._connect()) as conn, conn:
+            return self._evict_hash(conn, content_hash(job_description))
+
+    def get_or_generate(
+        self, model: ModelRouter, job_description: str, age_category: str
+    ) -> str:
+        """
+        Returns the cached persona, generating and caching it on a miss.
+
+        Args:
+            model: The model router, which picks the model used to generate the persona.
+            job_description: The job description text.
+            age_category: The age category of the interviewer.
+
+        Returns:
+            The persona.
+        """
+        name = model.model_for("generate_persona")
+        persona = self.get(job_description, age_category, name)
+        if persona is not None:
+            return persona
+
+        messages = [
+            SystemMessage(
+                content=build_system_prompt(self.SYSTEM_PROMPT, job_description)
+            ),
+            HumanMessage(
+                content=self.PERSONA_GENERATION_PROMPT.format(age_category=age_category)
+            ),
+        ]
+        response = model.invoke(messages, node="generate_persona")
+        self.put(job_description, age_category, name, response.content)
+        return response.content
+
+    def warm_up(
+        self,
+        model: ModelRouter,
+        job_description: str,
+        age_categories: list[str] | None = None,
+        replaces: str | None = None,
+    ) -> dict[str, str]:
+        """
+        Generates the personas for every age category of a posting.
+
+        Args:
+            model: The model router, which picks the model used to generate the personas.
+            job_description: The job description text.
+            age_categories: The age categories to generate. Defaults to all of them.
+            replaces: The previous version of the job description, whose personas are evicted.
+
+        Returns:
+            A dictionary mapping age categories to personas.
+        """
+        if replaces is not None and replaces != job_description:
+            self.evict_posting(replaces)
+
+        age_categories = age_categories or AGE_CATEGORIES
+        with ThreadPoolExecutor(max_workers=len(age_categories)) as executor:
+            personas = executor.map(
+                lambda age_category: self.get_or_generate(
+                    model, job_description, age_category
+                ),
+                age_categories,
+            )
+            return dict(zip(age_categories, personas))
+
+
+def _read(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+
+def main():
+    """
+    Command line entry point for warming up and evicting cached personas.
+
+    Examples:
+        python persona_cache.py warm data/full-stack-engineer-jd.txt
+        python persona_cache.py warm new-jd.txt --replaces old-jd.txt
+        python persona_cache.py evict old-jd.txt
+    """
+    parser = argparse.ArgumentParser(description="Manage the interviewer persona cache")
+    parser.add_argument("--path", default=None, help="Path to the cache database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm = subparsers.add_parser("warm", help="Pre-generate all personas for a posting")
+    warm.add_argument("job_description", help="Path to the job description text file")
+    warm.add_argument(
+        "--replaces",
+        default=None,
+        help="Path to the previous version of the posting, whose personas are evicted",
+    )
+
+    evict = subparsers.add_parser("evict", help="Remove all personas for a posting")
+    evict.add_argument("job_description", help="Path to the job description text file")
+
+    args = parser.parse_args()
+    cache = PersonaCache(path=args.path)
+
+    if args.command == "warm":
+        replaces = _read(args.replaces) if args.replaces else None
+        personas = cache.warm_up(
+            ModelRouter(), _read(args.job_description), replaces=replaces
+        )
+        for age_category, persona in personas.items():
+            print(f"## {age_category}\n{persona}\n")
+    elif args.command == "evict":
+        removed = cache.evict_posting(_read(args.job_description))
+        print(f"Removed {removed} personas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# /resume-app/profiling.py
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+import warnings
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, List, TypedDict
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+DEFAULT_PROFILE_DIR = os.path.join(".cache", "profiles")
+
+# Set to 1 to profile every graph run in this process, whatever the sidebar toggle says
+PROFILE_ENV = "RESUME_APP_PROFILE"
+
+# The sidebar toggle stores its value under this session state key
+PROFILE_TOGGLE_KEY = "profiling_enabled"
+
+APP_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class ProfileReport(TypedDict):
+    """
+    A dictionary representing the output of one profiled run.
+
+    Attributes:
+        name: The name of the run, e.g. "screening".
+        elapsed: The wall-clock seconds the run took.
+        collapsed_path: The sampled stacks in collapsed format, for flamegraph.pl or speedscope.
+        stats_path: The cProfile stats, for pstats or snakeviz. None when another run held the
+            profiler, in which case only the sampled stacks are written.
+        summary: The functions with the most cumulative time, one dictionary each.
+    """
+
+    name: str
+    elapsed: float
+    collapsed_path: str
+    stats_path: str | None
+    summary: List[dict]
+
+
+def profiling_enabled() -> bool:
+    """
+    Returns whether runs should be profiled, from the environment or the sidebar toggle.
+
+    Must be called on the Streamlit script thread for the toggle to count. Background jobs
+    are told whether to profile when they are submitted.
+    """
+    if os.environ.get(PROFILE_ENV, "0") not in ("", "0"):
+        return True
+    if get_script_run_ctx(suppress_warning=True) is None:
+        # Not running in a Streamlit session, e.g. the API or a script
+        return False
+    return bool(st.session_state.get(PROFILE_TOGGLE_KEY, False))
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class StackSampler:
+    """
+    Samples stacks at a fixed interval, to measure wall-clock time.
+
+    Unlike cProfile, which only sees the thread it was enabled on, samples include graph nodes
+    running on worker threads, and time spent waiting on the network. The thread that started
+    the sampler is always sampled, other threads only while they are running app code, so idle
+    pool and server threads are left out. Runs of other sessions at the same time show up too.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.target_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.started = False
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack, in_app = [], thread_id == self.target_id
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    filename = frame.f_code.co_filename
+                    in_app = in_app or (
+                        filename.startswith(APP_DIRECTORY)
+                        and "site-packages" not in filename
+                    )
+                    frame = frame.f_back
+                if not in_app:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        self.started = True
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _summarize(profiler: cProfile.Profile, limit: int) -> List[dict]:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in sorted(
+        stats.stats.items(), key=lambda item: item[1][3], reverse=True
+    )[:limit]:
+        rows.append(
+            {
+                "function": f"{function} ({os.path.basename(filename)}:{line})",
+                "calls": calls,
+                "own_seconds": round(total, 4),
+                "cumulative_seconds": round(cumulative, 4),
+            }
+        )
+    return rows
+
+
+# Only one cProfile profiler can be enabled at a time, see profile_run
+_cprofile_lock = threading.Lock()
+
+
+def _start_cprofile() -> cProfile.Profile | None:
+    if not _cprofile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool is active, e.g. a debugger
+        _cprofile_lock.release()
+        return None
+    return profiler
+
+
+def _stop_cprofile(profiler: cProfile.Profile | None):
+    if profiler is not None:
+        profiler.disable()
+        _cprofile_lock.release()
+
+
+@contextmanager
+def profile_run(
+    name: str, directory: str | None = None, summary_size: int = 30
+) -> Iterator[dict]:
+    """
+    Profiles the code run inside the block with cProfile and a wall-clock stack sampler.
+
+    On exit, writes the sampled stacks in collapsed format and the cProfile stats to the profile
+    directory, and fills in the dictionary yielded with the ProfileReport.
+
+    Since Python 3.12 only one cProfile profiler can be enabled at a time, so runs that overlap
+    a profiled run only get the sampled stacks. Profiling never raises into the profiled code,
+    failures to profile are issued as warnings.
+
+    Args:
+        name: The name of the run, used in the file names.
+        directory: Where to write the files. Defaults to RESUME_APP_PROFILE_DIR, or .cache/profiles.
+        summary_size: The number of functions in the summary.
+
+    Yields:
+        A dictionary that holds the ProfileReport once the block has finished.
+    """
+    report = {}
+    sampler = profiler = None
+    try:
+        directory = directory or os.environ.get(
+            "RESUME_APP_PROFILE_DIR", DEFAULT_PROFILE_DIR
+        )
+        os.makedirs(directory, exist_ok=True)
+        sampler = StackSampler()
+        sampler.start()
+        profiler = _start_cprofile()
+    except Exception as e:
+        warnings.warn(f"Could not profile {name}: {e}", RuntimeWarning)
+        if sampler is not None and sampler.started:
+            sampler.stop()
+        sampler = None
+    if sampler is None:
+        yield report
+        return
+
+    start = time.perf_counter()
+    try:
+        yield report
+    finally:
+        _stop_cprofile(profiler)
+        sampler.stop()
+        elapsed = time.perf_counter() - start
+        try:
+            base = os.path.join(
+                directory,
+                f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{uuid.uuid4().hex[:6]}",
+            )
+            sampler.write_collapsed(base + ".collapsed")
+            if profiler is not None:
+                profiler.dump_stats(base + ".prof")
+            report.update(
+                ProfileReport(
+                    name=name,
+                    elapsed=elapsed,
+                    collapsed_path=base + ".collapsed",
+                    stats_path=base + ".prof" if profiler is not None else None,
+                    summary=(
+                        _summarize(profiler, summary_size)
+                        if profiler is not None
+                        else []
+                    ),
+                )
+            )
+            record_profile(report)
+        except Exception as e:
+            warnings.warn(f"Could not write the profile of {name}: {e}", RuntimeWarning)
+
+
+def maybe_profile(name: str, enabled: bool | None = None):
+    """
+    Returns profile_run(name) if profiling is on, else a context that does nothing.
+
+    Args:
+        name: The name of the run.
+        enabled: Whether to profile. Defaults to profiling_enabled().
+    """
+    if enabled is None:
+        enabled = profiling_enabled()
+    return profile_run(name) if enabled else nullcontext({})
+
+
+_recent_reports: List[ProfileReport] = []
+_recent_lock = threading.Lock()
+
+
+def record_profile(report: ProfileReport, max_reports: int = 20):
+    with _recent_lock:
+        _recent_reports.append(report)
+        del _recent_reports[:-max_reports]
+
+
+def recent_profiles() -> List[ProfileReport]:
+    """
+    Returns the reports of the most recent profiled runs in this process, newest first.
+    """
+    with _recent_lock:
+        return list(reversed(_recent_reports))
@@ -0,0 +1,234 @@
+# /resume-app/prompt_budget.py
+import json
+import os
+import re
+import warnings
+from typing import List, Sequence, TypedDict
+
+from langchain_core.messages import AnyMessage, HumanMessage, SystemMessage
+
+from prompts import build_system_prompt
+from resume_store import ParsedResume, section_text
+from utils import estimate_tokens, model_name
+
+# Context window of each model, in tokens. Models not listed get DEFAULT_CONTEXT_WINDOW.
+# Override with a json object in the RESUME_APP_CONTEXT_WINDOWS environment variable.
+DEFAULT_CONTEXT_WINDOW = 8192
+DEFAULT_CONTEXT_WINDOWS = {
+    model_name: 8192,
+    "meta/llama3-8b-instruct": 8192,
+}
+
+# Tokens kept free for the response
+OUTPUT_RESERVE = int(os.environ.get("RESUME_APP_OUTPUT_RESERVE", 1024))
+
+# The chat template adds a few tokens around each message
+MESSAGE_OVERHEAD = 4
+
+# Job description blocks starting with one of these say nothing about the role itself
+BOILERPLATE_HEADING = re.compile(
+    r"^\s*(about (us|the company|the team)|who we are|our (company|story|mission|values)|"
+    r"benefits|perks|what we offer|compensation|salary|equal (employment )?opportunity|"
+    r"eeo|diversity|how to apply)\b",
+    re.IGNORECASE,
+)
+BOILERPLATE_TEXT = re.compile(r"equal opportunity employer", re.IGNORECASE)
+
+
+class PromptTooLargeError(ValueError):
+    pass
+
+
+class PromptTrimmedWarning(UserWarning):
+    pass
+
+
+class FittedPrompt(TypedDict):
+    """
+    A dictionary representing a prompt fitted to a model's context window.
+
+    Attributes:
+        messages: The messages to send.
+        tokens: The estimated number of input tokens.
+        budget: The number of input tokens available for the model.
+        dropped: A note for each kind of content left out to fit, empty if nothing was.
+    """
+
+    messages: List[AnyMessage]
+    tokens: int
+    budget: int
+    dropped: List[str]
+
+
+def context_window(model: str) -> int:
+    windows = dict(DEFAULT_CONTEXT_WINDOWS)
+    if os.environ.get("RESUME_APP_CONTEXT_WINDOWS"):
+        windows.update(json.loads(os.environ["RESUME_APP_CONTEXT_WINDOWS"]))
+    return windows.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+def input_budget(model: str) -> int:
+    """
+    Returns the number of input tokens a request to the model can use.
+    """
+    return context_window(model) - OUTPUT_RESERVE
+
+
+def estimate_message_tokens(messages: Sequence[AnyMessage]) -> int:
+    return sum(estimate_tokens(m.content) + MESSAGE_OVERHEAD for m in messages)
+
+
+def merge_notes(left: List[str] | None, right: List[str] | None) -> List[str]:
+    # State reducer that keeps each note once, as every call for a resume drops the same content
+    left = list(left or [])
+    return left + [note for note in right or [] if note not in left]
+
+
+def strip_boilerplate(job_description: str) -> tuple[str, List[str]]:
+    """
+    Removes the blocks of a job description that do not describe the role, such as
+    "About us", "Benefits" or the equal opportunity statement.
+
+    Args:
+        job_description: The job description text.
+
+    Returns:
+        The job description without the boilerplate, and the first line of each removed block.
+    """
+    kept, removed = [], []
+    for block in re.split(r"\n\s*\n", job_description):
+        heading = block.strip().splitlines()[0] if block.strip() else ""
+        if BOILERPLATE_HEADING.match(heading) or BOILERPLATE_TEXT.search(block):
+            removed.append(heading.rstrip(":")[:40])
+        else:
+            kept.append(block)
+    return "\n\n".join(kept), removed
+
+
+def _words(text: str) -> set[str]:
+    return set(re.findall(r"[a-z0-9+#]+", text.lower()))
+
+
+def rank_sections(resume: ParsedResume, job_description: str) -> List[int]:
+    """
+    Returns the indices of the resume sections, from the least to the most relevant.
+
+    A section is more relevant when more of its words appear in the job description.
+    The text before the first heading, usually the name and contact details, comes last.
+    """
+    job_words = _words(job_description)
+
+    def relevance(i: int) -> float:
+        section = resume["sections"][i]
+        if not section["title"]:
+            return float("inf")
+        words = _words(section_text(section))
+        return len(words & job_words) / len(words) if words else 0.0
+
+    return sorted(range(len(resume["sections"])), key=relevance)
+
+
+def fit_prompt(
+    model: str,
+    instructions: str,
+    job_description: str,
+    request: str,
+    resume: ParsedResume | None = None,
+    history: Sequence[AnyMessage] = (),
+    keep_messages: int = 2,
+) -> FittedPrompt:
+    """
+    Builds the messages for a request, shrinking them to fit the model's context window.
+
+    The messages are the system prompt (shared prefix and instructions), the conversation history,
+    and the request. When they are over budget, the lowest-priority content is left out first:
+    older interview messages, then the resume sections least relevant to the job description,
+    then the job description boilerplate. The token counts come from the local estimator and the
+    per-section counts of the parsed resume, so nothing is sent to find out.
+
+    Args:
+        model: The name of the model the request is for.
+        instructions: The agent-specific instructions of the system prompt.
+        job_description: The job description text.
+        request: The content of the final human message.
+        resume: The parsed resume, or None to leave the resume out of the prompt.
+        history: The conversation so far, sent between the system prompt and the request.
+        keep_messages: The number of most recent history messages that are never dropped.
+
+    Returns:
+        The FittedPrompt. A PromptTrimmedWarning is issued for each note in dropped.
+
+    Raises:
+        PromptTooLargeError: If the prompt is over budget even with everything optional left out.
+    """
+    budget = input_budget(model)
+    history = list(history)
+    resume_text = None if resume is None else resume["text"]
+
+    def build() -> List[AnyMessage]:
+        system = build_system_prompt(instructions, job_description, resume_text)
+        return (
+            [SystemMessage(content=system)] + history + [HumanMessage(content=request)]
+        )
+
+    messages = build()
+    tokens = estimate_message_tokens(messages)
+    if tokens <= budget:
+        return FittedPrompt(messages=messages, tokens=tokens, budget=budget, dropped=[])
+
+    dropped = []
+    history_tokens = [estimate_tokens(m.content) + MESSAGE_OVERHEAD for m in history]
+    resume_tokens = 0 if resume is None else estimate_tokens(resume_text)
+    fixed = tokens - sum(history_tokens) - resume_tokens
+
+    # Older interview messages go first
+    removed = 0
+    while fixed + resume_tokens + sum(history_tokens) > budget and (
+        len(history_tokens) > keep_messages
+    ):
+        history_tokens.pop(0)
+        removed += 1
+    if removed:
+        history = history[removed:]
+        dropped.append("Left out the oldest interview messages.")
+
+    # Then the resume sections least relevant to the job description
+    if resume is not None and fixed + resume_tokens + sum(history_tokens) > budget:
+        kept = set(range(len(resume["sections"])))
+        resume_tokens = sum(resume["section_tokens"])
+        left_out = []
+        for i in rank_sections(resume, job_description)[:-1]:
+            if fixed + resume_tokens + sum(history_tokens) <= budget:
+                break
+            kept.discard(i)
+            resume_tokens -= resume["section_tokens"][i]
+            left_out.append(resume["sections"][i]["title"])
+        resume_text = "\n\n".join(
+            section_text(section)
+            for i, section in enumerate(resume["sections"])
+            if i in kept
+        )
+        if left_out:
+            dropped.append(f"Left out resume sections: {', '.join(left_out)}.")
+
+    # Then the job description boilerplate
+    if fixed + resume_tokens + sum(history_tokens) > budget:
+        job_description, removed_blocks = strip_boilerplate(job_description)
+        if removed_blocks:
+            dropped.append(
+                f"Left out job description boilerplate: {', '.join(removed_blocks)}."
+            )
+
+    messages = build()
+    tokens = estimate_message_tokens(messages)
+    if tokens > budget:
+        raise PromptTooLargeError(
+            f"The prompt needs about {tokens} tokens, more than the {budget} available "
+            f"for {model}, even after shrinking it."
+        )
+
+    for note in dropped:
+        warnings.warn(note, PromptTrimmedWarning)
+    return FittedPrompt(
+        messages=messages, tokens=tokens, budget=budget, dropped=dropped
+    )
@@ -0,0 +1,72 @@
+# /resume-app/prompts.py
+
+# Every agent's system prompt starts with the same bytes for the same job description and resume,
+# so a serving stack with prefix caching can reuse that work across agents and calls.
+# The job description comes first, so prompts that only depend on the posting share it too.
+JOB_DESCRIPTION_PREFIX = """You are assisting with a job application.
+
+### Job Description
+{job_description}
+"""
+
+RESUME_PREFIX = """
+### Resume
+{resume}
+"""
+
+INSTRUCTIONS_SEPARATOR = "\n### Instructions\n"
+
+
+def _clean(text: str) -> str:
+    # Trailing whitespace varies between sources (text area, pdf, api), and would break byte equality
+    return (text or "").strip()
+
+
+def build_job_prefix(job_description: str) -> str:
+    """
+    Returns the shared prompt prefix holding only the job description.
+
+    Args:
+        job_description: The job description text.
+
+    Returns:
+        The prefix string.
+    """
+    return JOB_DESCRIPTION_PREFIX.format(job_description=_clean(job_description))
+
+
+def build_shared_prefix(job_description: str, resume: str) -> str:
+    """
+    Returns the shared prompt prefix holding the job description and the resume.
+
+    Args:
+        job_description: The job description text.
+        resume: The parsed resume text.
+
+    Returns:
+        The prefix string.
+    """
+    return build_job_prefix(job_description) + RESUME_PREFIX.format(
+        resume=_clean(resume)
+    )
+
+
+def build_system_prompt(
+    instructions: str, job_description: str, resume: str | None = None
+) -> str:
+    """
+    Returns a system prompt made of the shared prefix followed by the agent-specific instructions.
+
+    Args:
+        instructions: The agent-specific instructions.
+        job_description: The job description text.
+        resume: The parsed resume text. When None, only the job description is included.
+
+    Returns:
+        The system prompt string.
+    """
+    if resume is None:
+        prefix = build_job_prefix(job_description)
+    else:
+        prefix = build_shared_prefix(job_description, resume)
+    return prefix + INSTRUCTIONS_SEPARATOR + instructions.strip() + "\n"
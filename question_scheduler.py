@@ -0,0 +1,86 @@
+# /resume-app/question_scheduler.py
+import random
+from typing import Dict, List, Tuple
+
+
+class QuestionScheduler:
+    """
+    A class that picks interview questions locally instead of asking the language model to choose.
+
+    Questions are drawn from the categorized question dict without replacement. The category of
+    the next question is drawn at random, weighted by the category weight and by how little the
+    category has been covered so far. Within a category, questions are asked in their generated order.
+    The draw is seeded from the number of questions already asked, so replaying an interview with
+    the same answers asks the same questions in the same order.
+    """
+
+    def __init__(
+        self,
+        interview_questions: Dict[str, List[str]] | None,
+        category_weights: Dict[str, float] | None = None,
+        coverage_weight: float = 1.0,
+        seed: int = 0,
+    ):
+        """
+        Initializes the QuestionScheduler class.
+
+        Args:
+            interview_questions: A dictionary mapping category names to lists of questions.
+            category_weights: Optional relative weights per category. Categories not listed get a weight of 1.
+            coverage_weight: How strongly to favour categories that have been asked about least.
+                0 ignores coverage, larger values spread questions more evenly across categories.
+            seed: The seed used for the weighted draw.
+        """
+        self.interview_questions = interview_questions or {}
+        self.category_weights = category_weights or {}
+        self.coverage_weight = coverage_weight
+        self.seed = seed
+
+    def remaining(self, asked: List[str]) -> Dict[str, List[str]]:
+        """
+        Returns the questions that have not been asked yet, grouped by category.
+
+        Args:
+            asked: The questions asked so far.
+
+        Returns:
+            A dictionary mapping category names to the questions not yet asked. Empty categories are omitted.
+        """
+        asked_set = set(asked)
+        remaining = {}
+        for category, questions in self.interview_questions.items():
+            not_asked = [q for q in questions if q not in asked_set]
+            if not_asked:
+                remaining[category] = not_asked
+        return remaining
+
+    def next_question(self, asked: List[str]) -> Tuple[str, str] | None:
+        """
+        Picks the next question to ask.
+
+        Args:
+            asked: The questions asked so far.
+
+        Returns:
+            A (category, question) tuple, or None if every question has been asked.
+        """
+        remaining = self.remaining(asked)
+        if not remaining:
+            return None
+
+        asked_set = set(asked)
+        categories = list(remaining.keys())
+        weights = []
+        for category in categories:
+            covered = sum(
+                1 for q in self.interview_questions[category] if q in asked_set
+            )
+            weight = self.category_weights.get(category, 1.0)
+            weights.append(weight / (1.0 + self.coverage_weight * covered))
+
+        if sum(weights) <= 0:
+            weights = [1.0] * len(categories)
+
+        rng = random.Random(f"{self.seed}:{len(asked)}")
+        category = rng.choices(categories, weights=weights, k=1)[0]
+        return category, remaining[category][0]
@@ -1,17 +1,45 @@
 # /resume-app/resume_doctor.py
-from typing import List, TypedDict
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Annotated, Dict, Iterator, List, Literal, TypedDict
 from langgraph.graph import StateGraph, END
-from langchain_core.messages import HumanMessage, SystemMessage
-from utils import extra_json_object, get_model
+from pydantic import BeforeValidator
+from persona_cache import AGE_CATEGORIES, PersonaCache
+from prompt_budget import FittedPrompt, fit_prompt, merge_notes
+from resume_edits import apply_edits, diff_resumes, parse_edits
+from model_router import ModelRouter
+from resume_store import ResumeStore, get_resume_store
 
 
 class ResumeDoctorState(TypedDict):
     age_category: str
-    resume: str
+    resume_id: str
     job_description: str
     persona: str | None
     updated_resume: str | None
+    resume_edits: List[dict] | None
+    skipped_edits: List[dict] | None
+    resume_diff: str | None
     interview_questions: List[dict] | None
+    prompt_notes: Annotated[List[str], merge_notes]
+
+
+# The schema of the generated interview questions: lists of questions keyed by category.
+# A category holding a single question as a string is read as a list of one.
+InterviewQuestions = Dict[
+    str,
+    Annotated[List[str], BeforeValidator(lambda v: [v] if isinstance(v, str) else v)],
+]
+
+# The model calls in flight at once when running every age category. Each pipeline makes up to two
+# calls at once, the rewrite and the questions, so the limit applies below twice the categories.
+BATCH_MAX_CONCURRENCY = int(os.environ.get("RESUME_APP_BATCH_CONCURRENCY", 4))
+
+# "full" has the model write out the whole tailored resume.
+# "edits" has the model return section-level edit operations, applied locally to the original.
+RewriteMode = Literal["full", "edits"]
 
 
 class ResumeDoctor:
@@ -22,36 +50,60 @@ class ResumeDoctor:
     It then uses a language model to generate a persona for a likely interviewer,
     rewrite the resume to appeal to that persona, and generate interview questions
     that the persona is likely to ask.
+
+    Personas only depend on the job description and age category, and are shared
+    across candidates through a PersonaCache.
     """
 
-    def __init__(self):
-        self.model = get_model()
+    def __init__(
+        self,
+        persona_cache: PersonaCache | None = None,
+        max_concurrency: int | None = None,
+        rewrite_mode: RewriteMode = "full",
+        resume_store: ResumeStore | None = None,
+    ):
+        """
+        Initializes the ResumeDoctor class.
+
+        Args:
+            persona_cache: The cache used to share personas across candidates.
+            max_concurrency: The maximum number of model calls in flight at once, shared by
+                every pipeline run by this instance. None means no limit.
+            rewrite_mode: "full" to have the model rewrite the whole resume, "edits" to have it
+                return compact edit operations that are applied to the original locally.
+            resume_store: The store holding the parsed resumes. Defaults to the process-wide store.
+        """
+        self.model = ModelRouter()
+        self.rewrite_mode = rewrite_mode
+        self.persona_cache = persona_cache or PersonaCache()
+        self.resume_store = resume_store or get_resume_store()
+        self.model_slots = (
+            threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        )
         self.graph = self.build_graph()
 
     def build_graph(self):
         builder = StateGraph(ResumeDoctorState)
 
         self.SYSTEM_PROMPT = """
-You are an expert resume reviever and writer. You have been asked to review a resume given a job description and a persona.
-
-Here is the job description:
-{job_description}
-
-Here is the resume:
-{resume}
+You are an expert resume reviever and writer. You have been asked to review the resume above given the job description above and a persona.
         """
-        self.PERSONA_GENERATION_PROMPT = """
-Create an example persona for a likely interviewer for the given job description and age group. 
-Your output should be just the persona, with no other comments.
-
-Here is the age group:
-{age_category}
-"""
 
         self.REWRITE_RESUME_PROMPT = """
 Tailor the given resume to appeal to the persona below. Keep the tone of the original resume.
 Your output should be just the updated resume in markdown, with no other comments.
 
+Here is the persona:
+{persona}
+"""
+        self.EDIT_RESUME_PROMPT = """
+Tailor the given resume to appeal to the persona below. Keep the tone of the original resume.
+Do not rewrite the whole resume. Instead, output a json list of edit operations, with no other comments.
+Only use the following operations:
+- {{"op": "replace_bullet", "section": "section heading", "old": "original line, copied exactly", "new": "tailored line"}}
+- {{"op": "reword_summary", "text": "tailored summary"}}
+- {{"op": "reorder_skills", "skills": ["most relevant skill", "next skill"]}}
+
 Here is the persona:
 {persona}
 """
@@ -73,60 +125,139 @@ Here is the persona:
         builder.add_node(
             "generate_interview_questions", self.generate_interview_questions
         )
+        # The rewrite and the questions only depend on the persona, so they run in parallel once it is ready.
         builder.add_edge("generate_persona", "update_resume")
-        builder.add_edge("update_resume", "generate_interview_questions")
+        builder.add_edge("generate_persona", "generate_interview_questions")
+        builder.add_edge("update_resume", END)
         builder.add_edge("generate_interview_questions", END)
 
         builder.set_entry_point("generate_persona")
 
         return builder.compile()
 
-    def _get_system_prompt(self, state: ResumeDoctorState) -> SystemMessage:
-        return SystemMessage(
-            content=self.SYSTEM_PROMPT.format(
-                job_description=state["job_description"], resume=state["resume"]
-            )
+    def batch(
+        self,
+        resume_id: str,
+        job_description: str,
+        age_categories: List[str] | None = None,
+    ) -> Iterator[tuple[str, ResumeDoctorState | None, Exception | None]]:
+        """
+        Runs the pipeline for several age categories concurrently.
+
+        Model calls across all pipelines share the max_concurrency limit of this instance.
+        A failing category does not stop the others.
+
+        Args:
+            resume_id: The id of the resume in the resume store.
+            job_description: The job description text.
+            age_categories: The age categories to run. Defaults to all of them.
+
+        Yields:
+            (age_category, result, error) tuples, in the order the pipelines finish. Either the
+            result or the error raised by the pipeline of that category is None.
+        """
+        age_categories = age_categories or AGE_CATEGORIES
+        with ThreadPoolExecutor(max_workers=len(age_categories)) as executor:
+            futures = {
+                executor.submit(
+                    self.graph.invoke,
+                    {
+                        "resume_id": resume_id,
+                        "job_description": job_description,
+                        "age_category": age_category,
+                    },
+                ): age_category
+                for age_category in age_categories
+            }
+            for future in as_completed(futures):
+                error = future.exception()
+                yield futures[future], None if error else future.result(), error
+
+    @contextmanager
+    def _model_slot(self):
+        # Waits for a free slot when a concurrency limit is set
+        if self.model_slots is None:
+            yield
+            return
+        with self.model_slots:
+            yield
+
+    def _fit_prompt(
+        self, state: ResumeDoctorState, node: str, request: str
+    ) -> FittedPrompt:
+        return fit_prompt(
+            self.model.model_for(node),
+            self.SYSTEM_PROMPT,
+            state["job_description"],
+            request,
+            resume=self.resume_store.get(state["resume_id"]),
         )
 
     def generate_persona(self, state: ResumeDoctorState) -> ResumeDoctorState:
-        messages = [
-            self._get_system_prompt(state),
-            HumanMessage(
-                content=self.PERSONA_GENERATION_PROMPT.format(
-                    age_category=state["age_category"]
-                )
-            ),
-        ]
-
-        response = self.model.invoke(messages)
+        with self._model_slot():
+            persona = self.persona_cache.get_or_generate(
+                self.model, state["job_description"], state["age_category"]
+            )
 
-        return {"persona": response.content}
+        return {"persona": persona}
 
     def update_resume(self, state: ResumeDoctorState) -> ResumeDoctorState:
-        messages = [
-            self._get_system_prompt(state),
-            HumanMessage(
-                content=self.REWRITE_RESUME_PROMPT.format(persona=state["persona"])
-            ),
-        ]
+        if self.rewrite_mode == "edits":
+            return self.edit_resume(state)
+
+        fitted = self._fit_prompt(
+            state,
+            "update_resume",
+            self.REWRITE_RESUME_PROMPT.format(persona=state["persona"]),
+        )
 
-        response = self.model.invoke(messages)
+        with self._model_slot():
+            response = self.model.invoke(fitted["messages"], node="update_resume")
 
-        return {"updated_resume": response.content}
+        return {"updated_resume": response.content, "prompt_notes": fitted["dropped"]}
+
+    def edit_resume(self, state: ResumeDoctorState) -> ResumeDoctorState:
+        """
+        Tailors the resume through compact edit operations instead of a full rewrite.
+
+        The model only returns the edits, which are applied to the parsed original locally,
+        so output tokens scale with the number of changes rather than the length of the resume.
+        """
+        fitted = self._fit_prompt(
+            state,
+            "update_resume",
+            self.EDIT_RESUME_PROMPT.format(persona=state["persona"]),
+        )
+
+        with self._model_slot():
+            response = self.model.invoke(fitted["messages"], node="update_resume")
+
+        resume = self.resume_store.text(state["resume_id"])
+        updated_resume, applied, skipped = apply_edits(
+            resume, parse_edits(response.content)
+        )
+        return {
+            "updated_resume": updated_resume,
+            "resume_edits": applied,
+            "skipped_edits": skipped,
+            "resume_diff": diff_resumes(resume, updated_resume),
+            "prompt_notes": fitted["dropped"],
+        }
 
     def generate_interview_questions(
         self, state: ResumeDoctorState
     ) -> ResumeDoctorState:
-        messages = [
-            self._get_system_prompt(state),
-            HumanMessage(
-                content=self.INTERVIEW_QUESTIONS_PROMPT.format(
-                    interview_questions=state["persona"]
-                )
+        fitted = self._fit_prompt(
+            state,
+            "generate_interview_questions",
+            self.INTERVIEW_QUESTIONS_PROMPT.format(
+                interview_questions=state["persona"]
             ),
-        ]
+        )
 
-        response = self.model.invoke(messages)
-        questions = extra_json_object(response.content)
+        with self._model_slot():
+            questions = self.model.invoke_structured(
+                fitted["messages"], "generate_interview_questions", InterviewQuestions
+            )
 
-        return {"interview_questions": questions}
+        return {"interview_questions": questions, "prompt_notes": fitted["dropped"]}
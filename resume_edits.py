@@ -0,0 +1,308 @@
+# /resume-app/resume_edits.py
+import difflib
+import re
+from typing import List, Literal, Tuple, TypedDict
+
+from structured_output import StructuredOutputError, load_json
+
+SECTION_HEADINGS = {
+    "summary",
+    "profile",
+    "professional summary",
+    "about me",
+    "objective",
+    "experience",
+    "work experience",
+    "professional experience",
+    "employment history",
+    "education",
+    "skills",
+    "technical skills",
+    "key skills",
+    "projects",
+    "certifications",
+    "awards",
+    "publications",
+    "languages",
+    "interests",
+    "references",
+}
+SUMMARY_HEADINGS = {
+    "summary",
+    "profile",
+    "professional summary",
+    "about me",
+    "objective",
+}
+SKILLS_HEADINGS = {"skills", "technical skills", "key skills"}
+BULLET_PREFIX = re.compile(r"^\s*([•●▪◦‣*\-–]+)\s*")
+
+# Lines that differ by more than this are not considered the same bullet
+MIN_LINE_SIMILARITY = 0.85
+
+
+class ResumeSection(TypedDict):
+    """
+    A dictionary representing a section of a parsed resume.
+
+    Attributes:
+        title: The section heading, or an empty string for the text before the first heading.
+        lines: The lines of the section, without the heading.
+    """
+
+    title: str
+    lines: List[str]
+
+
+class ResumeEdit(TypedDict, total=False):
+    """
+    A dictionary representing a single edit operation on a resume.
+
+    Attributes:
+        op: The operation, one of "replace_bullet", "reword_summary" or "reorder_skills".
+        section: The title of the section holding the bullet, for "replace_bullet".
+        old: The original bullet text, for "replace_bullet".
+        new: The replacement bullet text, for "replace_bullet".
+        text: The new summary text, for "reword_summary".
+        skills: The skills in their new order, for "reorder_skills".
+    """
+
+    op: Literal["replace_bullet", "reword_summary", "reorder_skills"]
+    section: str
+    old: str
+    new: str
+    text: str
+    skills: List[str]
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", BULLET_PREFIX.sub("", text)).strip().lower()
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip().rstrip(":")
+    if not stripped or len(stripped) > 40 or BULLET_PREFIX.match(line):
+        return False
+    if stripped.lower() in SECTION_HEADINGS:
+        return True
+    return stripped.isupper() and len(stripped.split()) <= 4
+
+
+def parse_sections(resume: str) -> List[ResumeSection]:
+    """
+    Splits the resume text into sections, using common resume headings.
+
+    Args:
+        resume: The parsed resume text.
+
+    Returns:
+        A list of sections, in document order.
+    """
+    sections = [ResumeSection(title="", lines=[])]
+    for line in resume.splitlines():
+        if _is_heading(line):
+            sections.append(ResumeSection(title=line.strip().rstrip(":"), lines=[]))
+        elif line.strip():
+            sections[-1]["lines"].append(line.rstrip())
+
+    if not sections[0]["lines"]:
+        sections.pop(0)
+    return sections
+
+
+def render_sections(sections: List[ResumeSection]) -> str:
+    """
+    Renders the sections back into a markdown resume.
+
+    Args:
+        sections: The resume sections.
+
+    Returns:
+        The resume in markdown.
+    """
+    blocks = []
+    for section in sections:
+        lines = [f"## {section['title']}"] if section["title"] else []
+        blocks.append("\n".join(lines + section["lines"]))
+    return "\n\n".join(blocks) + "\n"
+
+
+def _find_sections(
+    sections: List[ResumeSection], names: set[str] | str | None
+) -> List[ResumeSection]:
+    if isinstance(names, str):
+        names = {names.strip().lower()}
+    if not names:
+        return sections
+    matches = [s for s in sections if s["title"].lower() in names]
+    return matches or sections
+
+
+def _replace_bullet(sections: List[ResumeSection], edit: ResumeEdit) -> bool:
+    old = _normalize(edit["old"])
+    best = None
+    best_ratio = MIN_LINE_SIMILARITY
+    for section in _find_sections(sections, edit.get("section")):
+        for i, line in enumerate(section["lines"]):
+            ratio = difflib.SequenceMatcher(None, old, _normalize(line)).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = (section, i), ratio
+
+    if best is None:
+        return False
+
+    section, i = best
+    prefix = BULLET_PREFIX.match(section["lines"][i])
+    new = BULLET_PREFIX.sub("", edit["new"]).strip()
+    section["lines"][i] = f"{prefix.group(0) if prefix else ''}{new}"
+    return True
+
+
+def _reword_summary(sections: List[ResumeSection], edit: ResumeEdit) -> bool:
+    matches = [s for s in sections if s["title"].lower() in SUMMARY_HEADINGS]
+    if not matches:
+        return False
+    matches[0]["lines"] = edit["text"].strip().splitlines()
+    return True
+
+
+def _split_skills(text: str) -> List[str]:
+    # Splits on the commas outside parentheses, so "AWS (EC2, S3)" stays one skill
+    items, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth = max(depth - 1, 0)
+        elif char == "," and depth == 0:
+            items.append(text[start:i])
+            start = i + 1
+    items.append(text[start:])
+    return [item.strip() for item in items if item.strip()]
+
+
+def _skill_rank(text: str, rank: dict[str, int]) -> int:
+    # The best rank of the requested skills naming the text, e.g. "React" names "React.js",
+    # and "Lambda" names "AWS (EC2, S3, Lambda)"
+    names = [re.sub(r"\(.*?\)", "", text)] + re.findall(r"\(([^)]*)\)", text)
+    names = [_normalize(n) for name in names for n in _split_skills(name)]
+    best = len(rank)
+    for skill, i in rank.items():
+        if i < best and any(
+            re.match(re.escape(skill) + r"(?=$|[\s.])", name)
+            or re.match(re.escape(name) + r"(?=$|[\s.])", skill)
+            for name in names
+        ):
+            best = i
+    return best
+
+
+def _reorder_skills(sections: List[ResumeSection], edit: ResumeEdit) -> bool:
+    matches = [s for s in sections if s["title"].lower() in SKILLS_HEADINGS]
+    if not matches:
+        return False
+    section = matches[0]
+    rank = {_normalize(skill): i for i, skill in enumerate(edit["skills"])}
+    rank.pop("", None)
+
+    # Skills are listed one per line, or as comma separated lines, optionally with a category
+    # label such as "Languages:". Skills are reordered within each line, and the lines by their
+    # most relevant skill, keeping the bullets and labels.
+    lines = []
+    for line in section["lines"]:
+        prefix = BULLET_PREFIX.match(line)
+        prefix = prefix.group(0) if prefix else ""
+        body = line[len(prefix) :]
+        label, _, skills = body.partition(":")
+        if not skills or len(label) > 40 or "," in label:
+            label, skills = "", body
+        items = sorted(
+            enumerate(_split_skills(skills)),
+            key=lambda item: (_skill_rank(item[1], rank), item[0]),
+        )
+        line_rank = min(
+            [_skill_rank(label, rank)] + [_skill_rank(item, rank) for _, item in items]
+        )
+        text = ", ".join(item for _, item in items)
+        lines.append(
+            (line_rank, f"{prefix}{label}: {text}" if label else f"{prefix}{text}")
+        )
+
+    if all(line_rank == len(rank) for line_rank, _ in lines):
+        return False
+    ordered = sorted(enumerate(lines), key=lambda line: (line[1][0], line[0]))
+    section["lines"] = [text for _, (_, text) in ordered]
+    return True
+
+
+EDIT_OPERATIONS = {
+    "replace_bullet": _replace_bullet,
+    "reword_summary": _reword_summary,
+    "reorder_skills": _reorder_skills,
+}
+
+
+def parse_edits(input_text: str) -> List[ResumeEdit]:
+    """
+    Extracts the list of edit operations from the model output.
+
+    Args:
+        input_text: The model output, holding a json list of edit operations.
+
+    Returns:
+        The edit operations. Entries that are not objects are dropped, and malformed json is
+        repaired where possible, otherwise no edits are returned.
+    """
+    try:
+        edits = load_json(input_text, "[")
+    except StructuredOutputError:
+        return []
+    return [edit for edit in edits if isinstance(edit, dict)]
+
+
+def apply_edits(
+    resume: str, edits: List[ResumeEdit]
+) -> Tuple[str, List[ResumeEdit], List[ResumeEdit]]:
+    """
+    Rebuilds the tailored resume by applying the edit operations to the parsed original.
+
+    Args:
+        resume: The parsed resume text.
+        edits: The edit operations.
+
+    Returns:
+        The updated resume in markdown, the edits that were applied, and the edits that were skipped
+        because their operation is unknown or their target could not be found.
+    """
+    sections = parse_sections(resume)
+    applied, skipped = [], []
+    for edit in edits:
+        operation = EDIT_OPERATIONS.get(edit.get("op"))
+        try:
+            ok = operation is not None and operation(sections, edit)
+        except (KeyError, TypeError, AttributeError):
+            ok = False
+        (applied if ok else skipped).append(edit)
+
+    return render_sections(sections), applied, skipped
+
+
+def diff_resumes(original: str, updated: str) -> str:
+    """
+    Returns a unified diff between the original resume, rendered as markdown, and the updated resume.
+
+    Args:
+        original: The parsed resume text.
+        updated: The updated resume in markdown.
+
+    Returns:
+        The diff text.
+    """
+    return "".join(
+        difflib.unified_diff(
+            render_sections(parse_sections(original)).splitlines(keepends=True),
+            updated.splitlines(keepends=True),
+            fromfile="original",
+            tofile="tailored",
+        )
+    )
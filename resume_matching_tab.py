@@ -1,10 +1,23 @@
 # /resume-app/resume_matching_tab.py
-from resume_screener import ResumeScreener
+from decision_aggregator import DEFAULT_PASS_THRESHOLD
+from resume_screener import ResumeScreener, parse_criteria
 import streamlit as st
 import os
 
+from jobs import (
+    ACTIVE_STATUSES,
+    get_job_executor,
+    recall_job,
+    remember_job,
+    render_job_progress,
+)
+from profiling import profiling_enabled
+from resume_store import get_resume_store
 from utils import ApplicationState
 
+screening_job_name = "screening_job_id"
+matrix_job_name = "matrix_job_id"
+
 
 def upload_resume() -> str:
     """
@@ -55,7 +68,8 @@ def get_criteria() -> list[str] | None:
     Gets the criteria for matching from the user.
 
     This function presents a text area to the user, allowing them to enter criteria for matching.
-    The user can separate multiple criteria using the '|' character.
+    The user can separate multiple criteria using the '|' character, mark must-have
+    criteria with a leading '!', and weight criteria with a trailing '*<weight>'.
     If no criteria are provided, the function returns None, indicating that criteria should be inferred from the job description.
 
     Returns:
@@ -66,7 +80,9 @@ def get_criteria() -> list[str] | None:
         value=None,
         placeholder="Enter your criteria, (use | to separate each criteria). Leave blank to infer from job description",
         height=20,
-        help="Enter the criteria. Separate each criteria with a '|'.",
+        help="Enter the criteria. Separate each criteria with a '|'. "
+        "Start a criterion with '!' to make it a must-have, "
+        "and end it with '*2' to count it twice.",
     )
 
     if criteria_str is not None:
@@ -75,15 +91,172 @@ def get_criteria() -> list[str] | None:
     return None
 
 
-def render_decisions(decisions: list[dict]):
+def get_must_have_top_k() -> int:
+    """
+    Gets the number of leading criteria to treat as must-have.
+
+    Screening stops as soon as a must-have criterion fails, and the remaining criteria are skipped.
+
+    Returns:
+        int: The number of must-have criteria, 0 to always evaluate every criterion.
+    """
+    return st.slider(
+        "Must-have criteria",
+        0,
+        10,
+        0,
+        help="Stop screening when one of the first criteria fails. "
+        "Ignored if criteria are marked with '!'.",
+    )
+
+
+def get_pass_threshold() -> float:
+    """
+    Gets the weighted share of the criteria a resume has to pass to be an overall match.
+
+    Returns:
+        float: The pass threshold, between 0 and 1.
+    """
+    return st.slider(
+        "Pass threshold",
+        0.0,
+        1.0,
+        DEFAULT_PASS_THRESHOLD,
+        step=0.05,
+        help="The weighted share of the criteria the resume has to pass to be a match",
+    )
+
+
+def get_job_descriptions() -> list[tuple[str, str]]:
+    """
+    Gets several job descriptions from the user, as uploaded text files.
+
+    Returns:
+        list[tuple[str, str]]: A list of (file name, job description) tuples.
+    """
+    uploaded_files = st.file_uploader(
+        "Job Descriptions",
+        type=["txt", "md"],
+        accept_multiple_files=True,
+        help="Upload one text file per job description",
+    )
+    return [
+        (f.name, f.getvalue().decode("utf-8", errors="ignore"))
+        for f in uploaded_files or []
+    ]
+
+
+def rank_matrix(rows: list[dict]) -> list[dict]:
+    """
+    Ranks the matrix results, overall matches first, then by score.
+
+    Args:
+        rows: A list of dictionaries, one per job description.
+
+    Returns:
+        list[dict]: The rows in ranked order.
+    """
+    return sorted(
+        rows,
+        key=lambda row: (
+            row["Overall"] != "pass",
+            -row["Score"],
+            row["Job Description"],
+        ),
+    )
+
+
+def render_matrix_mode():
+    """
+    Renders the matrix mode, matching one resume against several job descriptions.
+
+    The resume is parsed once and screened against every job description concurrently in a
+    background job, and the ranked table is shown once it finishes.
+    """
+    job_descriptions = get_job_descriptions()
+    criteria, must_have, weights = parse_criteria(get_criteria())
+    num_auto_generated_criteria = st.slider(
+        "Number of Criteria",
+        1,
+        10,
+        3,
+        help="Number of criteria to generate automatically if none are provided",
+    )
+    must_have_top_k = get_must_have_top_k()
+    pass_threshold = get_pass_threshold()
+    resume_file_path = upload_resume()
+    start = st.button("Run check", disabled=not job_descriptions)
+
+    if start and resume_file_path is not None and job_descriptions:
+        screener = ResumeScreener()
+        names = [name for name, _ in job_descriptions]
+
+        def run(job):
+            resume_id, resume_warnings = get_resume_store().load(resume_file_path)
+            if os.path.exists(resume_file_path):
+                os.remove(resume_file_path)
+            job.report("parse_resume")
+
+            rows = []
+            for i, response in screener.batch(
+                resume_id,
+                [job_description for _, job_description in job_descriptions],
+                criteria=criteria,
+                num_auto_generated_criteria=num_auto_generated_criteria,
+                must_have=must_have,
+                must_have_top_k=must_have_top_k,
+                weights=weights,
+                pass_threshold=pass_threshold,
+            ):
+                rows.append(
+                    {
+                        "Job Description": names[i],
+                        "Overall": response["decision"],
+                        "Score": response["score"],
+                        "Passed": sum(
+                            1 for d in response["decisions"] if d["decision"] != "fail"
+                        ),
+                        "Criteria": len(response["decisions"]),
+                        "Skipped": len(response.get("skipped_criteria") or []),
+                        "Reason": response["reason"],
+                    }
+                )
+                job.report(names[i])
+            return {"rows": rows, "resume_warnings": resume_warnings}
+
+        job_id = get_job_executor().submit(
+            "matrix_screening", run, profile=profiling_enabled()
+        )
+        remember_job(matrix_job_name, job_id)
+
+    job = recall_job(matrix_job_name)
+    if job is not None and job.status in ACTIVE_STATUSES:
+        render_job_progress(matrix_job_name, "Scoring against the job descriptions")
+    elif job is not None and job.status == "failed":
+        st.error(f"Scoring failed: {job.error_line}")
+    elif job is not None and st.session_state.get("matrix_job_applied") != job.id:
+        st.session_state["matrix_results"] = job.result
+        st.session_state["matrix_job_applied"] = job.id
+
+    if "matrix_results" in st.session_state:
+        for warning in st.session_state["matrix_results"]["resume_warnings"]:
+            st.warning(warning)
+        st.dataframe(
+            rank_matrix(st.session_state["matrix_results"]["rows"]), hide_index=True
+        )
+
+
+def render_decisions(decisions: list[dict], skipped_criteria: list[str] | None = None):
     """
     Renders the decisions made for each individual criterion.
 
     This function displays the results of the matching process for each criterion,
-    showing whether the resume matched the criterion and the reason for the decision.
+    showing whether the resume matched the criterion and the reason for the decision,
+    followed by the criteria skipped after a must-have criterion failed.
 
     Args:
         decisions: A list of dictionaries, each representing a decision for a specific criterion.
+        skipped_criteria: The criteria that were not evaluated.
     """
     st.subheader("Matching against individual criteria")
     for decision in decisions:
@@ -91,20 +264,26 @@ def render_decisions(decisions: list[dict]):
             status = ":red[Not a match]"
         else:
             status = ":green[A match]"
-        st.markdown(f"**{decision['criterion']} - {status}**")
+        must_have = " (must-have)" if decision.get("must_have") else ""
+        st.markdown(f"**{decision['criterion']}{must_have} - {status}**")
         st.markdown(decision["reason"])
         st.divider()
 
+    if skipped_criteria:
+        st.markdown("**Skipped after a must-have criterion failed**")
+        st.markdown("\n".join(f"- {criterion}" for criterion in skipped_criteria))
+
 
 def render_overall_decision(response):
     """
     Renders the overall decision about the resume's match with the job description.
 
     This function displays the overall decision, indicating whether the resume is a match or not,
-    along with the reason for the decision.
+    along with its score and a summary of how it was reached. The language model is only asked to
+    explain the decision when the user requests it.
 
     Args:
-        response: A dictionary containing the overall decision and reason.
+        response: A dictionary containing the overall decision, score and reason.
     """
     if response["decision"] == "fail":
         status = ":red[Not a match]"
@@ -112,7 +291,19 @@ def render_overall_decision(response):
         status = ":green[A match]"
 
     st.subheader(f"Overall Match - {status}")
+    if response.get("score") is not None:
+        st.metric("Score", f"{response['score']:.0%}")
     st.markdown(response["reason"])
+
+    with st.expander("Explanation"):
+        if "explanation" not in response:
+            if st.button("Explain this decision"):
+                with st.spinner("Explaining ..."):
+                    response["explanation"] = ResumeScreener().explain_decision(
+                        response
+                    )
+        if "explanation" in response:
+            st.markdown(response["explanation"])
     st.divider()
 
 
@@ -141,8 +332,17 @@ def render_resume_matching_tab():
     #     with open("data/john-doe-resume.pdf", "rb") as f:
     #         st.download_button("Download Resume", f, file_name="john-doe-resume.pdf")
 
+    matrix_mode = st.toggle(
+        "Match against several job descriptions",
+        key="resume_matching_matrix_mode",
+        help="Parse the resume once and rank how well it fits each job description.",
+    )
+    if matrix_mode:
+        render_matrix_mode()
+        return
+
     job_description = get_job_description()
-    criteria = get_criteria()
+    criteria, must_have, weights = parse_criteria(get_criteria())
     num_auto_generated_criteria = st.slider(
         "Number of Criteria",
         1,
@@ -150,36 +350,71 @@ def render_resume_matching_tab():
         3,
         help="Number of criteria to generate automatically if none are provided",
     )
+    must_have_top_k = get_must_have_top_k()
+    pass_threshold = get_pass_threshold()
     resume_file_path = upload_resume()
     start = st.button("Run check")
     if start and resume_file_path is not None and job_description is not None:
-        with st.spinner("Scoring ..."):
-            screener = ResumeScreener()
-
-            response = screener.graph.invoke(
-                {
-                    "path_to_resume": resume_file_path,
-                    "job_description": job_description,
-                    "criteria": criteria,
-                    "num_auto_generated_criteria": num_auto_generated_criteria,
-                }
-            )
-
-            # Always reset state after new CV
-            app_state = ApplicationState(
-                resume=response["resume"],
-                job_description=response["job_description"],
-                criteria=response["criteria"],
-                decisions=response["decisions"],
-                decision=response["decision"],
-                reason=response["reason"],
-            )
-
-            st.session_state.app_state = app_state
+        screener = ResumeScreener()
+        job_id = get_job_executor().submit_graph(
+            "screening",
+            screener.graph,
+            {
+                "path_to_resume": resume_file_path,
+                "job_description": job_description,
+                "criteria": criteria,
+                "num_auto_generated_criteria": num_auto_generated_criteria,
+                "must_have": must_have,
+                "must_have_top_k": must_have_top_k,
+                "weights": weights,
+                "pass_threshold": pass_threshold,
+            },
+            profile=profiling_enabled(),
+        )
+        remember_job(screening_job_name, job_id)
+
+    job = recall_job(screening_job_name)
+    if job is not None and job.status in ACTIVE_STATUSES:
+        render_job_progress(screening_job_name, "Scoring")
+    elif job is not None and job.status == "failed":
+        st.error(f"Scoring failed: {job.error_line}")
+    elif job is not None and st.session_state.get("screening_job_applied") != job.id:
+        response = job.result
+
+        # Always reset state after new CV
+        app_state = ApplicationState(
+            resume_id=response["resume_id"],
+            job_description=response["job_description"],
+            criteria=response["criteria"],
+            decisions=response["decisions"],
+            decision=response["decision"],
+            reason=response["reason"],
+            score=response["score"],
+            skipped_criteria=response.get("skipped_criteria") or [],
+            resume_warnings=response.get("resume_warnings") or [],
+            prompt_notes=response.get("prompt_notes") or [],
+        )
+
+        st.session_state.app_state = app_state
+        st.session_state["screening_job_applied"] = job.id
+
+    render_screening_result()
+
+
+@st.fragment
+def render_screening_result():
+    """
+    Renders the result of the latest screening as a fragment.
 
+    Asking for an explanation of the decision only reruns this fragment, not the whole app.
+    """
     if "app_state" in st.session_state:
         app_state = st.session_state.app_state
+        for warning in app_state.get("resume_warnings") or []:
+            st.warning(warning)
+        for note in app_state.get("prompt_notes") or []:
+            st.info(note)
         if "decision" in app_state:
             render_overall_decision(app_state)
         if "decisions" in app_state:
-            render_decisions(app_state["decisions"])
+            render_decisions(app_state["decisions"], app_state.get("skipped_criteria"))
@@ -2,26 +2,44 @@
 import json
 import operator
 import os
-from typing import List, Optional, TypedDict
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Literal, Optional
 
-from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.graph import END, StateGraph
-from typing_extensions import Annotated
+from pydantic import BeforeValidator
+from typing_extensions import Annotated, NotRequired, TypedDict
 
-from utils import extra_json_object, extract_json_list, get_model, parse_resume
+from criteria_cache import criteria_cache
+from criteria_library import CriteriaLibrary, get_criteria_library
+from decision_aggregator import DEFAULT_PASS_THRESHOLD, aggregate_decisions
+from model_router import ModelRouter
+from prompt_budget import fit_prompt, merge_notes
+from resume_store import ResumeStore, get_resume_store
+
+CRITERION_WEIGHT = re.compile(r"\s*\*\s*(\d+(?:\.\d+)?)\s*$")
+
+
+def _normalize_verdict(value):
+    # Models write "Pass", "FAIL " and the like
+    return value.strip().lower() if isinstance(value, str) else value
 
 
 class ScreeningDecision(TypedDict):
     """
     A dictionary representing a screening decision.
 
+    It is also the schema the model output for a criterion is validated against.
+
     Attributes:
         reason: The reason for the decision.
         decision: The decision itself, either "pass" or "fail".
+        criterion_id: The canonical id of the criterion, shared by equivalent criteria.
     """
 
     reason: str
-    decision: str
+    decision: Annotated[Literal["pass", "fail"], BeforeValidator(_normalize_verdict)]
+    criterion_id: NotRequired[str]
 
 
 class ScreenerState(TypedDict):
@@ -29,24 +47,74 @@ class ScreenerState(TypedDict):
     A dictionary representing the state of the resume screener.
 
     Attributes:
-        path_to_resume: The path to the resume file.
-        resume: The parsed resume text.
+        path_to_resume: The path to the resume file. Not needed when the resume has already been parsed.
+        resume_id: The id of the parsed resume in the resume store.
+        resume_warnings: The reasons the resume was cut short, if it went over the size limits.
         job_description: The job description text.
         criteria: A list of screening criteria.
         decisions: A list of screening decisions.
         decision: The overall decision, either "pass" or "fail".
-        reason: The reason for the overall decision.
+        reason: A summary of how the overall decision was reached.
+        score: The weighted share of the criteria passed, between 0 and 1.
         num_auto_generated_criteria: The number of automatically generated criteria.
+        must_have: The indices of the criteria that must pass. When one fails, the remaining
+            criteria are skipped.
+        must_have_top_k: Treat the first k criteria as must-have, if none are marked explicitly.
+        skipped_criteria: The criteria that were not evaluated because a must-have failed.
+        weights: The weight of each criterion. Defaults to 1 for every criterion.
+        pass_threshold: The score needed for an overall match.
+        prompt_notes: What was left out of the prompts to fit the model's context window.
     """
 
-    path_to_resume: str
-    resume: str
+    path_to_resume: str | None
+    resume_id: str
+    resume_warnings: Optional[List[str]]
     job_description: str
     criteria: List[str]
     decisions: Annotated[List[ScreeningDecision], operator.add]
     decision: str
     reason: str
+    score: float
     num_auto_generated_criteria: Optional[int]
+    must_have: Optional[List[int]]
+    must_have_top_k: Optional[int]
+    skipped_criteria: Optional[List[str]]
+    weights: Optional[List[float]]
+    pass_threshold: Optional[float]
+    prompt_notes: Annotated[List[str], merge_notes]
+
+
+def parse_criteria(
+    criteria: List[str] | None,
+) -> tuple[List[str] | None, List[int], List[float] | None]:
+    """
+    Splits out the must-have markers and weights of the criteria as entered.
+
+    A leading '!' marks a must-have criterion, and a trailing '*<weight>' sets its weight.
+
+    Args:
+        criteria: The criteria as entered, e.g. ["!5+ years Python *3", "React"].
+
+    Returns:
+        The criteria without the markers, the indices of the must-have criteria, and the weights,
+        or None if no weights were given.
+    """
+    if criteria is None:
+        return None, [], None
+
+    parsed, must_have, weights = [], [], []
+    for i, criterion in enumerate(criteria):
+        if criterion.startswith("!"):
+            must_have.append(i)
+            criterion = criterion.lstrip("!")
+        weight = CRITERION_WEIGHT.search(criterion)
+        if weight:
+            criterion = criterion[: weight.start()]
+        weights.append(float(weight.group(1)) if weight else 1.0)
+        parsed.append(criterion.strip())
+
+    has_weights = any(weight != 1.0 for weight in weights)
+    return parsed, must_have, weights if has_weights else None
 
 
 class ResumeScreener:
@@ -59,21 +127,28 @@ class ResumeScreener:
     about the compatibility of the resume with the job description.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        criteria_library: CriteriaLibrary | None = None,
+        resume_store: ResumeStore | None = None,
+    ):
         """
         Initializes the ResumeScreener class.
 
-        Loads the language model and sets up the system prompts and state graph.
+        Sets up the model router, which picks the language model used by each node,
+        the system prompts and the state graph.
+
+        Args:
+            criteria_library: The library mapping criteria to canonical ids, and caching verdicts
+                per resume and canonical criterion. Defaults to the process-wide library.
+            resume_store: The store holding the parsed resumes. Defaults to the process-wide store.
         """
-        self.model = get_model()
+        self.model = ModelRouter()
+        self.criteria_library = criteria_library or get_criteria_library()
+        self.resume_store = resume_store or get_resume_store()
 
         self.SYSTEM_PROMPT = """
-You are an expert resume reviever. You have been asked to review the compatibilty of a resume with a job description.
-Here is the job description:
-{job_description}
-
-Here is the resume:
-{resume}
+You are an expert resume reviever. You have been asked to review the compatibilty of the resume above with the job description above.
         """
 
         self.REVIEW_AGAINST_CRITERIA_PROMPT = """
@@ -90,20 +165,26 @@ Your output should be in the following format:
 ### Screening Criteria
 {criterion}
 """
-        self.OVERALL_COMPATIBILITY_PROMPT = """
-Given the individual criterion matching results below, please decide if the resume is an overrall match with the job description, giving an overall 
-reason for the decision.
-Your output should be in the following format:
-{{
-    "decision": "pass or fail",
-    "reason": "reason for the decision"
-}}
+        self.EXPLAIN_DECISION_PROMPT = """
+Given the individual criterion matching results below, the resume was judged to be {verdict} for the job description, with a 
+weighted score of {score:.2f}. Please explain the overall decision in a short paragraph, covering the main strengths and gaps 
+of the resume. Your output should just be the explanation with no other text.
 
 
 ### Matching Results
 {compatibilities}
 """
 
+        self.SKIPPED_CRITERIA_PROMPT = """
+
+A must-have criterion failed, so the following criteria were not evaluated:
+{skipped}
+"""
+
+        self.CRITERIA_SYSTEM_PROMPT = """
+You are an expert resume reviever. You have been asked to work out how to review the compatibilty of resumes with the job description above.
+        """
+
         self.CRITERIA_GENERATION_PROMPT = """
 From the job description, generate not more than {num_criteria} criteria that can be used to measure the compatibility of a resume to the job description.
 Your output should just be a list of strings in the following format with no other text, and ranked in order of importance:
@@ -112,18 +193,59 @@ Your output should just be a list of strings in the following format with no oth
 
         self.build_graph()
 
-    def get_system_prompt(self, job_description: str, resume: str) -> str:
+    def batch(
+        self,
+        resume_id: str,
+        job_descriptions: List[str],
+        criteria: List[str] | None = None,
+        num_auto_generated_criteria: int = 3,
+        max_concurrency: int = 4,
+        must_have: List[int] | None = None,
+        must_have_top_k: int | None = None,
+        weights: List[float] | None = None,
+        pass_threshold: float | None = None,
+    ) -> Iterator[tuple[int, ScreenerState]]:
         """
-        Returns the system prompt for the language model.
+        Screens one stored resume against several job descriptions concurrently.
 
-        Args:
-            job_description: The job description text.
-            resume: The parsed resume text.
+        Generated criteria are cached per job description, so they are shared with other
+        screenings against the same posting.
 
-        Returns:
-            The system prompt string.
+        Args:
+            resume_id: The id of the resume in the resume store.
+            job_descriptions: The job description texts.
+            criteria: The criteria to use for every posting, or None to infer them per posting.
+            num_auto_generated_criteria: The number of criteria to infer.
+            max_concurrency: The number of postings screened at once.
+            must_have: The indices of the must-have criteria.
+            must_have_top_k: Treat the first k criteria as must-have, if none are marked.
+            weights: The weight of each criterion.
+            pass_threshold: The score needed for an overall match.
+
+        Yields:
+            (index, result) tuples, where index is the position of the job description,
+            in the order the screenings finish.
         """
-        return self.SYSTEM_PROMPT.format(job_description=job_description, resume=resume)
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {
+                executor.submit(
+                    self.graph.invoke,
+                    {
+                        "path_to_resume": None,
+                        "resume_id": resume_id,
+                        "job_description": job_description,
+                        "criteria": criteria,
+                        "num_auto_generated_criteria": num_auto_generated_criteria,
+                        "must_have": must_have,
+                        "must_have_top_k": must_have_top_k,
+                        "weights": weights,
+                        "pass_threshold": pass_threshold,
+                    },
+                ): i
+                for i, job_description in enumerate(job_descriptions)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
 
     def build_graph(self):
         """
@@ -164,39 +286,81 @@ Your output should just be a list of strings in the following format with no oth
         """
         Makes the overall decision about the resume's compatibility.
 
-        This method takes the results of the individual criterion evaluations
-        and uses the language model to make an overall decision.
+        This method combines the results of the individual criterion evaluations locally,
+        using the criteria weights, must-haves and pass threshold, so it does not call the model.
+        A narrative explanation can be requested afterwards with explain_decision.
 
         Args:
             state: The current state of the screener.
 
         Returns:
-            The updated state with the overall decision and reason.
+            The updated state with the overall decision, score and reason.
         """
-        compatibilities = []
+        must_have = self._must_have_indices(state)
         for i, decision in enumerate(state["decisions"]):
             decision["criterion"] = state["criteria"][i]
-            compatibilities.append(decision)
-
-        compatibilities = json.dumps(compatibilities)
-        messages = [
-            SystemMessage(
-                content=self.get_system_prompt(
-                    state["job_description"], state["resume"]
-                )
-            ),
-            HumanMessage(
-                content=self.OVERALL_COMPATIBILITY_PROMPT.format(
-                    compatibilities=compatibilities
-                )
-            ),
+            decision["must_have"] = i in must_have
+        skipped_criteria = state["criteria"][len(state["decisions"]) :]
+
+        threshold = state.get("pass_threshold")
+        aggregated = aggregate_decisions(
+            state["criteria"],
+            state["decisions"],
+            weights=state.get("weights"),
+            must_have=must_have,
+            pass_threshold=DEFAULT_PASS_THRESHOLD if threshold is None else threshold,
+        )
+        return {**aggregated, "skipped_criteria": skipped_criteria}
+
+    def explain_decision(self, state: ScreenerState) -> str:
+        """
+        Asks the language model to explain the overall decision of a finished screening.
+
+        This is not part of the graph, so the model is only called when an explanation is wanted.
+
+        Args:
+            state: The final state of the screener.
+
+        Returns:
+            The explanation text.
+        """
+        compatibilities = [
+            {
+                "criterion": decision["criterion"],
+                "decision": decision["decision"],
+                "reason": decision["reason"],
+                "must_have": decision.get("must_have", False),
+            }
+            for decision in state["decisions"]
         ]
-        response = self.model.invoke(messages)
-        parsed_response = extra_json_object(response.content)
-        return {
-            "decision": parsed_response["decision"],
-            "reason": parsed_response["reason"],
-        }
+        request = self.EXPLAIN_DECISION_PROMPT.format(
+            verdict="a match" if state["decision"] == "pass" else "not a match",
+            score=state.get("score") or 0.0,
+            compatibilities=json.dumps(compatibilities),
+        )
+        if state.get("skipped_criteria"):
+            request += self.SKIPPED_CRITERIA_PROMPT.format(
+                skipped=json.dumps(state["skipped_criteria"])
+            )
+        fitted = fit_prompt(
+            self.model.model_for("explain_decision"),
+            self.SYSTEM_PROMPT,
+            state["job_description"],
+            request,
+            resume=self.resume_store.get(state["resume_id"]),
+        )
+        response = self.model.invoke(fitted["messages"], node="explain_decision")
+        return response.content.strip()
+
+    def _must_have_indices(self, state: ScreenerState) -> set[int]:
+        """
+        Returns the indices of the must-have criteria.
+
+        Criteria marked explicitly take precedence over the top k criteria.
+        """
+        if state.get("must_have"):
+            return set(state["must_have"])
+        return set(range(state.get("must_have_top_k") or 0))
 
     def should_generate_criteria(self, state: ScreenerState) -> str:
         """
@@ -226,18 +390,23 @@ Your output should just be a list of strings in the following format with no oth
         """
         Parses the resume file.
 
-        This method reads the resume file and parses it into plain text.
+        This method reads the resume file page by page and parses it into plain text,
+        stopping at the resume size limits, and adds it to the resume store. If the resume
+        is already in the store, there is nothing to do.
 
         Args:
             state: The current state of the screener.
 
         Returns:
-            The updated state with the parsed resume text.
+            The updated state with the id of the parsed resume.
         """
-        parsed_resume = parse_resume(state["path_to_resume"])
+        if state.get("resume_id"):
+            return {}
+
+        resume_id, notes = self.resume_store.load(state["path_to_resume"])
         if os.path.exists(state["path_to_resume"]):
             os.remove(state["path_to_resume"])
-        return {"resume": parsed_resume}
+        return {"resume_id": resume_id, "resume_warnings": notes}
 
     def generate_criteria(self, state: ScreenerState) -> ScreenerState:
         """
@@ -245,6 +414,7 @@ Your output should just be a list of strings in the following format with no oth
 
         This method uses the language model to generate a list of criteria
         that can be used to evaluate the resume's compatibility with the job description.
+        The criteria only depend on the job description, so they are shared through the criteria cache.
 
         Args:
             state: The current state of the screener.
@@ -252,21 +422,25 @@ Your output should just be a list of strings in the following format with no oth
         Returns:
             The updated state with the generated criteria.
         """
-        messages = [
-            SystemMessage(
-                content=self.get_system_prompt(
-                    state["job_description"], state["resume"]
-                )
-            ),
-            HumanMessage(
-                content=self.CRITERIA_GENERATION_PROMPT.format(
-                    num_criteria=(state["num_auto_generated_criteria"] or 3)
-                )
-            ),
-        ]
-        response = self.model.invoke(messages)
-
-        parsed_response = extract_json_list(response.content)
+        num_criteria = state["num_auto_generated_criteria"] or 3
+
+        def generate():
+            fitted = fit_prompt(
+                self.model.model_for("generate_criteria"),
+                self.CRITERIA_SYSTEM_PROMPT,
+                state["job_description"],
+                self.CRITERIA_GENERATION_PROMPT.format(num_criteria=num_criteria),
+            )
+            return self.model.invoke_structured(
+                fitted["messages"], "generate_criteria", List[str]
+            )
+
+        parsed_response = criteria_cache.get_or_generate(
+            state["job_description"],
+            num_criteria,
+            self.model.model_for("generate_criteria"),
+            generate,
+        )
 
         return {"criteria": parsed_response}
 
@@ -277,7 +451,8 @@ Your output should just be a list of strings in the following format with no oth
         This method checks if all criteria have been evaluated.
         If not, it returns "evaluate_criteria" to indicate that more criteria
         should be evaluated. Otherwise, it returns "decision" to indicate
-        that the overall decision should be made.
+        that the overall decision should be made. It also returns "decision"
+        as soon as a must-have criterion fails, skipping the remaining criteria.
 
         Args:
             state: The current state of the screener.
@@ -285,6 +460,11 @@ Your output should just be a list of strings in the following format with no oth
         Returns:
             "evaluate_criteria" or "decision" depending on the current state.
         """
+        must_have = self._must_have_indices(state)
+        for i, decision in enumerate(state["decisions"]):
+            if i in must_have and decision["decision"] == "fail":
+                return "decision"
+
         if len(state["criteria"]) > len(state["decisions"]):
             return "evaluate_criteria"
 
@@ -296,7 +476,9 @@ Your output should just be a list of strings in the following format with no oth
 
         This method uses the language model to evaluate the resume against
         the next criterion in the list. It records the decision and reason
-        for each criterion evaluation.
+        for each criterion evaluation. Verdicts are cached per resume and canonical criterion,
+        so an equivalent criterion from any posting is only sent to the model once.
+        The prompt is fitted to the model's context window before it is sent.
 
         Args:
             state: The current state of the screener.
@@ -307,26 +489,27 @@ Your output should just be a list of strings in the following format with no oth
         last_entry = len(state["decisions"])
         next_criteria = state["criteria"][last_entry]
 
-        messages = [
-            SystemMessage(
-                content=self.get_system_prompt(
-                    state["job_description"], state["resume"]
-                )
-            ),
-            HumanMessage(
-                content=self.REVIEW_AGAINST_CRITERIA_PROMPT.format(
-                    criterion=next_criteria
-                )
-            ),
-        ]
-        response = self.model.invoke(messages)
-
-        parsed_response = extra_json_object(response.content)
+        criterion_id = self.criteria_library.canonical_id(next_criteria)
+        # The resume_id is the content hash of the resume text
+        resume_hash = state["resume_id"]
+        name = self.model.model_for("evaluate_criteria")
+        cached = self.criteria_library.get_decision(resume_hash, criterion_id, name)
+        if cached is not None:
+            return {"decisions": [{**cached, "criterion_id": criterion_id}]}
+
+        fitted = fit_prompt(
+            name,
+            self.SYSTEM_PROMPT,
+            state["job_description"],
+            self.REVIEW_AGAINST_CRITERIA_PROMPT.format(criterion=next_criteria),
+            resume=self.resume_store.get(state["resume_id"]),
+        )
+        verdict = self.model.invoke_structured(
+            fitted["messages"], "evaluate_criteria", ScreeningDecision
+        )
+        decision = {"decision": verdict["decision"], "reason": verdict["reason"]}
+        self.criteria_library.put_decision(resume_hash, criterion_id, name, decision)
         return {
-            "decisions": [
-                {
-                    "decision": parsed_response["decision"],
-                    "reason": parsed_response["reason"],
-                }
-            ]
+            "decisions": [{**decision, "criterion_id": criterion_id}],
+            "prompt_notes": fitted["dropped"],
         }
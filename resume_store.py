@@ -0,0 +1,283 @@
+# /resume-app/resume_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Iterable, List, TypedDict
+
+from resume_edits import ResumeSection, parse_sections
+from utils import content_hash, estimate_tokens, limit_resume_text, load_resume
+
+DEFAULT_STORE_PATH = os.path.join(".cache", "resume_store.sqlite")
+
+# Resumes are deleted this many hours after they were last added
+DEFAULT_RETENTION_HOURS = 24
+
+
+class ParsedResume(TypedDict):
+    """
+    A dictionary representing a parsed resume, built once and shared by all agents.
+
+    Attributes:
+        resume_id: The content hash of the text, used by agent states and checkpoints.
+        text: The parsed resume text, after the size limits.
+        sections: The resume split into sections.
+        section_tokens: The estimated token count of each section, in the same order.
+        tokens: The estimated token count of the whole text.
+    """
+
+    resume_id: str
+    text: str
+    sections: List[ResumeSection]
+    section_tokens: List[int]
+    tokens: int
+
+
+def section_text(section: ResumeSection) -> str:
+    lines = [section["title"]] if section["title"] else []
+    return "\n".join(lines + section["lines"])
+
+
+def build_parsed_resume(text: str) -> ParsedResume:
+    """
+    Splits the resume text into sections and counts the tokens of each.
+
+    Args:
+        text: The parsed resume text.
+
+    Returns:
+        The ParsedResume.
+    """
+    sections = parse_sections(text)
+    return ParsedResume(
+        resume_id=content_hash(text),
+        text=text,
+        sections=sections,
+        section_tokens=[estimate_tokens(section_text(s)) for s in sections],
+        tokens=estimate_tokens(text),
+    )
+
+
+def select_sections(parsed: ParsedResume, titles: Iterable[str] | None = None) -> str:
+    """
+    Returns the text of some sections of a parsed resume, in document order.
+
+    Args:
+        parsed: The parsed resume.
+        titles: The titles of the sections to keep, case insensitive. None keeps the whole text.
+
+    Returns:
+        The text of the sections.
+    """
+    if titles is None:
+        return parsed["text"]
+    titles = {title.strip().lower() for title in titles}
+    return "\n\n".join(
+        section_text(section)
+        for section in parsed["sections"]
+        if section["title"].lower() in titles
+    )
+
+
+class ResumeStore:
+    """
+    A store of parsed resumes, addressed by content hash.
+
+    Agent states, checkpoints and the session only hold the resume_id, and nodes look the resume
+    up here when they build a prompt. Resumes are kept in SQLite so ids resolve across processes
+    and restarts, with the most recently used ones held in memory. They are deleted once they
+    have not been added for the retention period, so candidates' resumes are not kept for good.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        max_cached: int = 256,
+        retention_hours: float | None = None,
+    ):
+        """
+        Initializes the ResumeStore class.
+
+        Args:
+            path: The path to the SQLite database. Defaults to the RESUME_APP_RESUME_STORE
+                environment variable, or .cache/resume_store.sqlite.
+            max_cached: The number of parsed resumes held in memory.
+            retention_hours: How long a resume is kept after it was last added. Defaults to the
+                RESUME_APP_RESUME_RETENTION_HOURS environment variable, or 24 hours.
+        """
+        self.path = path or os.environ.get(
+            "RESUME_APP_RESUME_STORE", DEFAULT_STORE_PATH
+        )
+        self.max_cached = max_cached
+        if retention_hours is None:
+            retention_hours = float(
+                os.environ.get(
+                    "RESUME_APP_RESUME_RETENTION_HOURS", DEFAULT_RETENTION_HOURS
+                )
+            )
+        self.retention_seconds = retention_hours * 3600
+        self._cache: OrderedDict[str, ParsedResume] = OrderedDict()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS resumes ("
+                "id TEXT PRIMARY KEY, text TEXT NOT NULL, sections TEXT NOT NULL, "
+                "section_tokens TEXT NOT NULL, tokens INTEGER NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS resumes_created ON resumes (created)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _remember(self, parsed: ParsedResume):
+        with self._lock:
+            self._cache[parsed["resume_id"]] = parsed
+            self._cache.move_to_end(parsed["resume_id"])
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+    def add(self, text: str) -> tuple[str, List[str]]:
+        """
+        Applies the resume size limits to the text, and stores it unless it is stored already.
+
+        Adding a stored resume again restarts its retention period. Resumes past theirs are
+        deleted.
+
+        Args:
+            text: The parsed resume text.
+
+        Returns:
+            The resume_id, and a warning if the text was cut short.
+        """
+        text, notes = limit_resume_text(text)
+        resume_id = content_hash(text)
+        with self._lock:
+            parsed = self._cache.get(resume_id)
+        if parsed is None:
+            parsed = build_parsed_resume(text)
+
+        with closing(self._connect()) as conn, conn:
+            # created holds the time the resume was last added, which the retention counts from
+            conn.execute(
+                "INSERT INTO resumes "
+                "(id, text, sections, section_tokens, tokens, created) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET created = excluded.created",
+                (
+                    resume_id,
+                    text,
+                    json.dumps(parsed["sections"]),
+                    json.dumps(parsed["section_tokens"]),
+                    parsed["tokens"],
+                    time.time(),
+                ),
+            )
+        self._remember(parsed)
+        self.purge()
+        return resume_id, notes
+
+    def purge(self) -> int:
+        """
+        Deletes the resumes that have not been added for the retention period.
+
+        Returns:
+            The number of resumes deleted.
+        """
+        cutoff = time.time() - self.retention_seconds
+        with closing(self._connect()) as conn, conn:
+            expired = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT id FROM resumes WHERE created < ?", (cutoff,)
+                )
+            ]
+            conn.execute("DELETE FROM resumes WHERE created < ?", (cutoff,))
+        with self._lock:
+            for resume_id in expired:
+                self._cache.pop(resume_id, None)
+        return len(expired)
+
+    def load(self, path_to_resume: str) -> tuple[str, List[str]]:
+        """
+        Reads a resume pdf with load_resume and stores its text.
+
+        Args:
+            path_to_resume: The path to the resume pdf.
+
+        Returns:
+            The resume_id, and a warning for each limit that cut the resume short.
+        """
+        text, notes = load_resume(path_to_resume)
+        resume_id, _ = self.add(text)
+        return resume_id, notes
+
+    def get(self, resume_id: str) -> ParsedResume:
+        """
+        Returns a stored resume.
+
+        Args:
+            resume_id: The resume_id returned by add.
+
+        Returns:
+            The ParsedResume.
+
+        Raises:
+            KeyError: If no resume is stored under that id.
+        """
+        with self._lock:
+            parsed = self._cache.get(resume_id)
+            if parsed is not None:
+                self._cache.move_to_end(resume_id)
+                return parsed
+
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT text, sections, section_tokens, tokens FROM resumes WHERE id = ?",
+                (resume_id,),
+            ).fetchone()
+        if row is None:
+            raise KeyError(resume_id)
+
+        parsed = ParsedResume(
+            resume_id=resume_id,
+            text=row[0],
+            sections=json.loads(row[1]),
+            section_tokens=json.loads(row[2]),
+            tokens=row[3],
+        )
+        self._remember(parsed)
+        return parsed
+
+    def text(self, resume_id: str) -> str:
+        return self.get(resume_id)["text"]
+
+    def __contains__(self, resume_id: str) -> bool:
+        try:
+            self.get(resume_id)
+        except KeyError:
+            return False
+        return True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_resume_store() -> ResumeStore:
+    """
+    Returns the process-wide resume store, creating it on first use.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResumeStore()
+        return _store
@@ -1,7 +1,19 @@
 # /resume-app/resume_tuning_tab.py
 import streamlit as st
 
-from resume_doctor import ResumeDoctor
+from jobs import (
+    ACTIVE_STATUSES,
+    get_job_executor,
+    recall_job,
+    remember_job,
+    render_job_progress,
+)
+from persona_cache import AGE_CATEGORIES
+from profiling import profiling_enabled
+from resume_doctor import BATCH_MAX_CONCURRENCY, ResumeDoctor
+
+tuning_job_name = "tuning_job_id"
+tuning_batch_job_name = "tuning_batch_job_id"
 
 
 def _render_questions(questions_with_categories):
@@ -23,6 +35,118 @@ def _render_questions(questions_with_categories):
                 st.markdown(f"- {question}")
 
 
+def _render_skipped_edits(skipped_edits):
+    """
+    Warns about the edits suggested by the model that could not be applied to the resume.
+
+    Args:
+        skipped_edits: The skipped edit operations.
+    """
+    if not skipped_edits:
+        return
+    st.warning(
+        f"{len(skipped_edits)} suggested edit(s) could not be applied, because their "
+        "target was not found in the resume or their operation is unknown."
+    )
+    with st.expander("Skipped edits"):
+        st.json(skipped_edits)
+
+
+def _render_batch_result(age_category, response, error=None):
+    """
+    Renders the tuned resume, persona and questions generated for one age category.
+
+    Args:
+        age_category: The age category the result was generated for.
+        response: The ResumeDoctor output for that age category.
+        error: The error message, if the run for that age category failed.
+    """
+    st.markdown(f"#### {age_category}")
+    if error:
+        st.error(f"Resume update failed for {age_category}: {error}")
+        return
+    with st.expander(f"Persona ({age_category})"):
+        st.markdown(response["persona"])
+    with st.expander(f"Updated Resume ({age_category})"):
+        st.code(response["updated_resume"])
+    _render_skipped_edits(response.get("skipped_edits"))
+    _render_questions(response["interview_questions"])
+
+
+def _render_batch(app_state, age_options, rewrite_mode):
+    """
+    Runs the resume tuning for every age category at once as a background job, and renders the
+    results once it finishes.
+
+    Args:
+        app_state: The application state holding the resume and job description.
+        age_options: The age categories to run.
+        rewrite_mode: The ResumeDoctor rewrite mode, "full" or "edits".
+    """
+    st.divider()
+    st.markdown("### All Age Categories")
+    run_all = st.button("Run For All Age Categories")
+
+    if run_all:
+        resume_doctor = ResumeDoctor(
+            max_concurrency=BATCH_MAX_CONCURRENCY, rewrite_mode=rewrite_mode
+        )
+        resume_id, job_description = (
+            app_state["resume_id"],
+            app_state["job_description"],
+        )
+
+        def run(job):
+            results = {}
+            for age_category, response, error in resume_doctor.batch(
+                resume_id, job_description, age_options
+            ):
+                results[age_category] = (response, str(error) if error else None)
+                job.report(age_category)
+            return results
+
+        job_id = get_job_executor().submit(
+            "tuning_batch", run, profile=profiling_enabled()
+        )
+        remember_job(tuning_batch_job_name, job_id)
+
+    job = recall_job(tuning_batch_job_name)
+    if job is not None and job.status in ACTIVE_STATUSES:
+        render_job_progress(tuning_batch_job_name, "Generating for all age categories")
+    elif job is not None and job.status == "failed":
+        st.error(f"Resume update failed: {job.error_line}")
+    elif job is not None and st.session_state.get("tuning_batch_job_applied") != job.id:
+        st.session_state.app_state["batch_results"] = job.result
+        st.session_state["tuning_batch_job_applied"] = job.id
+
+    for age_category, (response, error) in app_state.get("batch_results", {}).items():
+        _render_batch_result(age_category, response, error)
+
+
+@st.fragment
+def _render_tuning_result():
+    """
+    Renders the updated resume, its changes and the interview questions as a fragment.
+
+    The state is read once per render, and interacting with the result only reruns this fragment.
+    """
+    app_state = st.session_state.app_state
+    for note in app_state.get("tuning_prompt_notes") or []:
+        st.info(note)
+
+    if "updated_resume" in app_state:
+        with st.expander("## Updated Resume"):
+            st.code(app_state["updated_resume"])
+
+    if app_state.get("resume_diff"):
+        with st.expander("## Changes To Resume"):
+            st.code(app_state["resume_diff"], language="diff")
+    _render_skipped_edits(app_state.get("skipped_edits"))
+
+    if "interview_questions" in app_state:
+        _render_questions(app_state["interview_questions"])
+
+
 def render_resume_tuning_tab():
     """
     Renders the resume tuning tab in the Streamlit app.
@@ -41,7 +165,7 @@ def render_resume_tuning_tab():
         "- Generates sample interview questions based on the job description and the persona.\n"
     )
     app_state = st.session_state["app_state"]
-    age_options = ["Baby Boomers", "GenX", "GenY", "GenZ"]
+    age_options = AGE_CATEGORIES
 
     age_category = st.selectbox(
         "Age Category",
@@ -49,31 +173,49 @@ def render_resume_tuning_tab():
         placeholder="Select an age category",
     )
 
+    compact_edits = st.toggle(
+        "Compact edits",
+        key="resume_tuning_compact_edits",
+        help="Have the model return section-level edits that are applied to your resume, instead of rewriting all of it.",
+    )
+    rewrite_mode = "edits" if compact_edits else "full"
+
     update_resume = st.button(
         "Run Generation", disabled=age_category not in age_options
     )
 
     if update_resume and age_category in age_options:
-        with st.spinner("Updating resume..."):
-            resume_doctor = ResumeDoctor()
-
-            response = resume_doctor.graph.invoke(
-                {
-                    "resume": app_state["resume"],
-                    "job_description": app_state["job_description"],
-                    "age_category": age_category,
-                }
-            )
-            st.session_state.app_state["persona"] = response["persona"]
-            st.session_state.app_state["updated_resume"] = response["updated_resume"]
-            st.session_state.app_state["interview_questions"] = response[
-                "interview_questions"
-            ]
-            st.session_state.app_state["age_category"] = age_category
-
-    if "updated_resume" in st.session_state.app_state:
-        with st.expander("## Updated Resume"):
-            st.code(st.session_state.app_state["updated_resume"])
+        resume_doctor = ResumeDoctor(rewrite_mode=rewrite_mode)
+        job_id = get_job_executor().submit_graph(
+            "tuning",
+            resume_doctor.graph,
+            {
+                "resume_id": app_state["resume_id"],
+                "job_description": app_state["job_description"],
+                "age_category": age_category,
+            },
+            profile=profiling_enabled(),
+        )
+        remember_job(tuning_job_name, job_id)
+
+    job = recall_job(tuning_job_name)
+    if job is not None and job.status in ACTIVE_STATUSES:
+        render_job_progress(tuning_job_name, "Updating resume")
+    elif job is not None and job.status == "failed":
+        st.error(f"Resume update failed: {job.error_line}")
+    elif job is not None and st.session_state.get("tuning_job_applied") != job.id:
+        response = job.result
+        st.session_state.app_state["persona"] = response["persona"]
+        st.session_state.app_state["updated_resume"] = response["updated_resume"]
+        st.session_state.app_state["resume_diff"] = response.get("resume_diff")
+        st.session_state.app_state["skipped_edits"] = response.get("skipped_edits")
+        st.session_state.app_state["interview_questions"] = response[
+            "interview_questions"
+        ]
+        st.session_state.app_state["age_category"] = response["age_category"]
+        st.session_state.app_state["tuning_prompt_notes"] = response.get("prompt_notes")
+        st.session_state["tuning_job_applied"] = job.id
+
+    _render_tuning_result()
 
-    if "interview_questions" in st.session_state.app_state:
-        _render_questions(st.session_state.app_state["interview_questions"])
+    _render_batch(app_state, age_options, rewrite_mode)
@@ -0,0 +1,586 @@
+# /resume-app/screening_queue.py
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from typing import List, Literal, TypedDict
+
+from utils import content_hash
+
+JobState = Literal["pending", "running", "done", "failed"]
+
+DEFAULT_QUEUE_PATH = os.path.join(".cache", "screening_queue.sqlite")
+
+# Posting columns added after the first release, with their definitions
+POSTING_COLUMNS = {
+    "must_have_top_k": "INTEGER NOT NULL DEFAULT 0",
+    "pass_threshold": "REAL",
+}
+
+
+class ScreeningJob(TypedDict):
+    """
+    A dictionary representing a queued screening of one resume against one posting.
+
+    Attributes:
+        id: The job id.
+        resume_path: The path to the resume pdf.
+        posting_id: The id of the posting to screen against.
+        job_description: The job description text.
+        criteria: The criteria given for the posting, or None to infer them.
+        num_auto_generated_criteria: The number of criteria to infer.
+        must_have_top_k: The number of leading criteria treated as must-have.
+        pass_threshold: The score needed for an overall match, or None for the default.
+        attempts: The number of times the job has been claimed.
+    """
+
+    id: int
+    resume_path: str
+    posting_id: int
+    job_description: str
+    criteria: List[str] | None
+    num_auto_generated_criteria: int
+    must_have_top_k: int
+    pass_threshold: float | None
+    attempts: int
+
+
+class ScreeningQueue:
+    """
+    A durable queue of bulk screening jobs, stored in SQLite.
+
+    Each job screens one resume against one posting, and moves through the states
+    pending, running, done and failed. Workers claim jobs with a lease, so jobs held by a
+    worker that crashed are picked up again once the lease expires. A resume and posting
+    pair is only ever queued once, so a job that has completed is never sent to the model again.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        max_attempts: int = 3,
+        lease_seconds: float = 600,
+    ):
+        """
+        Initializes the ScreeningQueue class.
+
+        Args:
+            path: The path to the SQLite database. Defaults to the RESUME_APP_SCREENING_QUEUE
+                environment variable, or .cache/screening_queue.sqlite.
+            max_attempts: The number of times a job is tried before it is marked as failed.
+            lease_seconds: How long a worker holds a job before it is considered abandoned.
+        """
+        self.path = path or os.environ.get(
+            "RESUME_APP_SCREENING_QUEUE", DEFAULT_QUEUE_PATH
+        )
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "id INTEGER PRIMARY KEY, job_description TEXT NOT NULL, "
+                "job_description_hash TEXT NOT NULL UNIQUE, criteria TEXT, "
+                "num_auto_generated_criteria INTEGER NOT NULL, "
+                "must_have_top_k INTEGER NOT NULL DEFAULT 0, pass_threshold REAL)"
+            )
+            # Queues created by earlier versions lack the newer posting columns
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(postings)")]
+            for column, definition in POSTING_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(
+                        f"ALTER TABLE postings ADD COLUMN {column} {definition}"
+                    )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY, resume_path TEXT NOT NULL, resume_hash TEXT NOT NULL, "
+                "posting_id INTEGER NOT NULL REFERENCES postings(id), "
+                "state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+                "worker TEXT, lease_until REAL, result TEXT, error TEXT, "
+                "created REAL NOT NULL, started REAL, finished REAL, "
+                "UNIQUE (resume_hash, posting_id))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add_posting(
+        self,
+        job_description: str,
+        criteria: List[str] | None = None,
+        num_auto_generated_criteria: int = 3,
+        must_have_top_k: int = 0,
+        pass_threshold: float | None = None,
+    ) -> int:
+        """
+        Adds a posting, or returns the id of the identical posting already queued.
+
+        Args:
+            job_description: The job description text.
+            criteria: The criteria to screen against, or None to infer them from the job description.
+            num_auto_generated_criteria: The number of criteria to infer.
+            must_have_top_k: The number of leading criteria treated as must-have. Criteria can
+                also be marked as must-have with a leading '!'.
+            pass_threshold: The score needed for an overall match, or None for the default.
+
+        Returns:
+            The posting id.
+
+        Raises:
+            ValueError: If the job description is already queued with different criteria or settings,
+                as its jobs would otherwise run with the old ones.
+        """
+        config = (
+            json.dumps(criteria) if criteria else None,
+            num_auto_generated_criteria,
+            must_have_top_k,
+            pass_threshold,
+        )
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO postings "
+                "(job_description, job_description_hash, criteria, num_auto_generated_criteria, "
+                "must_have_top_k, pass_threshold) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_description, content_hash(job_description), *config),
+            )
+            row = conn.execute(
+                "SELECT id, criteria, num_auto_generated_criteria, must_have_top_k, "
+                "pass_threshold FROM postings WHERE job_description_hash = ?",
+                (content_hash(job_description),),
+            ).fetchone()
+
+        if tuple(row)[1:] != config:
+            raise ValueError(
+                f"The job description is already queued as posting {row['id']} with different "
+                "criteria or settings. Change the job description to queue it again."
+            )
+        return row["id"]
+
+    def enqueue(self, resume_paths: List[str], posting_ids: List[int]) -> int:
+        """
+        Queues the screening of every resume against every posting.
+
+        Resumes are identified by the hash of their file, so pairs that are already queued,
+        running or done are left as they are.
+
+        Args:
+            resume_paths: The paths to the resume pdfs.
+            posting_ids: The posting ids.
+
+        Returns:
+            The number of new jobs.
+        """
+        added = 0
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN")
+            for resume_path in resume_paths:
+                with open(resume_path, "rb") as f:
+                    resume_hash = hashlib.sha256(f.read()).hexdigest()
+                for posting_id in posting_ids:
+                    added += conn.execute(
+                        "INSERT OR IGNORE INTO jobs (resume_path, resume_hash, posting_id, created) "
+                        "VALUES (?, ?, ?, ?)",
+                        (os.path.abspath(resume_path), resume_hash, posting_id, now),
+                    ).rowcount
+            conn.execute("COMMIT")
+        return added
+
+    def claim(self, worker: str) -> ScreeningJob | None:
+        """
+        Claims the next pending job, or a running job whose lease has expired.
+
+        A job whose lease expired on its last attempt is marked as failed instead, so a resume
+        that crashes or hangs its worker is not retried forever.
+
+        Args:
+            worker: A name identifying the worker.
+
+        Returns:
+            The job, or None if there is nothing to do.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET state = 'failed', error = ?, lease_until = NULL, finished = ? "
+                "WHERE state = 'running' AND lease_until < ? AND attempts >= ?",
+                (
+                    "Lease expired on the last attempt, the worker may have crashed",
+                    now,
+                    now,
+                    self.max_attempts,
+                ),
+            )
+            row = conn.execute(
+                "SELECT jobs.id, resume_path, posting_id, attempts, job_description, "
+                "criteria, num_auto_generated_criteria, must_have_top_k, pass_threshold "
+                "FROM jobs "
+                "JOIN postings ON postings.id = jobs.posting_id "
+                "WHERE state = 'pending' OR (state = 'running' AND lease_until < ?) "
+                "ORDER BY jobs.id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, worker = ?, "
+                "lease_until = ?, started = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+
+        return ScreeningJob(
+            id=row["id"],
+            resume_path=row["resume_path"],
+            posting_id=row["posting_id"],
+            job_description=row["job_description"],
+            criteria=json.loads(row["criteria"]) if row["criteria"] else None,
+            num_auto_generated_criteria=row["num_auto_generated_criteria"],
+            must_have_top_k=row["must_have_top_k"],
+            pass_threshold=row["pass_threshold"],
+            attempts=row["attempts"] + 1,
+        )
+
+    def renew(self, job_id: int, worker: str) -> bool:
+        """
+        Extends the lease on a running job.
+
+        Args:
+            job_id: The job id.
+            worker: The worker holding the job.
+
+        Returns:
+            Whether the worker still holds the job.
+        """
+        with closing(self._connect()) as conn:
+            return (
+                conn.execute(
+                    "UPDATE jobs SET lease_until = ? "
+                    "WHERE id = ? AND worker = ? AND state = 'running'",
+                    (time.time() + self.lease_seconds, job_id, worker),
+                ).rowcount
+                > 0
+            )
+
+    def complete(self, job_id: int, worker: str, result: dict) -> bool:
+        """
+        Marks a job as done and stores its result.
+
+        Only the worker holding the job can complete it, so a worker whose lease expired
+        cannot overwrite the outcome of the worker that claimed the job after it.
+
+        Args:
+            job_id: The job id.
+            worker: The worker holding the job.
+            result: The screening result.
+
+        Returns:
+            Whether the result was stored.
+        """
+        with closing(self._connect()) as conn:
+            return (
+                conn.execute(
+                    "UPDATE jobs SET state = 'done', result = ?, error = NULL, "
+                    "lease_until = NULL, finished = ? "
+                    "WHERE id = ? AND worker = ? AND state = 'running'",
+                    (json.dumps(result), time.time(), job_id, worker),
+                ).rowcount
+                > 0
+            )
+
+    def fail(self, job_id: int, worker: str, error: str) -> bool:
+        """
+        Records a failed attempt. The job goes back to pending until it runs out of attempts.
+
+        Like complete, only the worker holding the job can fail it, so a done job is never
+        sent back to pending.
+
+        Args:
+            job_id: The job id.
+            worker: The worker holding the job.
+            error: The error message.
+
+        Returns:
+            Whether the failure was recorded.
+        """
+        with closing(self._connect()) as conn:
+            return (
+                conn.execute(
+                    "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                    "error = ?, lease_until = NULL, finished = ? "
+                    "WHERE id = ? AND worker = ? AND state = 'running'",
+                    (self.max_attempts, error, time.time(), job_id, worker),
+                ).rowcount
+                > 0
+            )
+
+    def retry_failed(self) -> int:
+        """
+        Moves failed jobs back to pending, with a fresh set of attempts.
+
+        Returns:
+            The number of jobs requeued.
+        """
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "UPDATE jobs SET state = 'pending', attempts = 0 WHERE state = 'failed'"
+            ).rowcount
+
+    def progress(self, window_seconds: float = 300) -> dict:
+        """
+        Returns the number of jobs in each state, and the recent throughput.
+
+        Args:
+            window_seconds: The window over which throughput is measured.
+
+        Returns:
+            A dictionary with the counts per state, the jobs done per minute over the window,
+            and the average duration of a done job in seconds.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            counts = {
+                row["state"]: row["count"]
+                for row in conn.execute(
+                    "SELECT state, COUNT(*) AS count FROM jobs GROUP BY state"
+                )
+            }
+            recent = conn.execute(
+                "SELECT COUNT(*) AS count, AVG(finished - started) AS duration FROM jobs "
+                "WHERE state = 'done' AND finished >= ?",
+                (now - window_seconds,),
+            ).fetchone()
+
+        return {
+            **{
+                state: counts.get(state, 0)
+                for state in ("pending", "running", "done", "failed")
+            },
+            "done_per_minute": recent["count"] * 60 / window_seconds,
+            "average_seconds": recent["duration"],
+        }
+
+    def results(self, posting_id: int | None = None) -> List[dict]:
+        """
+        Returns the results of the done jobs.
+
+        Args:
+            posting_id: Only return results for this posting.
+
+        Returns:
+            A list of dictionaries with the resume path, posting id and screening result.
+        """
+        query = "SELECT resume_path, posting_id, result FROM jobs WHERE state = 'done'"
+        params = ()
+        if posting_id is not None:
+            query += " AND posting_id = ?"
+            params = (posting_id,)
+        with closing(self._connect()) as conn:
+            return [
+                {
+                    "resume_path": row["resume_path"],
+                    "posting_id": row["posting_id"],
+                    **json.loads(row["result"]),
+                }
+                for row in conn.execute(query + " ORDER BY jobs.id", params)
+            ]
+
+
+@contextmanager
+def _keep_lease(queue: ScreeningQueue, job_id: int, worker: str):
+    # Renews the lease while a job runs, so a long screening is not claimed by another worker
+    done = threading.Event()
+
+    def renew():
+        while not done.wait(queue.lease_seconds / 3):
+            if not queue.renew(job_id, worker):
+                return
+
+    thread = threading.Thread(target=renew, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def run_worker(queue: ScreeningQueue, worker: str, stop: threading.Event | None = None):
+    """
+    Claims and runs screening jobs until the queue is empty.
+
+    Args:
+        queue: The screening queue.
+        worker: A name identifying the worker.
+        stop: An optional event to stop the worker between jobs.
+    """
+    from resume_screener import ResumeScreener, parse_criteria
+
+    screener = ResumeScreener()
+    while stop is None or not stop.is_set():
+        job = queue.claim(worker)
+        if job is None:
+            return
+
+        try:
+            with _keep_lease(queue, job["id"], worker):
+                criteria, must_have, weights = parse_criteria(job["criteria"])
+                resume_id, resume_warnings = screener.resume_store.load(
+                    job["resume_path"]
+                )
+                response = screener.graph.invoke(
+                    {
+                        "path_to_resume": None,
+                        "resume_id": resume_id,
+                        "job_description": job["job_description"],
+                        "criteria": criteria,
+                        "num_auto_generated_criteria": job[
+                            "num_auto_generated_criteria"
+                        ],
+                        "must_have": must_have,
+                        "must_have_top_k": job["must_have_top_k"],
+                        "weights": weights,
+                        "pass_threshold": job["pass_threshold"],
+                    }
+                )
+            queue.complete(
+                job["id"],
+                worker,
+                {
+                    "decision": response["decision"],
+                    "reason": response["reason"],
+                    "score": response["score"],
+                    "criteria": response["criteria"],
+                    "decisions": response["decisions"],
+                    "skipped_criteria": response.get("skipped_criteria") or [],
+                    "resume_warnings": resume_warnings,
+                },
+            )
+        except Exception as e:
+            queue.fail(job["id"], worker, f"{type(e).__name__}: {e}")
+
+
+def _expand_resume_paths(paths: List[str]) -> List[str]:
+    resume_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            resume_paths += sorted(
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if name.lower().endswith(".pdf")
+            )
+        else:
+            resume_paths.append(path)
+    return resume_paths
+
+
+def main():
+    """
+    Command line entry point for bulk screening.
+
+    Examples:
+        python screening_queue.py enqueue --postings jd1.txt jd2.txt --resumes resumes/
+        python screening_queue.py work --threads 4
+        python screening_queue.py status
+        python screening_queue.py results --posting 1
+    """
+    parser = argparse.ArgumentParser(description="Durable bulk screening queue")
+    parser.add_argument("--path", default=None, help="Path to the queue database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = subparsers.add_parser("enqueue", help="Queue resumes against postings")
+    enqueue.add_argument(
+        "--postings", nargs="+", required=True, help="Job description text files"
+    )
+    enqueue.add_argument(
+        "--resumes", nargs="+", required=True, help="Resume pdfs or folders of them"
+    )
+    enqueue.add_argument(
+        "--criteria",
+        default=None,
+        help="Criteria separated by '|'. Prefix a criterion with '!' to make it a must-have, "
+        "and end it with '*<weight>' to weight it",
+    )
+    enqueue.add_argument("--num-criteria", type=int, default=3)
+    enqueue.add_argument(
+        "--must-have-top-k",
+        type=int,
+        default=0,
+        help="Stop screening when one of the first k criteria fails",
+    )
+    enqueue.add_argument(
+        "--pass-threshold",
+        type=float,
+        default=None,
+        help="The weighted share of the criteria needed for an overall match",
+    )
+
+    work = subparsers.add_parser("work", help="Run jobs until the queue is empty")
+    work.add_argument("--threads", type=int, default=1)
+
+    subparsers.add_parser("status", help="Show progress and throughput")
+    subparsers.add_parser("retry-failed", help="Requeue failed jobs")
+
+    results = subparsers.add_parser("results", help="Print results as json lines")
+    results.add_argument("--posting", type=int, default=None)
+
+    args = parser.parse_args()
+    queue = ScreeningQueue(path=args.path)
+
+    if args.command == "enqueue":
+        criteria = None
+        if args.criteria:
+            criteria = [x.strip() for x in args.criteria.split("|") if x.strip()]
+        posting_ids = []
+        for path in args.postings:
+            with open(path, "r") as f:
+                try:
+                    posting_ids.append(
+                        queue.add_posting(
+                            f.read(),
+                            criteria,
+                            args.num_criteria,
+                            args.must_have_top_k,
+                            args.pass_threshold,
+                        )
+                    )
+                except ValueError as e:
+                    parser.exit(1, f"{path}: {e}\n")
+        added = queue.enqueue(_expand_resume_paths(args.resumes), posting_ids)
+        print(f"Queued {added} new jobs for postings {posting_ids}")
+    elif args.command == "work":
+        name = f"{socket.gethostname()}:{os.getpid()}"
+        threads = [
+            threading.Thread(target=run_worker, args=(queue, f"{name}:{i}"))
+            for i in range(args.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(json.dumps(queue.progress(), indent=2))
+    elif args.command == "status":
+        print(json.dumps(queue.progress(), indent=2))
+    elif args.command == "retry-failed":
+        print(f"Requeued {queue.retry_failed()} jobs")
+    elif args.command == "results":
+        for result in queue.results(args.posting):
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
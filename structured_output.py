@@ -0,0 +1,178 @@
+# /resume-app/structured_output.py
+import ast
+import json
+import re
+from functools import lru_cache
+from typing import Any
+
+from pydantic import TypeAdapter, ValidationError
+
+# Re-asks per call, when the output cannot be repaired locally
+MAX_REASKS = 1
+
+REASK_PROMPT = """
+Your previous answer could not be read: {error}
+Reply again with only the json, in the format asked for above, and no other text.
+"""
+
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+def find_json(text: str, opening: str) -> str | None:
+    """
+    Returns the first balanced json object or list in the text, ignoring brackets inside strings.
+
+    When the text ends before the brackets are closed, e.g. because the output was cut short,
+    the open string and brackets are closed.
+
+    Args:
+        text: The model output.
+        opening: "{" for an object, "[" for a list.
+
+    Returns:
+        The json text, or None if there is no opening bracket.
+    """
+    start = text.find(opening)
+    if start < 0:
+        return None
+
+    stack, quote, escaped = [], None, False
+    for i in range(start, len(text)):
+        char = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack and stack[-1] == char:
+                stack.pop()
+            if not stack:
+                return text[start : i + 1]
+    return text[start:] + (quote or "") + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    """
+    Fixes the mistakes models commonly make in json: single-quoted strings, smart quotes,
+    unquoted keys, trailing commas and Python literals.
+
+    Args:
+        text: The json text.
+
+    Returns:
+        The repaired json text.
+    """
+    text = text.translate(SMART_QUOTES)
+    out, i = [], 0
+    while i < len(text):
+        char = text[i]
+        if char in "\"'":
+            # Copy the string, re-quoted with double quotes
+            j, chars = i + 1, []
+            while j < len(text) and text[j] != char:
+                if text[j] == "\\" and j + 1 < len(text):
+                    escaped = text[j + 1]
+                    chars.append(escaped if escaped == "'" else text[j : j + 2])
+                    j += 2
+                    continue
+                chars.append('\\"' if text[j] == '"' else text[j])
+                j += 1
+            out.append('"' + "".join(chars).replace("\n", "\\n") + '"')
+            i = j + 1
+        elif char == ",":
+            following = re.match(r",\s*([}\]])", text[i:])
+            if following:
+                i += following.end() - 1
+            else:
+                out.append(char)
+                i += 1
+        elif char.isalpha() or char == "_":
+            word = re.match(r"[A-Za-z_][\w-]*", text[i:]).group()
+            if re.match(r"\s*:", text[i + len(word) :]):
+                out.append(f'"{word}"')
+            else:
+                out.append(PYTHON_LITERALS.get(word, word))
+            i += len(word)
+        else:
+            out.append(char)
+            i += 1
+    return "".join(out)
+
+
+def load_json(text: str, opening: str) -> Any:
+    """
+    Extracts and parses the first json object or list in the model output, repairing it if needed.
+
+    Args:
+        text: The model output.
+        opening: "{" for an object, "[" for a list.
+
+    Returns:
+        The parsed value.
+
+    Raises:
+        StructuredOutputError: If there is no json, or it cannot be repaired.
+    """
+    fragment = find_json(text, opening)
+    if fragment is None:
+        kind = "object" if opening == "{" else "list"
+        raise StructuredOutputError(f"The answer holds no json {kind}.")
+
+    try:
+        return json.loads(fragment)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(repair_json(fragment))
+    except json.JSONDecodeError:
+        pass
+    try:
+        return ast.literal_eval(fragment)
+    except (ValueError, SyntaxError) as e:
+        raise StructuredOutputError(f"The json is not valid: {e}") from e
+
+
+@lru_cache
+def _adapter(schema) -> tuple[TypeAdapter, str]:
+    adapter = TypeAdapter(schema)
+    return adapter, "[" if adapter.json_schema().get("type") == "array" else "{"
+
+
+def parse_structured(text: str, schema) -> Any:
+    """
+    Parses model output into a value of the schema, repairing the json locally if needed.
+
+    Args:
+        text: The model output.
+        schema: A type pydantic can validate, e.g. a TypedDict or List[str].
+
+    Returns:
+        The validated value.
+
+    Raises:
+        StructuredOutputError: If the output cannot be repaired or does not match the schema.
+    """
+    adapter, opening = _adapter(schema)
+    value = load_json(text, opening)
+    try:
+        return adapter.validate_python(value)
+    except ValidationError as e:
+        errors = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'value'}: {error['msg']}"
+            for error in e.errors()[:3]
+        )
+        raise StructuredOutputError(
+            f"The json does not match the format: {errors}"
+        ) from e
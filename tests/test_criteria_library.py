@@ -0,0 +1,51 @@
+import pytest
+
+from criteria_library import CriteriaLibrary
+
+
+@pytest.fixture
+def library(tmp_path):
+    return CriteriaLibrary(str(tmp_path / "criteria_library.sqlite"))
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ("5+ years Python", "Five years of Python experience"),
+        ("5+ years Python", "At least 5 years of Python"),
+        ("Experience with React", "React experience"),
+        ("5+ years Python", "Five or more years of Python"),
+    ],
+)
+def test_equivalent_criteria_share_an_id(library, first, second):
+    assert library.canonical_id(first) == library.canonical_id(second)
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        (
+            "Bachelor's degree in Computer Science",
+            "Master's degree in Computer Science",
+        ),
+        (
+            "Senior software engineering experience",
+            "Junior software engineering experience",
+        ),
+        ("Not required to relocate", "Required to relocate"),
+        ("Required to relocate", "Not required to relocate"),
+        ("5+ years Python", "3+ years Python"),
+        ("Python and Java", "Python or Java"),
+        ("5 or more years of Python", "Over 5 years of Python"),
+        ("5 years of Python", "More than 5 years of Python"),
+        ("Experience with AWS cloud services", "Experience with Azure cloud services"),
+    ],
+)
+def test_different_criteria_get_different_ids(library, first, second):
+    assert library.canonical_id(first) != library.canonical_id(second)
+
+
+def test_ids_persist_across_instances(tmp_path):
+    path = str(tmp_path / "criteria_library.sqlite")
+    first = CriteriaLibrary(path).canonical_id("5+ years Python")
+    assert CriteriaLibrary(path).canonical_id("5 years python experience") == first
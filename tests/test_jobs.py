@@ -0,0 +1,22 @@
+import time
+
+from jobs import JobExecutor
+
+
+def wait_for(executor, job_id):
+    job = executor.get(job_id)
+    while job.status not in ("done", "failed"):
+        time.sleep(0.01)
+    return job
+
+
+def test_error_line_names_an_exception_without_a_message():
+    def fail(job):
+        raise TimeoutError()
+
+    executor = JobExecutor(max_workers=1)
+    job = wait_for(executor, executor.submit("test", fail))
+
+    assert job.status == "failed"
+    assert job.error_line == "TimeoutError"
+    assert wait_for(executor, executor.submit("test", lambda job: 1)).error_line == ""
@@ -0,0 +1,74 @@
+import time
+
+from langchain_core.messages import AIMessageChunk, HumanMessage
+
+from model_router import HedgePolicy, ModelMetrics, ModelRouter, SingleFlight
+
+
+def test_metrics_keep_totals_and_a_bounded_window():
+    metrics = ModelMetrics(window=3)
+    for latency in [10.0, 1.0, 2.0, 3.0]:
+        metrics.record("node", "model", latency, 100, 10, 0.5)
+
+    [row] = metrics.summary()
+    assert row["calls"] == 4
+    assert row["input_tokens"] == 400
+    assert row["cost"] == 2.0
+    assert row["mean_latency"] == 4.0
+    # The first call has left the window used for percentiles
+    assert row["p95_latency"] == 3.0
+    assert len(metrics.recent[("node", "model")]) == 3
+
+
+class FakeStreamingClient:
+    """
+    Streams two chunks per request, after the delay given for that request, or raises instead.
+    """
+
+    def __init__(self, *requests):
+        self.requests = list(requests)
+        self.chunks_read = []
+
+    def stream(self, messages):
+        self.chunks_read.append(0)
+        return self._chunks(len(self.chunks_read) - 1, *self.requests.pop(0))
+
+    def _chunks(self, request, delay, error):
+        time.sleep(delay)
+        if error:
+            raise error
+        for content in ["answer", "."]:
+            self.chunks_read[request] += 1
+            yield AIMessageChunk(content=content)
+            time.sleep(delay)
+
+
+def send_hedged(client):
+    hedge = HedgePolicy(percentile=50, budget=1.0, min_samples=1)
+    hedge.record_first_token("model", 0.05)
+    router = ModelRouter(
+        routes={"node": "model"},
+        hedge=hedge,
+        single_flight=SingleFlight(),
+        api_key="key",
+    )
+    return router._send(client, [HumanMessage(content="hi")], "model")
+
+
+def test_hedge_win_is_counted_against_a_running_primary_and_cancels_it():
+    client = FakeStreamingClient((0.3, None), (0.0, None))
+    response, hedged, hedge_won, primary_failed = send_hedged(client)
+
+    assert response.content == "answer."
+    assert (hedged, hedge_won, primary_failed) == (True, True, False)
+    time.sleep(0.7)
+    # The first request stopped reading after its first chunk
+    assert client.chunks_read[0] == 1
+
+
+def test_failed_primary_is_not_counted_as_a_hedge_win():
+    client = FakeStreamingClient((0.1, RuntimeError("boom")), (0.2, None))
+    response, hedged, hedge_won, primary_failed = send_hedged(client)
+
+    assert response.content == "answer."
+    assert (hedged, hedge_won, primary_failed) == (True, False, True)
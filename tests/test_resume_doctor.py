@@ -0,0 +1,33 @@
+from persona_cache import PersonaCache
+from resume_doctor import ResumeDoctor
+
+
+class FailingGraph:
+    """
+    Stands in for the compiled pipeline, failing for one age category.
+    """
+
+    def invoke(self, state):
+        if state["age_category"] == "20-30":
+            raise RuntimeError("model unavailable")
+        return {"age_category": state["age_category"], "persona": "persona"}
+
+
+def test_batch_yields_the_error_of_a_failing_category(tmp_path):
+    doctor = ResumeDoctor(
+        persona_cache=PersonaCache(str(tmp_path / "personas.sqlite")),
+        resume_store=object(),
+    )
+    doctor.graph = FailingGraph()
+
+    results = {
+        age_category: (result, error)
+        for age_category, result, error in doctor.batch(
+            "resume", "Job description", ["20-30", "30-40"]
+        )
+    }
+
+    assert results["30-40"] == ({"age_category": "30-40", "persona": "persona"}, None)
+    result, error = results["20-30"]
+    assert result is None
+    assert str(error) == "model unavailable"
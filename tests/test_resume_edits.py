@@ -0,0 +1,130 @@
+from resume_edits import apply_edits, diff_resumes, parse_sections
+
+RESUME = """John Doe
+
+Summary
+Backend engineer with 5 years of experience.
+
+EXPERIENCE
+• Built payment services in Kotlin
+• Led a team of 4 engineers
+
+Technical Skills
+• Languages: Kotlin, Java, Scala, Typescript
+• Frontend: React.js
+• Cloud Technologies: AWS (EC2, S3, Lambda, RDS), Docker
+"""
+
+
+def _skills(updated: str) -> list[str]:
+    return updated.split("## Technical Skills\n")[1].strip().splitlines()
+
+
+def test_reorder_skills_keeps_bullets_and_categories():
+    updated, applied, skipped = apply_edits(
+        RESUME, [{"op": "reorder_skills", "skills": ["React", "Docker", "Typescript"]}]
+    )
+    assert len(applied) == 1 and not skipped
+    assert _skills(updated) == [
+        "• Frontend: React.js",
+        "• Cloud Technologies: Docker, AWS (EC2, S3, Lambda, RDS)",
+        "• Languages: Typescript, Kotlin, Java, Scala",
+    ]
+
+
+def test_reorder_skills_matches_skills_in_parentheses():
+    updated, _, _ = apply_edits(
+        RESUME, [{"op": "reorder_skills", "skills": ["Lambda"]}]
+    )
+    assert _skills(updated)[0] == (
+        "• Cloud Technologies: AWS (EC2, S3, Lambda, RDS), Docker"
+    )
+
+
+def test_reorder_skills_one_per_line():
+    updated, _, _ = apply_edits(
+        "Skills\nPython\nJava\nRust\n",
+        [{"op": "reorder_skills", "skills": ["rust", "java"]}],
+    )
+    assert updated == "## Skills\nRust\nJava\nPython\n"
+
+
+def test_reorder_skills_without_a_match_is_skipped():
+    edit = {"op": "reorder_skills", "skills": ["Cobol"]}
+    updated, applied, skipped = apply_edits(RESUME, [edit])
+    assert not applied and skipped == [edit]
+    assert _skills(updated)[0] == "• Languages: Kotlin, Java, Scala, Typescript"
+
+
+def test_parse_sections_detects_headings():
+    sections = parse_sections(RESUME + "Certifications:\nAWS Solutions Architect\n")
+    assert [s["title"] for s in sections] == [
+        "",
+        "Summary",
+        "EXPERIENCE",
+        "Technical Skills",
+        "Certifications",
+    ]
+    assert sections[0]["lines"] == ["John Doe"]
+    # Bullets and long lines are never headings, even in capitals
+    assert sections[2]["lines"] == [
+        "• Built payment services in Kotlin",
+        "• Led a team of 4 engineers",
+    ]
+
+
+def test_replace_bullet_keeps_the_bullet_and_matches_loosely():
+    edit = {
+        "op": "replace_bullet",
+        "section": "Experience",
+        "old": "Built payment services in kotlin.",
+        "new": "- Built payment services in Kotlin handling 1M requests a day",
+    }
+    updated, applied, skipped = apply_edits(RESUME, [edit])
+    assert applied == [edit] and not skipped
+    assert "• Built payment services in Kotlin handling 1M requests a day" in updated
+    assert "• Led a team of 4 engineers" in updated
+
+
+def test_reword_summary_replaces_the_summary_section():
+    edit = {"op": "reword_summary", "text": "Kotlin engineer building payments."}
+    updated, applied, _ = apply_edits(RESUME, [edit])
+    assert applied == [edit]
+    assert "## Summary\nKotlin engineer building payments.\n" in updated
+    assert "Backend engineer" not in updated
+
+
+def test_edits_that_cannot_be_applied_are_skipped():
+    edits = [
+        {
+            "op": "replace_bullet",
+            "section": "Experience",
+            "old": "Designed a distributed cache",
+            "new": "Designed a distributed cache in Go",
+        },
+        {"op": "replace_bullet", "old": "Led a team of 4 engineers"},
+        {"op": "rewrite_everything"},
+        {"op": "reword_summary", "text": "Kotlin engineer."},
+    ]
+    updated, applied, skipped = apply_edits(RESUME, edits)
+    assert applied == edits[3:]
+    assert skipped == edits[:3]
+    assert "• Led a team of 4 engineers" in updated
+    assert "distributed cache" not in updated
+
+
+def test_diff_resumes_shows_only_the_changed_lines():
+    updated, _, _ = apply_edits(
+        RESUME, [{"op": "reword_summary", "text": "Kotlin engineer."}]
+    )
+    diff = diff_resumes(RESUME, updated)
+    changed = [
+        line
+        for line in diff.splitlines()
+        if line[:1] in "+-" and not line.startswith(("---", "+++"))
+    ]
+    assert changed == [
+        "-Backend engineer with 5 years of experience.",
+        "+Kotlin engineer.",
+    ]
+    assert diff_resumes(RESUME, apply_edits(RESUME, [])[0]) == ""
@@ -0,0 +1,25 @@
+import sqlite3
+from contextlib import closing
+
+from resume_store import ResumeStore
+
+RESUME = "John Doe\n\nExperience\n• Built services in Python\n"
+
+
+def test_resumes_resolve_across_instances(tmp_path):
+    path = str(tmp_path / "resumes.sqlite")
+    resume_id, _ = ResumeStore(path).add(RESUME)
+    assert ResumeStore(path).text(resume_id) == RESUME
+
+
+def test_resumes_past_retention_are_deleted(tmp_path):
+    path = str(tmp_path / "resumes.sqlite")
+    store = ResumeStore(path, retention_hours=1)
+    old_id, _ = store.add(RESUME)
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute("UPDATE resumes SET created = created - 7200")
+
+    new_id, _ = store.add("Jane Doe\n\nSkills\nGo, Rust\n")
+    assert new_id in store
+    assert old_id not in store
+    assert old_id not in ResumeStore(path)
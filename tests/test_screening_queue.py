@@ -0,0 +1,69 @@
+import pytest
+
+from screening_queue import ScreeningQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    resume = tmp_path / "resume.pdf"
+    resume.write_bytes(b"resume")
+    queue = ScreeningQueue(str(tmp_path / "queue.sqlite"), lease_seconds=0)
+    posting_id = queue.add_posting("Job description", criteria=["Python"])
+    queue.enqueue([str(resume)], [posting_id])
+    return queue
+
+
+def test_late_failure_does_not_requeue_a_done_job(queue):
+    first = queue.claim("a")
+    # The lease of worker a has expired, so worker b takes the job over
+    second = queue.claim("b")
+    assert second["id"] == first["id"]
+
+    assert queue.complete(second["id"], "b", {"decision": "pass"})
+    assert not queue.fail(first["id"], "a", "TimeoutError")
+    assert not queue.complete(first["id"], "a", {"decision": "fail"})
+
+    assert queue.progress()["done"] == 1
+    assert queue.claim("c") is None
+    assert queue.results()[0]["decision"] == "pass"
+
+
+def test_renew_only_extends_a_held_lease(queue):
+    job = queue.claim("a")
+    assert queue.renew(job["id"], "a")
+    assert not queue.renew(job["id"], "b")
+
+
+def test_same_posting_returns_the_same_id(tmp_path):
+    queue = ScreeningQueue(str(tmp_path / "queue.sqlite"))
+    first = queue.add_posting(
+        "Job description", criteria=["Python"], pass_threshold=0.7
+    )
+    assert (
+        queue.add_posting("Job description", criteria=["Python"], pass_threshold=0.7)
+        == first
+    )
+
+
+def test_same_posting_with_other_settings_is_rejected(tmp_path):
+    queue = ScreeningQueue(str(tmp_path / "queue.sqlite"))
+    queue.add_posting("Job description", criteria=["Python"])
+    with pytest.raises(ValueError):
+        queue.add_posting("Job description", criteria=["Python", "Java"])
+    with pytest.raises(ValueError):
+        queue.add_posting("Job description", criteria=["Python"], must_have_top_k=1)
+
+
+def test_expired_lease_on_the_last_attempt_fails_the_job(tmp_path):
+    resume = tmp_path / "resume.pdf"
+    resume.write_bytes(b"resume")
+    queue = ScreeningQueue(
+        str(tmp_path / "queue.sqlite"), max_attempts=2, lease_seconds=0
+    )
+    queue.enqueue([str(resume)], [queue.add_posting("Job description")])
+
+    # Both workers crash without completing or failing the job
+    assert queue.claim("a")["attempts"] == 1
+    assert queue.claim("b")["attempts"] == 2
+    assert queue.claim("c") is None
+    assert queue.progress()["failed"] == 1
@@ -1,22 +1,40 @@
-from typing import List, TypedDict
+from typing import Iterator, List, TypedDict
+import hashlib
+import os
 import uuid
+from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_nvidia_ai_endpoints import ChatNVIDIA
 from langchain_core.messages import AnyMessage
-import re
-import json
 from langgraph.checkpoint.sqlite import SqliteSaver
 import streamlit as st
 
-NVIDIA_BASE_URL = "https://integrate.api.nvidia.com/v1"
+load_dotenv()
+
+# Can be pointed at a local stand-in server, see mock_llm_server.py
+NVIDIA_BASE_URL = os.environ.get(
+    "NVIDIA_BASE_URL", "https://integrate.api.nvidia.com/v1"
+)
 model_name = "meta/llama3-70b-instruct"
 
+# Resumes are cut short at these limits before they reach any prompt. Long portfolios
+# otherwise produce prompts the model cannot handle.
+MAX_RESUME_PAGES = int(os.environ.get("RESUME_APP_MAX_RESUME_PAGES", 10))
+MAX_RESUME_CHARS = int(os.environ.get("RESUME_APP_MAX_RESUME_CHARS", 40_000))
+MAX_RESUME_TOKENS = int(os.environ.get("RESUME_APP_MAX_RESUME_TOKENS", 10_000))
+
+# A rough average for English text, used to estimate token counts without a tokenizer
+CHARS_PER_TOKEN = 4
+
 
 class ApplicationState(TypedDict):
-    resume: str
+    resume_id: str
     job_description: str
     criteria: List[str] | None
     decisions: List[dict] | None
+    skipped_criteria: List[str] | None
+    resume_warnings: List[str] | None
+    prompt_notes: List[str] | None
     persona: str | None
     age_category: str | None
     interview_session: List[AnyMessage] | None
@@ -29,50 +47,104 @@ class Decision(TypedDict):
     age_category: str
 
 
-def parse_resume(path_to_resume) -> str:
-    loader = PyPDFLoader(path_to_resume)
-    pages = loader.load()
-    content = ""
-    for page in pages:
-        content += page.page_content
-
-    return content
-
-
-def get_model():
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def iter_resume_pages(path_to_resume) -> Iterator[str]:
+    """
+    Yields the text of each page of a pdf, reading one page at a time.
+    """
+    for page in PyPDFLoader(path_to_resume).lazy_load():
+        yield page.page_content
+
+
+def load_resume(
+    path_to_resume,
+    max_pages: int = MAX_RESUME_PAGES,
+    max_chars: int = MAX_RESUME_CHARS,
+    max_tokens: int = MAX_RESUME_TOKENS,
+) -> tuple[str, List[str]]:
+    """
+    Reads the text of a resume pdf page by page, stopping at the first limit reached.
+
+    Pages past the limits are never read, so memory stays bounded by one page however
+    large the file is.
+
+    Args:
+        path_to_resume: The path to the resume pdf.
+        max_pages: The number of pages to read.
+        max_chars: The number of characters to keep.
+        max_tokens: The estimated number of tokens to keep.
+
+    Returns:
+        The resume text, and a warning for each limit that cut it short.
+    """
+    max_chars = min(max_chars, max_tokens * CHARS_PER_TOKEN)
+    parts, length, notes = [], 0, []
+    pages = iter_resume_pages(path_to_resume)
+    try:
+        for number, page in enumerate(pages, start=1):
+            if number > max_pages:
+                notes.append(
+                    f"The resume has more than {max_pages} pages, only the first {max_pages} were read."
+                )
+                break
+            if length + len(page) > max_chars:
+                parts.append(page[: max_chars - length])
+                notes.append(
+                    f"The resume was cut short at {max_chars} characters "
+                    f"(about {max_chars // CHARS_PER_TOKEN} tokens), on page {number}."
+                )
+                break
+            parts.append(page)
+            length += len(page)
+    finally:
+        pages.close()
+
+    return "".join(parts), notes
+
+
+def limit_resume_text(
+    text: str,
+    max_chars: int = MAX_RESUME_CHARS,
+    max_tokens: int = MAX_RESUME_TOKENS,
+) -> tuple[str, List[str]]:
+    """
+    Applies the resume size limits to resume text that was not read with load_resume.
+
+    Returns:
+        The resume text, and a warning if it was cut short.
+    """
+    max_chars = min(max_chars, max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text, []
+    return text[:max_chars], [
+        f"The resume was cut short at {max_chars} characters "
+        f"(about {max_chars // CHARS_PER_TOKEN} tokens)."
+    ]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_api_key() -> str | None:
+    # The key entered in the app takes precedence, scripts run outside streamlit fall back to the environment
+    if "NVIDIA_API_KEY" in st.session_state:
+        return st.session_state["NVIDIA_API_KEY"]
+    return os.environ.get("NVIDIA_API_KEY")
+
+
+def get_model(model: str = model_name, api_key: str | None = None):
     return ChatNVIDIA(
-        model=model_name,
-        api_key=st.session_state["NVIDIA_API_KEY"],
+        model=model,
+        api_key=api_key or get_api_key(),
         base_url=NVIDIA_BASE_URL,
         temperature=0.0,
     )
 
 
-def _format_string(input_text: str) -> str:
-    return input_text.replace("\n", " ")
-
-
-def extra_json_object(input_text: str) -> dict | None:
-    json_pattern = re.compile(r"\{[^}]+\}")
-    json_match = json_pattern.search(_format_string(input_text))
-
-    if json_match:
-        json_str = json_match.group()
-        return json.loads(json_str)
-
-    return None
-
-
-def extract_json_list(input_text: str) -> list[str] | None:
-    list_pattern = re.compile(r"\[.*?\]")
-    list_match = list_pattern.search(_format_string(input_text))
-
-    if list_match:
-        list_str = list_match.group()
-        return json.loads(list_str)
-    return None
-
-
 @st.cache_resource
 def get_memory():
     return SqliteSaver.from_conn_string(":memory:")